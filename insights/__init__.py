@@ -31,15 +31,18 @@ from .core import AttributeDict  # noqa: F401
 from .core import Syslog  # noqa: F401
 from .core.archives import COMPRESSION_TYPES, extract, InvalidArchive, InvalidContentType  # noqa: F401
 from .core import dr  # noqa: F401
+from .core import parser_cache
 from .core.context import ClusterArchiveContext, HostContext, HostArchiveContext, SerializedArchiveContext  # noqa: F401
 from .core.dr import SkipComponent  # noqa: F401
-from .core.hydration import create_context
+from .core.hydration import create_archive_context, create_context, member_selector
 from .core.plugins import combiner, fact, metadata, parser, rule  # noqa: F401
 from .core.plugins import datasource, condition, incident  # noqa: F401
 from .core.plugins import make_response, make_metadata, make_fingerprint  # noqa: F401
 from .core.plugins import make_pass, make_fail  # noqa: F401
 from .core.filters import add_filter, apply_filters, get_filters  # noqa: F401
 from .core.serde import Hydration
+from .core.spec_factory import get_archive_patterns
+from .core.vfs import ArchiveFS
 from .formats import get_formatter
 from .parsers import get_active_lines  # noqa: F401
 from .util import defaults  # noqa: F401
@@ -78,7 +81,15 @@ def add_status(name, nvr, commit):
     RULES_STATUS[name] = {"version": nvr, "commit": commit}
 
 
-def process_dir(broker, root, graph, context, inventory=None):
+def process_dir(broker, root, graph, context, inventory=None, plan=None, lazy=False):
+    """
+    Evaluates graph against the directory at root.
+
+    If root holds serialized components and ``lazy`` is True, each one is
+    only loaded when the run requests it. Components the run didn't request
+    aren't in the returned broker, since their files may be gone once it's
+    returned.
+    """
     ctx = create_context(root, context)
     log.debug("Processing %s with %s" % (root, ctx))
 
@@ -90,13 +101,56 @@ def process_dir(broker, root, graph, context, inventory=None):
     broker[ctx.__class__] = ctx
     if isinstance(ctx, SerializedArchiveContext):
         h = Hydration(ctx.root)
-        broker = h.hydrate(broker=broker)
-    graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
-    broker = dr.run(graph, broker=broker)
+        broker = h.hydrate(broker=broker, lazy=lazy)
+        try:
+            return dr.run(plan or get_single_graph(graph), broker=broker)
+        finally:
+            broker.loaders.clear()
+            h.close()
+    plan = plan or get_single_graph(graph)
+    broker = dr.run(plan, broker=broker)
     return broker
 
 
-def _run(broker, graph=None, root=None, context=None, inventory=None):
+def get_single_graph(graph):
+    """
+    Returns the part of graph that belongs to the ``GROUPS.single`` group.
+    """
+    return dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
+
+
+def get_selector(graph):
+    """
+    Returns a member selector for :func:`insights.core.archives.extract` that
+    chooses only the files the datasources in graph can read, or ``None`` if
+    they can't be determined.
+    """
+    patterns = get_archive_patterns(graph)
+    if patterns is not None:
+        return member_selector(patterns)
+
+
+def process_archive(broker, root, graph, context, plan=None):
+    """
+    Evaluates the archive at root without extracting it. Returns None if the
+    archive has to be extracted instead.
+    """
+    try:
+        archive_fs = ArchiveFS(root)
+    except InvalidArchive as ex:
+        log.debug("Can't read %s in place: %s" % (root, ex))
+        return None
+    with archive_fs:
+        ctx = create_archive_context(archive_fs, context)
+        if ctx is None:
+            return None
+        log.debug("Processing %s in place with %s" % (root, ctx))
+        broker[ctx.__class__] = ctx
+        return dr.run(plan or get_single_graph(graph), broker=broker)
+
+
+def _run(broker, graph=None, root=None, context=None, inventory=None, plan=None, select=None, in_place=False,
+         lazy=False):
     """
     run is a general interface that is meant for stand alone scripts to use
     when executing insights components.
@@ -110,6 +164,14 @@ def _run(broker, graph=None, root=None, context=None, inventory=None):
         component (function or class): The component to execute. Will only execute
             the component and its dependency graph. If None, all components with
             met dependencies will execute.
+        plan (RunPlan): A precompiled plan for the ``GROUPS.single`` part of
+            graph. If None, one is built from graph.
+        select (function): If root is an archive, extract only the members
+            this function chooses. See :func:`get_selector`.
+        in_place (bool): If root is an archive, read its files without
+            extracting it if it's possible. See :mod:`insights.core.vfs`.
+        lazy (bool): If root holds serialized components, only load the ones
+            the run requests. See :func:`process_dir`.
 
     Returns:
         broker: object containing the result of the evaluation.
@@ -118,14 +180,17 @@ def _run(broker, graph=None, root=None, context=None, inventory=None):
     if not root:
         context = context or HostContext
         broker[context] = context()
-        graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
-        return dr.run(graph, broker=broker)
+        return dr.run(plan or get_single_graph(graph), broker=broker)
 
     if os.path.isdir(root):
-        return process_dir(broker, root, graph, context, inventory=inventory)
+        return process_dir(broker, root, graph, context, inventory=inventory, plan=plan, lazy=lazy)
     else:
-        with extract(root) as ex:
-            return process_dir(broker, ex.tmp_dir, graph, context, inventory=inventory)
+        if in_place:
+            result = process_archive(broker, root, graph, context, plan=plan)
+            if result is not None:
+                return result
+        with extract(root, select=select) as ex:
+            return process_dir(broker, ex.tmp_dir, graph, context, inventory=inventory, plan=plan, lazy=lazy)
 
 
 def load_default_plugins():
@@ -207,7 +272,7 @@ def apply_configs(config):
             delegate = dr.DELEGATES[c]
             cname = dr.get_name(c)
             if cname.startswith(name):
-                dr.ENABLED[c] = comp_cfg.get("enabled", default_enabled)
+                dr.set_enabled(c, comp_cfg.get("enabled", default_enabled))
                 delegate.metadata.update(comp_cfg.get("metadata", {}))
                 delegate.tags = set(comp_cfg.get("tags", delegate.tags))
                 for k, v in delegate.metadata.items():
@@ -230,7 +295,8 @@ def _load_context(path):
 
 
 def run(component=None, root=None, print_summary=False,
-        context=None, inventory=None, print_component=None):
+        context=None, inventory=None, print_component=None, selective=False,
+        in_place=False):
 
     load_default_plugins()
 
@@ -251,6 +317,9 @@ def run(component=None, root=None, print_summary=False,
         p.add_argument("-s", "--syslog", help="Log results to syslog.", action="store_true")
         p.add_argument("-D", "--debug", help="Verbose debug output.", action="store_true")
         p.add_argument("--context", help="Execution Context. Defaults to HostContext if an archive isn't passed.")
+        p.add_argument("--selective", help="Extract only the archive files the components can read.", action="store_true")
+        p.add_argument("--no-extract", dest="in_place", help="Read archive files without extracting the archive.", action="store_true")
+        p.add_argument("--parser-cache", help="Directory in which to cache parser results across runs.")
 
         class Args(object):
             pass
@@ -284,6 +353,10 @@ def run(component=None, root=None, print_summary=False,
         logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO if args.verbose else logging.ERROR)
         context = _load_context(args.context) or context
         inventory = args.inventory
+        selective = args.selective or selective
+        in_place = args.in_place or in_place
+        if args.parser_cache:
+            parser_cache.set_cache(args.parser_cache)
 
         root = args.archive or root
         if root:
@@ -318,19 +391,20 @@ def run(component=None, root=None, print_summary=False,
         graph = dr.COMPONENTS[dr.GROUPS.single]
 
     broker = dr.Broker()
+    select = get_selector(graph) if selective and root and not os.path.isdir(root) else None
 
     try:
         if formatters:
             for formatter in formatters:
                 formatter.preprocess(broker)
-            broker = _run(broker, graph, root, context=context, inventory=inventory)
+            broker = _run(broker, graph, root, context=context, inventory=inventory, select=select, in_place=in_place)
             for formatter in formatters:
                 formatter.postprocess(broker)
         elif print_component:
-            broker = _run(broker, graph, root, context=context, inventory=inventory)
+            broker = _run(broker, graph, root, context=context, inventory=inventory, select=select, in_place=in_place)
             broker.print_component(print_component)
         else:
-            broker = _run(broker, graph, root, context=context, inventory=inventory)
+            broker = _run(broker, graph, root, context=context, inventory=inventory, select=select, in_place=in_place)
 
         return broker
     except (InvalidContentType, InvalidArchive):
@@ -2,6 +2,8 @@
 Handle adding files and preparing the archive for upload
 """
 from __future__ import absolute_import
+import errno
+import io
 import time
 import os
 import shutil
@@ -9,8 +11,11 @@ import subprocess
 import shlex
 import logging
 import tempfile
+import tarfile
+import threading
 import re
 
+from insights.util.compression import BLOCK_COMPRESSORS, ParallelCompressor
 from .utilities import determine_hostname, _expand_paths, write_data_to_file
 from .insights_spec import InsightsFile, InsightsCommand
 
@@ -20,10 +25,11 @@ logger = logging.getLogger(__name__)
 class InsightsArchive(object):
     """
     This class is an interface for adding command output
-    and files to the insights archive
+    and files to the insights archive. Files can be added from
+    multiple threads.
     """
 
-    def __init__(self, compressor="gz", target_name=None):
+    def __init__(self, compressor="gz", target_name=None, compression_workers=1):
         """
         Initialize the Insights Archive
         Create temp dir, archive dir, and command dir
@@ -38,6 +44,8 @@ class InsightsArchive(object):
         self.archive_dir = self.create_archive_dir()
         self.cmd_dir = self.create_command_dir()
         self.compressor = compressor
+        self.compression_workers = compression_workers
+        self.lock = threading.Lock()
 
     def create_archive_dir(self):
         """
@@ -66,13 +74,15 @@ class InsightsArchive(object):
         Copy just a single file
         """
         full_path = self.get_full_archive_path(path)
-        # Try to make the dir, eat exception if it fails
-        try:
-            os.makedirs(os.path.dirname(full_path))
-        except OSError:
-            pass
         logger.debug("Copying %s to %s", path, full_path)
-        shutil.copyfile(path, full_path)
+        with self.lock:
+            # the dir may already exist
+            try:
+                os.makedirs(os.path.dirname(full_path))
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            shutil.copyfile(path, full_path)
         return path
 
     def copy_file(self, path):
@@ -112,6 +122,12 @@ class InsightsArchive(object):
             "none": ""
         }.get(compressor, "z")
 
+    def compress_in_parallel(self):
+        """
+        Whether to compress on several threads instead of with tar
+        """
+        return (self.compression_workers or 1) > 1 and self.compressor in BLOCK_COMPRESSORS
+
     def create_tar_file(self, full_archive=False):
         """
         Create tar file to be compressed
@@ -120,14 +136,26 @@ class InsightsArchive(object):
         ext = "" if self.compressor == "none" else ".%s" % self.compressor
         tar_file_name = tar_file_name + ".tar" + ext
         logger.debug("Tar File: " + tar_file_name)
-        subprocess.call(shlex.split("tar c%sfS %s -C %s ." % (
-            self.get_compression_flag(self.compressor),
-            tar_file_name,
-            # for the docker "uber archive,"use archive_dir
-            #   rather than tmp_dir for all the files we tar,
-            #   because all the individual archives are in there
-            self.tmp_dir if not full_archive else self.archive_dir)),
-            stderr=subprocess.PIPE)
+        # for the docker "uber archive,"use archive_dir
+        #   rather than tmp_dir for all the files we tar,
+        #   because all the individual archives are in there
+        root = self.tmp_dir if not full_archive else self.archive_dir
+        if self.compress_in_parallel():
+            logger.debug("Compressing with %s threads", self.compression_workers)
+            with open(os.devnull, 'w') as devnull:
+                tar = subprocess.Popen(shlex.split("tar cfS - -C %s ." % root),
+                                       stdout=subprocess.PIPE, stderr=devnull)
+                with ParallelCompressor(tar_file_name, self.compressor,
+                                        self.compression_workers) as out:
+                    shutil.copyfileobj(tar.stdout, out, 1024 * 1024)
+                tar.stdout.close()
+                tar.wait()
+        else:
+            subprocess.call(shlex.split("tar c%sfS %s -C %s ." % (
+                self.get_compression_flag(self.compressor),
+                tar_file_name,
+                root)),
+                stderr=subprocess.PIPE)
         self.delete_archive_dir()
         logger.debug("Tar File Size: %s", str(os.path.getsize(tar_file_name)))
         return tar_file_name
@@ -165,11 +193,120 @@ class InsightsArchive(object):
             archive_path = self.get_full_archive_path(spec.archive_path.lstrip('/'))
         output = spec.get_output()
         if output and not re.search(cmd_not_found_regex, output):
-            write_data_to_file(output, archive_path)
+            self.write_data(output, archive_path)
 
     def add_metadata_to_archive(self, metadata, meta_path):
         '''
         Add metadata to archive
         '''
         archive_path = self.get_full_archive_path(meta_path.lstrip('/'))
-        write_data_to_file(metadata, archive_path)
+        self.write_data(metadata, archive_path)
+
+    def write_data(self, data, archive_path):
+        '''
+        Write data to a path in the archive
+        '''
+        with self.lock:
+            write_data_to_file(data, archive_path)
+
+
+class StreamingInsightsArchive(InsightsArchive):
+    """
+    An InsightsArchive that appends each file to the compressed tar file as
+    soon as it's collected, so the uncompressed tree is never staged on disk.
+    Files can be added from multiple threads. Paths such as archive_dir are
+    still computed, but nothing is written beneath them.
+    """
+    modes = {
+        "gz": "w:gz",
+        "xz": "w:xz",
+        "bz2": "w:bz2",
+        "none": "w"
+    }
+
+    def __init__(self, compressor="gz", target_name=None, compression_workers=1):
+        """
+        Initialize the Insights Archive and open the tar file
+
+        Raises tarfile.CompressionError if python can't use the compressor
+        """
+        super(StreamingInsightsArchive, self).__init__(compressor, target_name, compression_workers)
+        ext = "" if self.compressor == "none" else ".%s" % self.compressor
+        self.tar_file_name = os.path.join(
+            self.archive_tmp_dir, self.archive_name + ".tar" + ext)
+        self.dirs = set()
+        self.compressed = None
+        try:
+            if self.compress_in_parallel():
+                self.compressed = ParallelCompressor(self.tar_file_name, compressor,
+                                                     compression_workers)
+                self.tar = tarfile.open(fileobj=self.compressed, mode="w")
+            else:
+                self.tar = tarfile.open(self.tar_file_name, self.modes.get(compressor, "w:gz"))
+        except tarfile.CompressionError:
+            self.delete_tmp_dir()
+            self.delete_archive_file()
+            raise
+        self._add_dir(self.cmd_dir)
+
+    def create_archive_dir(self):
+        return os.path.join(self.tmp_dir, self.archive_name)
+
+    def create_command_dir(self):
+        return os.path.join(self.archive_dir, "insights_commands")
+
+    def _member(self, path, type_, mode, size=0):
+        # named like the members of tar -C tmp_dir .
+        name = os.path.relpath(path, self.tmp_dir)
+        info = tarfile.TarInfo(name if name == "." else "./" + name)
+        info.type = type_
+        info.mode = mode
+        info.size = size
+        info.mtime = time.time()
+        info.uid = os.getuid()
+        info.gid = os.getgid()
+        return info
+
+    def _add_dir(self, path):
+        # parents are added first, the same as tar does when it walks the tree
+        if path in self.dirs:
+            return
+        if path != self.tmp_dir:
+            self._add_dir(os.path.dirname(path))
+        self.dirs.add(path)
+        self.tar.addfile(self._member(path, tarfile.DIRTYPE, 0o700))
+
+    def _add_file(self, archive_path, fileobj, size):
+        with self.lock:
+            self._add_dir(os.path.dirname(archive_path))
+            self.tar.addfile(self._member(archive_path, tarfile.REGTYPE, 0o644, size), fileobj)
+
+    def write_data(self, data, archive_path):
+        '''
+        Append data to the tar file
+        '''
+        data = data.encode('utf-8')
+        self._add_file(archive_path, io.BytesIO(data), len(data))
+
+    def _copy_file(self, path):
+        '''
+        Append a single file to the tar file
+        '''
+        full_path = self.get_full_archive_path(path)
+        logger.debug("Adding %s to %s", path, self.tar_file_name)
+        with open(path, 'rb') as f:
+            self._add_file(full_path, f, os.fstat(f.fileno()).st_size)
+        return path
+
+    def create_tar_file(self, full_archive=False):
+        '''
+        Finish the tar file. The archive is always rooted at the temporary
+        directory, so full_archive is ignored.
+        '''
+        with self.lock:
+            self.tar.close()
+            if self.compressed is not None:
+                self.compressed.close()
+        logger.debug("Tar File: " + self.tar_file_name)
+        logger.debug("Tar File Size: %s", str(os.path.getsize(self.tar_file_name)))
+        return self.tar_file_name
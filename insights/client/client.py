@@ -9,6 +9,7 @@ import time
 import shutil
 import six
 import atexit
+import tarfile
 
 from .utilities import (generate_machine_id,
                         write_to_disk,
@@ -20,7 +21,7 @@ from .utilities import (generate_machine_id,
 from .collection_rules import InsightsUploadConf
 from .data_collector import DataCollector
 from .connection import InsightsConnection
-from .archive import InsightsArchive
+from .archive import InsightsArchive, StreamingInsightsArchive
 from .support import registration_check
 from .constants import InsightsConstants as constants
 from .schedule import get_scheduler
@@ -363,8 +364,7 @@ def collect(config, pconn):
             logger.error('Unexpected analysis target: %s', target['type'])
             return False
 
-        archive = InsightsArchive(compressor=config.compressor,
-                                  target_name=target['name'])
+        archive = _create_archive(config, target['name'])
         atexit.register(_delete_archive_internal, config, archive)
 
         # determine the target type and begin collection
@@ -463,6 +463,22 @@ def upload(config, pconn, tar_file, content_type, collection_duration=None):
                 logger.error("Please see %s for additional information", config.logging_file)
 
 
+def _create_archive(config, target_name):
+    '''
+    Create the archive collection is written to
+    '''
+    if config.stream_archive and not config.obfuscate:
+        try:
+            return StreamingInsightsArchive(compressor=config.compressor,
+                                            target_name=target_name,
+                                            compression_workers=config.compression_workers)
+        except tarfile.CompressionError as e:
+            logger.debug('Unable to stream the archive: %s', e)
+    return InsightsArchive(compressor=config.compressor,
+                           target_name=target_name,
+                           compression_workers=config.compression_workers)
+
+
 def _delete_archive_internal(config, archive):
     '''
     Only used during built-in collection.
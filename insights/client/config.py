@@ -75,6 +75,23 @@ DEFAULT_OPTS = {
         # non-CLI
         'default': None
     },
+    'collection_timeout': {
+        # non-CLI
+        # seconds before specs that haven't run are skipped and running
+        # commands are killed
+        'default': None
+    },
+    'collection_workers': {
+        # non-CLI
+        # number of specs collected at once
+        'default': 1
+    },
+    'compression_workers': {
+        # non-CLI
+        # threads that compress the archive. gz and xz archives are
+        # compressed in parallel when it's more than 1
+        'default': 1
+    },
     'compressor': {
         'default': 'gz',
         'opt': ['--compressor'],
@@ -245,6 +262,13 @@ DEFAULT_OPTS = {
         'action': 'store_true',
         'group': 'debug'
     },
+    'stream_archive': {
+        # non-CLI
+        # write collected data straight into the compressed archive instead
+        # of staging it on disk. Ignored with obfuscate, which needs the
+        # staged files
+        'default': False
+    },
     'support': {
         'default': False,
         'opt': ['--support'],
@@ -280,6 +304,17 @@ DEFAULT_OPTS = {
         'help': 'Unregister system from the Red Hat Insights Service',
         'action': 'store_true'
     },
+    'upload_chunk_retries': {
+        # non-CLI
+        # attempts to send each chunk of a chunked upload
+        'default': 5
+    },
+    'upload_chunk_size': {
+        # non-CLI
+        # upload archives in chunks of this many bytes, resuming after
+        # failures. the upload endpoint must speak the tus protocol
+        'default': None
+    },
     'upload_url': {
         # non-CLI
         'default': None
@@ -449,7 +484,8 @@ class InsightsConfig(object):
                                  if k.upper().startswith("INSIGHTS_") and
                                  k.upper() not in ignore)
 
-        for k in ['retries', 'cmd_timeout', 'http_timeout']:
+        for k in ['retries', 'cmd_timeout', 'http_timeout', 'collection_timeout', 'collection_workers',
+                  'compression_workers', 'upload_chunk_retries', 'upload_chunk_size']:
             if k in insights_env_opts:
                 v = insights_env_opts[k]
                 try:
@@ -525,7 +561,8 @@ class InsightsConfig(object):
             return
         for key in d:
             try:
-                if key == 'retries' or key == 'cmd_timeout':
+                if key in ('retries', 'cmd_timeout', 'collection_timeout', 'collection_workers',
+                           'compression_workers', 'upload_chunk_retries', 'upload_chunk_size'):
                     d[key] = parsedconfig.getint(constants.app_name, key)
                 if key == 'http_timeout':
                     d[key] = parsedconfig.getfloat(constants.app_name, key)
@@ -575,6 +612,15 @@ class InsightsConfig(object):
         if self.use_docker:
             raise ValueError(
                 '--use-docker is no longer supported.')
+        if self.collection_workers < 1:
+            raise ValueError(
+                'Option `collection_workers` must be at least 1')
+        if self.compression_workers < 1:
+            raise ValueError(
+                'Option `compression_workers` must be at least 1')
+        if self.upload_chunk_retries < 1:
+            raise ValueError(
+                'Option `upload_chunk_retries` must be at least 1')
         if self.obfuscate_hostname and not self.obfuscate:
             raise ValueError(
                 'Option `obfuscate_hostname` requires `obfuscate`')
@@ -8,6 +8,8 @@ import os
 import six
 import json
 import logging
+import time
+import base64
 import xml.etree.ElementTree as ET
 import warnings
 # import io
@@ -15,11 +17,11 @@ from tempfile import TemporaryFile
 # from datetime import datetime, timedelta
 try:
     # python 2
-    from urlparse import urlparse
+    from urlparse import urlparse, urljoin
     from urllib import quote
 except ImportError:
     # python 3
-    from urllib.parse import urlparse
+    from urllib.parse import urlparse, urljoin
     from urllib.parse import quote
 from .utilities import (determine_hostname,
                         generate_machine_id,
@@ -52,6 +54,9 @@ if os.environ.get('INSIGHTS_DEBUG_HTTP'):
     requests_log.setLevel(logging.DEBUG)
     requests_log.propagate = True
 
+TUS_VERSION = '1.0.0'
+UPLOAD_OK = (200, 201, 202, 204)
+
 
 class InsightsConnection(object):
 
@@ -124,6 +129,8 @@ class InsightsConnection(object):
         self.systemid = self.config.systemid or None
         self.get_proxies()
         self.session = self._init_session()
+        # chunked uploads that can be resumed, by archive
+        self.resumable_uploads = {}
 
     def _init_session(self):
         """
@@ -744,6 +751,106 @@ class InsightsConnection(object):
             return (message, client_hostname, "None", "")
 
     # -LEGACY-
+    def _upload_offset(self, location):
+        """
+        Get the offset a chunked upload continues from,
+        or None if the server no longer has it
+        """
+        net_logger.info("HEAD %s", location)
+        res = self.session.head(location, headers={'Tus-Resumable': TUS_VERSION},
+                                timeout=self.config.http_timeout)
+        if res.status_code in UPLOAD_OK and 'Upload-Offset' in res.headers:
+            return int(res.headers['Upload-Offset'])
+        logger.debug("Upload %s can't be resumed: %s", location, res.status_code)
+        return None
+
+    def _create_upload(self, upload_url, size, metadata, headers):
+        """
+        Start a chunked upload. Returns the response and the upload's location
+        """
+        headers = dict(headers)
+        headers.update({
+            'Tus-Resumable': TUS_VERSION,
+            'Upload-Length': str(size),
+            'Upload-Metadata': ','.join(
+                '%s %s' % (k, base64.b64encode(v.encode('utf-8')).decode('ascii'))
+                for k, v in sorted(metadata.items()))})
+        net_logger.info("POST %s", upload_url)
+        res = self.session.post(upload_url, headers=headers,
+                                timeout=self.config.http_timeout)
+        if res.status_code == 201 and 'Location' in res.headers:
+            return res, urljoin(upload_url, res.headers['Location'])
+        return res, None
+
+    def _chunked_upload(self, upload_url, data_collected, metadata, headers):
+        """
+        Upload the archive in chunks with the tus resumable upload protocol.
+
+        A chunk that fails is sent again from the offset the server reports,
+        waiting longer after each attempt, and so is a request creating the
+        upload that fails. An upload that still fails is
+        resumed the next time the same archive is uploaded. The response to
+        the last chunk is the response of the upload.
+        """
+        size = os.path.getsize(data_collected)
+        key = (upload_url, data_collected, size, os.path.getmtime(data_collected))
+        location = self.resumable_uploads.get(key)
+        offset = None
+        attempts = 0
+        with open(data_collected, 'rb') as f:
+            while True:
+                res = error = None
+                try:
+                    if location and offset is None:
+                        offset = self._upload_offset(location)
+                    if offset is None:
+                        res, location = self._create_upload(upload_url, size, metadata, headers)
+                        if location is None:
+                            self.resumable_uploads.pop(key, None)
+                            if res.status_code < 500:
+                                return res
+                        else:
+                            self.resumable_uploads[key] = location
+                            offset = 0
+                    if location is not None:
+                        f.seek(offset)
+                        chunk = f.read(self.config.upload_chunk_size)
+                        logger.debug("Uploading bytes %d-%d of %d to %s",
+                                     offset, offset + len(chunk), size, location)
+                        net_logger.info("PATCH %s", location)
+                        res = self.session.patch(location, data=chunk,
+                                                 headers={'Tus-Resumable': TUS_VERSION,
+                                                          'Upload-Offset': str(offset),
+                                                          'Content-Type': 'application/offset+octet-stream'},
+                                                 timeout=self.config.http_timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                    offset = None
+                else:
+                    if res.status_code in UPLOAD_OK:
+                        if offset + len(chunk) >= size:
+                            self.resumable_uploads.pop(key, None)
+                            return res
+                        offset = int(res.headers.get('Upload-Offset', offset + len(chunk)))
+                        attempts = 0
+                        continue
+                    if res.status_code < 500 and res.status_code != 409:
+                        # rejected, not worth sending again
+                        return res
+                    offset = None
+
+                attempts += 1
+                logger.debug("Upload attempt %d of %d failed: %s",
+                             attempts, self.config.upload_chunk_retries,
+                             error or res.status_code)
+                if attempts >= self.config.upload_chunk_retries:
+                    if res is None:
+                        raise error
+                    return res
+                wait = min(constants.upload_backoff * 2 ** (attempts - 1), constants.sleep_time)
+                logger.debug("Waiting %d seconds then resuming", wait)
+                time.sleep(wait)
+
     def _legacy_upload_archive(self, data_collected, duration):
         '''
         Do an HTTPS upload of the archive
@@ -760,9 +867,6 @@ class InsightsConnection(object):
             from .utilities import magic_plan_b
             mime_type = magic_plan_b(data_collected)
 
-        files = {
-            'file': (file_name, open(data_collected, 'rb'), mime_type)}
-
         if self.config.analyze_container:
             logger.debug('Uploading container, image, mountpoint or tarfile.')
             upload_url = self.upload_url
@@ -773,8 +877,15 @@ class InsightsConnection(object):
         logger.debug("Uploading %s to %s", data_collected, upload_url)
 
         headers = {'x-rh-collection-time': str(duration)}
-        net_logger.info("POST %s", upload_url)
-        upload = self.session.post(upload_url, files=files, headers=headers)
+        if self.config.upload_chunk_size:
+            upload = self._chunked_upload(upload_url, data_collected,
+                                          {'filename': file_name, 'filetype': mime_type},
+                                          headers)
+        else:
+            files = {
+                'file': (file_name, open(data_collected, 'rb'), mime_type)}
+            net_logger.info("POST %s", upload_url)
+            upload = self.session.post(upload_url, files=files, headers=headers)
 
         logger.debug("Upload status: %s %s %s",
                      upload.status_code, upload.reason, upload.text)
@@ -810,14 +921,20 @@ class InsightsConnection(object):
         c_facts = json.dumps(c_facts)
         logger.debug('Canonical facts collected:\n%s', c_facts)
 
-        files = {
-            'file': (file_name, open(data_collected, 'rb'), content_type),
-            'metadata': c_facts
-        }
         logger.debug("Uploading %s to %s", data_collected, upload_url)
 
-        net_logger.info("POST %s", upload_url)
-        upload = self.session.post(upload_url, files=files, headers={})
+        if self.config.upload_chunk_size:
+            upload = self._chunked_upload(upload_url, data_collected,
+                                          {'filename': file_name, 'filetype': content_type,
+                                           'metadata': c_facts},
+                                          {})
+        else:
+            files = {
+                'file': (file_name, open(data_collected, 'rb'), content_type),
+                'metadata': c_facts
+            }
+            net_logger.info("POST %s", upload_url)
+            upload = self.session.post(upload_url, files=files, headers={})
 
         logger.debug("Upload status: %s %s %s",
                      upload.status_code, upload.reason, upload.text)
@@ -9,8 +9,13 @@ from . import archive
 import logging
 import copy
 import glob
+import math
 import six
 import shlex
+import sys
+import threading
+import time
+from collections import deque
 from subprocess import Popen, PIPE, STDOUT
 from tempfile import NamedTemporaryFile
 
@@ -19,6 +24,7 @@ from ..contrib.soscleaner import SOSCleaner
 from .utilities import _expand_paths, get_version_info
 from .constants import InsightsConstants as constants
 from .insights_spec import InsightsFile, InsightsCommand
+from .redaction import Redactor, load_sed_rules
 
 APP_NAME = constants.app_name
 logger = logging.getLogger(__name__)
@@ -171,7 +177,9 @@ class DataCollector(object):
                 logger.warn("WARNING: Skipping patterns found in remove.conf")
             except LookupError:
                 logger.debug('Patterns section of remove.conf is empty.')
+        redactor = self._get_redactor(exclude)
 
+        specs = []
         for c in conf['commands']:
             # remember hostname archive path
             if c.get('symbolic_name') == 'hostname':
@@ -186,8 +194,8 @@ class DataCollector(object):
                     if s['command'] in rm_commands:
                         logger.warn("WARNING: Skipping command %s", s['command'])
                         continue
-                    cmd_spec = InsightsCommand(self.config, s, exclude, self.mountpoint)
-                    self.archive.add_to_archive(cmd_spec)
+                    cmd_spec = InsightsCommand(self.config, s, exclude, self.mountpoint, redactor)
+                    specs.append(cmd_spec)
         for f in conf['files']:
             rm_files = rm_conf.get('files', [])
             if f['file'] in rm_files or f.get('symbolic_name') in rm_files:
@@ -199,8 +207,8 @@ class DataCollector(object):
                     if s['file'] in rm_conf.get('files', []):
                         logger.warn("WARNING: Skipping file %s", s['file'])
                     else:
-                        file_spec = InsightsFile(s, exclude, self.mountpoint)
-                        self.archive.add_to_archive(file_spec)
+                        file_spec = InsightsFile(s, exclude, self.mountpoint, redactor)
+                        specs.append(file_spec)
         if 'globs' in conf:
             for g in conf['globs']:
                 glob_specs = self._parse_glob_spec(g)
@@ -208,8 +216,9 @@ class DataCollector(object):
                     if g['file'] in rm_conf.get('files', []):
                         logger.warn("WARNING: Skipping file %s", g)
                     else:
-                        glob_spec = InsightsFile(g, exclude, self.mountpoint)
-                        self.archive.add_to_archive(glob_spec)
+                        glob_spec = InsightsFile(g, exclude, self.mountpoint, redactor)
+                        specs.append(glob_spec)
+        self._collect_specs(specs)
         logger.debug('Spec collection finished.')
 
         # collect metadata
@@ -219,6 +228,71 @@ class DataCollector(object):
         self._write_version_info()
         logger.debug('Metadata collection finished.')
 
+    def _get_redactor(self, exclude):
+        '''
+        Compile the sed rules and the remove.conf patterns once so specs can
+        redact their output in process. Returns None if the sed rules can't
+        be compiled, in which case each spec runs sed and grep.
+        '''
+        try:
+            rules = load_sed_rules(constants.default_sed_file)
+        except ValueError as e:
+            logger.debug('Redacting with sed: %s', e)
+            return None
+        return Redactor(rules, exclude)
+
+    def _collect_specs(self, specs):
+        '''
+        Add the output of each spec to the archive. Up to
+        config.collection_workers specs are collected at once. Once
+        config.collection_timeout seconds have passed, specs that haven't
+        started are skipped, and running commands are killed.
+        '''
+        workers = self.config.collection_workers or 1
+        deadline = None
+        if self.config.collection_timeout:
+            deadline = time.time() + self.config.collection_timeout
+
+        def collect(spec):
+            if deadline is not None:
+                remaining = int(math.ceil(deadline - time.time()))
+                if remaining <= 0:
+                    logger.warn("WARNING: Collection timed out, skipping %s", spec.archive_path)
+                    return
+                # only commands have a timeout
+                if hasattr(spec, 'timeout'):
+                    spec.timeout = min(spec.timeout, remaining)
+            self.archive.add_to_archive(spec)
+
+        if workers == 1:
+            for spec in specs:
+                collect(spec)
+            return
+
+        pending = deque(specs)
+        errors = []
+
+        def work():
+            while not errors:
+                try:
+                    spec = pending.popleft()
+                except IndexError:
+                    return
+                try:
+                    collect(spec)
+                except Exception:
+                    errors.append(sys.exc_info())
+
+        logger.debug('Collecting with %s workers...', workers)
+        threads = [threading.Thread(target=work) for _ in range(min(workers, len(specs)))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            six.reraise(*errors[0])
+
     def done(self, conf, rm_conf):
         """
         Do finalization stuff
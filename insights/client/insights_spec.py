@@ -18,10 +18,12 @@ class InsightsSpec(object):
     '''
     A spec loaded from the uploader.json
     '''
-    def __init__(self, config, spec, exclude):
+    def __init__(self, config, spec, exclude, redactor=None):
         self.config = config
         # exclusions patterns for this spec
         self.exclude = exclude
+        # in-process replacement for the sed and grep pipeline, if any
+        self.redactor = redactor
         # pattern for spec collection
         self.pattern = spec['pattern'] if spec['pattern'] else None
 
@@ -30,12 +32,14 @@ class InsightsCommand(InsightsSpec):
     '''
     A command spec
     '''
-    def __init__(self, config, spec, exclude, mountpoint):
-        InsightsSpec.__init__(self, config, spec, exclude)
+    def __init__(self, config, spec, exclude, mountpoint, redactor=None):
+        InsightsSpec.__init__(self, config, spec, exclude, redactor)
         self.command = spec['command'].replace(
             '{CONTAINER_MOUNT_POINT}', mountpoint)
         self.archive_path = mangle.mangle_command(self.command)
         self.is_hostname = spec.get('symbolic_name') == 'hostname'
+        # seconds before the command is killed
+        self.timeout = config.cmd_timeout
         if not six.PY3:
             self.command = self.command.encode('utf-8', 'ignore')
 
@@ -51,7 +55,7 @@ class InsightsCommand(InsightsSpec):
         # all commands should timeout after a long interval so the client does not hang
         # prepend native nix 'timeout' implementation
         timeout_command = 'timeout -s KILL %s %s' % (
-            self.config.cmd_timeout, self.command)
+            self.timeout, self.command)
 
         # ensure consistent locale for collected command output
         cmd_env = {'LC_ALL': 'C',
@@ -74,6 +78,13 @@ class InsightsCommand(InsightsSpec):
             else:
                 raise err
 
+        if self.redactor is not None:
+            output = self.redactor.redact(proc0.stdout, self.pattern)
+            proc0.stdout.close()
+            proc0.wait()
+            logger.debug("Proc0 Status: %s", proc0.returncode)
+            return output
+
         dirty = False
 
         cmd = "sed -rf " + constants.default_sed_file
@@ -138,8 +149,8 @@ class InsightsFile(InsightsSpec):
     '''
     A file spec
     '''
-    def __init__(self, spec, exclude, mountpoint):
-        InsightsSpec.__init__(self, None, spec, exclude)
+    def __init__(self, spec, exclude, mountpoint, redactor=None):
+        InsightsSpec.__init__(self, None, spec, exclude, redactor)
         # substitute mountpoint for collection
         self.real_path = os.path.join(mountpoint, spec['file'].lstrip('/'))
         self.archive_path = spec['file']
@@ -152,6 +163,14 @@ class InsightsFile(InsightsSpec):
             logger.debug('File %s does not exist', self.real_path)
             return
 
+        if self.redactor is not None:
+            try:
+                with open(self.real_path, 'rb') as f:
+                    return self.redactor.redact(f, self.pattern)
+            except IOError as e:
+                logger.debug('Could not read %s: %s', self.real_path, e)
+                return
+
         cmd = []
         cmd.append('sed')
         cmd.append('-rf')
@@ -0,0 +1,358 @@
+"""
+In-process replacement for the ``sed -rf`` and ``grep -F`` pipeline that the
+output of every InsightsSpec used to go through. The sed rules and the
+remove.conf exclusions are compiled once per collection, and each spec's
+output is redacted and filtered in a single pass over its lines.
+
+Only sed scripts made of ``s`` commands are understood. :func:`parse_sed_script`
+raises ValueError for anything else, and the caller falls back to running
+sed. Commands that python can't match exactly like sed are still run by
+sed, over all of a spec's lines at once.
+"""
+from __future__ import absolute_import
+import os
+import re
+from subprocess import PIPE, Popen
+
+import six
+
+from insights.util.line_filter import compile_strings
+
+
+def _bracket_end(line, i):
+    """
+    Returns the index of the ``]`` closing the bracket expression that starts
+    at ``line[i]``.
+    """
+    j = i + 1
+    if line[j:j + 1] == '^':
+        j += 1
+    if line[j:j + 1] == ']':
+        j += 1
+    while j < len(line):
+        if line[j:j + 2] in ('[:', '[=', '[.'):
+            end = line.find(line[j + 1] + ']', j + 2)
+            if end < 0:
+                break
+            j = end + 2
+        elif line[j] == ']':
+            return j
+        else:
+            j += 1
+    raise ValueError('Unterminated bracket expression: %s' % line)
+
+
+def _split_command(line):
+    """
+    Splits ``s/regex/replacement/flags`` on its delimiter, which can be any
+    character and can be escaped with a backslash. Like GNU sed, the
+    delimiter is literal inside a bracket expression of the regex.
+    """
+    if len(line) < 2 or line[0] != 's':
+        raise ValueError('Unsupported sed command: %s' % line)
+    delim = line[1]
+    parts = []
+    cur = []
+    i = 2
+    while i < len(line):
+        ch = line[i]
+        if ch == '[' and not parts:
+            end = _bracket_end(line, i)
+            cur.append(line[i:end + 1])
+            i = end + 1
+            continue
+        if ch == '\\' and i + 1 < len(line):
+            nxt = line[i + 1]
+            if nxt != delim:
+                cur.append(ch + nxt)
+            elif parts:
+                cur.append(delim)
+            else:
+                # an escaped delimiter is always literal in the regex
+                cur.append(re.escape(delim))
+            i += 2
+            continue
+        if ch == delim:
+            parts.append(''.join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+        i += 1
+    parts.append(''.join(cur))
+    if len(parts) != 3:
+        raise ValueError('Unsupported sed command: %s' % line)
+    return parts
+
+
+class _Inexact(ValueError):
+    """
+    Raised for a sed regex or replacement that python can't match or
+    substitute exactly the same way.
+    """
+    pass
+
+
+def _translate_bracket(content):
+    """
+    Translates the inside of a POSIX bracket expression, where a backslash
+    is an ordinary character unless it starts a GNU escape.
+    """
+    out = ['[']
+    j = 0
+    if content[j:j + 1] == '^':
+        out.append('^')
+        j += 1
+    if content[j:j + 1] == ']':
+        out.append('\\]')
+        j += 1
+    while j < len(content):
+        if content.startswith(('[:', '[=', '[.'), j):
+            # character classes depend on sed's locale
+            raise _Inexact('Unsupported bracket expression: %s' % content)
+        elif content[j] == '\\' and content[j + 1:j + 2].isalnum():
+            # GNU sed turns \n, \t and others into characters even here
+            raise _Inexact('Unsupported escape in bracket expression: %s' % content)
+        else:
+            ch = content[j]
+            out.append('\\' + ch if ch in '\\[]^&~|' else ch)
+            j += 1
+    out.append(']')
+    return ''.join(out)
+
+
+def _translate_regex(regex):
+    """
+    Translates a POSIX extended regular expression to a python one that
+    matches the same text.
+
+    POSIX matches the longest text at the leftmost position, and python
+    takes the first match it finds. The two agree as long as only single
+    characters are repeated, so alternation, repeated groups, and
+    expressions that can match an empty string raise _Inexact. So do
+    back references, character classes and GNU escapes other than
+    ``\\t``. What those match depends on sed's locale.
+    """
+    out = []
+    min_len = 0
+    depth = 0
+    prev = None
+    i = 0
+    while i < len(regex):
+        ch = regex[i]
+        if ch == '[':
+            end = _bracket_end(regex, i)
+            out.append(_translate_bracket(regex[i + 1:end]))
+            min_len += 1
+            prev = 'atom'
+            i = end + 1
+        elif ch == '\\':
+            if i + 1 == len(regex):
+                raise ValueError('Trailing backslash: %s' % regex)
+            nxt = regex[i + 1]
+            if nxt == 't':
+                out.append('\\t')
+                min_len += 1
+                prev = 'atom'
+            elif nxt.isalnum() or nxt in '<>`\'':
+                # \w, \s and \b follow sed's locale, and \` and \' anchor
+                # the pattern space
+                raise _Inexact('Unsupported escape \\%s: %s' % (nxt, regex))
+            else:
+                out.append(re.escape(nxt))
+                min_len += 1
+                prev = 'atom'
+            i += 2
+        elif ch in '*+?{':
+            if ch == '{':
+                m = re.match(r'\{(\d+)(,\d*)?\}', regex[i:])
+                if m is None:
+                    raise _Inexact('Unsupported interval: %s' % regex)
+                token, low = m.group(0), int(m.group(1))
+            else:
+                token, low = ch, 0 if ch in '*?' else 1
+            if prev != 'atom':
+                raise _Inexact('Only single characters can be repeated: %s' % regex)
+            out.append(token)
+            min_len += low - 1
+            prev = 'repeat'
+            i += len(token)
+        elif ch == '|':
+            raise _Inexact('Alternation: %s' % regex)
+        elif ch == '(':
+            out.append('(')
+            depth += 1
+            prev = 'group'
+            i += 1
+        elif ch == ')':
+            if not depth:
+                raise ValueError('Unmatched ): %s' % regex)
+            out.append(')')
+            depth -= 1
+            prev = 'group'
+            i += 1
+        elif ch in '^$':
+            out.append(ch)
+            prev = 'anchor'
+            i += 1
+        else:
+            out.append('.' if ch == '.' else re.escape(ch))
+            min_len += 1
+            prev = 'atom'
+            i += 1
+    if depth:
+        raise ValueError('Unmatched (: %s' % regex)
+    if min_len < 1:
+        raise _Inexact('Matches an empty string: %s' % regex)
+    return ''.join(out)
+
+
+def _translate_replacement(repl, groups):
+    """
+    Translates a sed replacement to a template for :func:`re.sub`.
+    """
+    out = []
+    i = 0
+    while i < len(repl):
+        ch = repl[i]
+        if ch == '\\' and i + 1 < len(repl):
+            nxt = repl[i + 1]
+            if nxt.isdigit():
+                if int(nxt) > groups:
+                    raise ValueError('Invalid reference \\%s: %s' % (nxt, repl))
+                out.append('\\g<%s>' % nxt)
+            elif nxt == 't':
+                out.append('\t')
+            elif nxt.isalnum():
+                # \n splits the line, and GNU sed has case conversions
+                raise _Inexact('Unsupported escape \\%s: %s' % (nxt, repl))
+            else:
+                out.append(nxt.replace('\\', '\\\\'))
+            i += 2
+            continue
+        if ch == '&':
+            out.append('\\g<0>')
+        elif ch == '\\':
+            out.append('\\\\')
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def parse_sed_script(text):
+    """
+    Compiles a sed script of ``s`` commands for extended regular expressions
+    (``sed -r``) into a list of rules. A rule is a ``(regex, replacement,
+    count)`` tuple for :func:`re.sub`, or the text of the command if python
+    can't match or substitute it exactly like sed. Those are left to sed.
+
+    Raises:
+        ValueError: if the script has anything but ``s`` commands with the
+            ``g`` and ``I`` flags, blank lines, and comments, or if a command
+            is invalid.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        regex, repl, flags = _split_command(line)
+        count = 1
+        re_flags = 0
+        for flag in flags.strip():
+            if flag == 'g':
+                count = 0
+            elif flag in 'Ii':
+                re_flags |= re.IGNORECASE
+            else:
+                raise ValueError('Unsupported sed flag: %s' % line)
+        try:
+            compiled = re.compile(_translate_regex(regex), re_flags)
+            rules.append((compiled, _translate_replacement(repl, compiled.groups), count))
+        except _Inexact:
+            rules.append(line)
+        except re.error as e:
+            raise ValueError('Invalid sed regex %s: %s' % (regex, e))
+    return rules
+
+
+_SED_RULES = {}
+
+
+def load_sed_rules(path):
+    """
+    Returns the compiled rules of the sed script at path. Rules are cached
+    until the file changes.
+
+    Raises:
+        ValueError: if the script can't be read or compiled.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+        key = (path, mtime)
+        if key not in _SED_RULES:
+            with open(path) as f:
+                _SED_RULES[key] = parse_sed_script(f.read())
+        return _SED_RULES[key]
+    except (IOError, OSError) as e:
+        raise ValueError('Unable to read %s: %s' % (path, e))
+
+
+class Redactor(object):
+    """
+    Applies sed rules and then drops lines containing any of the exclude
+    strings, like ``sed -rf | grep -F -v -f``. A spec's pattern list can be
+    given to keep only lines containing one of its strings, like a final
+    ``grep -F -f``.
+
+    Args:
+        rules (list): sed rules from :func:`load_sed_rules`.
+        exclude (list): literal strings from remove.conf.
+    """
+    def __init__(self, rules, exclude=None):
+        self.rules = rules
+        self.exclude = compile_strings(exclude)
+        # runs of rules python applies, and scripts of the commands left to sed
+        self.steps = []
+        for rule in rules:
+            sed = isinstance(rule, six.string_types)
+            if not self.steps or self.steps[-1][0] != sed:
+                self.steps.append((sed, []))
+            self.steps[-1][1].append(rule)
+
+    @staticmethod
+    def _substitute(rules, lines):
+        for line in lines:
+            for regex, repl, count in rules:
+                line = regex.sub(repl, line, count)
+            yield line
+
+    @staticmethod
+    def _sed(commands, lines):
+        proc = Popen(['sed', '-r', '-e', '\n'.join(commands)], stdin=PIPE, stdout=PIPE)
+        data = ''.join(l + '\n' for l in lines).encode('utf-8')
+        output = proc.communicate(data)[0].decode('utf-8', 'ignore')
+        return output.split('\n')[:-1] if output else []
+
+    def __call__(self, lines, pattern=None):
+        """
+        Yields the redacted lines that pass the filters.
+        """
+        for sed, rules in self.steps:
+            lines = self._sed(rules, lines) if sed else self._substitute(rules, lines)
+        exclude = self.exclude
+        include = compile_strings(pattern)
+        for line in lines:
+            if exclude and exclude(line):
+                continue
+            if include and not include(line):
+                continue
+            yield line
+
+    def redact(self, stream, pattern=None):
+        """
+        Returns the text of a binary stream of lines after redaction and
+        filtering, as the sed and grep pipeline would produce it.
+        """
+        lines = (l.decode('utf-8', 'ignore').rstrip('\n') for l in stream)
+        return '\n'.join(self(lines, pattern)).strip()
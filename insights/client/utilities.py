@@ -2,6 +2,7 @@
 Utility functions
 """
 from __future__ import absolute_import
+import errno
 import socket
 import os
 import logging
@@ -181,8 +182,9 @@ def write_data_to_file(data, filepath):
     '''
     try:
         os.makedirs(os.path.dirname(filepath), 0o700)
-    except OSError:
-        pass
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
 
     write_to_disk(filepath, content=data)
 
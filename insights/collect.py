@@ -8,10 +8,11 @@ runs all datasources in ``insights.specs.Specs`` and
 ``insights.specs.Specs``.
 """
 from __future__ import print_function
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
 import argparse
 import logging
 import os
+import tarfile
 import tempfile
 import yaml
 
@@ -21,6 +22,7 @@ from insights import apply_configs, apply_default_enabled, dr
 from insights.core import blacklist
 from insights.core.serde import Hydration
 from insights.util import fs
+from insights.util.compression import ParallelCompressor
 from insights.util.subproc import call
 
 SAFE_ENV = {
@@ -65,10 +67,22 @@ client:
         - name: insights.specs.Specs
           enabled: true
 
+    # how persisted components are saved. if packed is true, the metadata and
+    # raw data of every component go into a single indexed file instead of a
+    # file each. compress applies zlib to each entry of that file. codec is the
+    # encoding of the metadata: json, or msgpack if the msgpack package is
+    # installed.
+    serialization:
+        packed: false
+        compress: false
+        codec: json
+
     run_strategy:
         name: parallel
         args:
             max_workers: null
+            # maximum number of components submitted to the pool at once
+            max_in_flight: null
 
 plugins:
     # disable everything by default
@@ -178,18 +192,26 @@ def get_to_persist(persisters):
     return results
 
 
-def create_archive(path, remove_path=True):
+def create_archive(path, remove_path=True, workers=None):
     """
     Creates a tar.gz of the path using the path basename + "tar.gz"
     The resulting file is in the parent directory of the original path, and
     the original path is removed.
+
+    If workers is more than 1, the archive is compressed on that many threads
+    as a multi-member gzip file.
     """
     root_path = os.path.dirname(path)
     relative_path = os.path.basename(path)
     archive_path = path + ".tar.gz"
 
-    cmd = [["tar", "-C", root_path, "-czf", archive_path, relative_path]]
-    call(cmd, env=SAFE_ENV)
+    if workers and workers > 1:
+        with ParallelCompressor(archive_path, workers=workers) as out:
+            with closing(tarfile.open(fileobj=out, mode="w")) as tf:
+                tf.add(path, arcname=relative_path)
+    else:
+        cmd = [["tar", "-C", root_path, "-czf", archive_path, relative_path]]
+        call(cmd, env=SAFE_ENV)
     if remove_path:
         fs.remove(path)
     return archive_path
@@ -214,7 +236,7 @@ def get_pool(parallel, kwargs):
         yield None
 
 
-def collect(manifest=default_manifest, tmp_path=None, compress=False):
+def collect(manifest=default_manifest, tmp_path=None, compress=False, compression_workers=None):
     """
     This is the collection entry point. It accepts a manifest, a temporary
     directory in which to store output, and a boolean for optional compression.
@@ -228,6 +250,7 @@ def collect(manifest=default_manifest, tmp_path=None, compress=False):
         compress (boolean): True to create a tar.gz and remove the original
             workspace containing output. False to leave the workspace without
             creating a tar.gz
+        compression_workers (int): threads to compress the tar.gz with.
 
     Returns:
         The full path to the created tar.gz or workspace.
@@ -245,6 +268,7 @@ def collect(manifest=default_manifest, tmp_path=None, compress=False):
     apply_blacklist(client.get("blacklist", {}))
 
     to_persist = get_to_persist(client.get("persist", set()))
+    serialization = client.get("serialization", {})
 
     hostname = call("hostname -f", env=SAFE_ENV).strip()
     suffix = datetime.utcnow().strftime("%Y%m%d%H%M%S")
@@ -259,14 +283,24 @@ def collect(manifest=default_manifest, tmp_path=None, compress=False):
     broker[ctx.__class__] = ctx
 
     parallel = run_strategy.get("name") == "parallel"
-    pool_args = run_strategy.get("args", {})
+    pool_args = dict(run_strategy.get("args", {}))
+    max_in_flight = pool_args.pop("max_in_flight", None)
     with get_pool(parallel, pool_args) as pool:
-        h = Hydration(output_path, pool=pool)
+        # The persister runs in the pool's threads once dr.run schedules
+        # components there. Giving Hydration the same pool would make it
+        # block in pool.map from inside a pool thread, which deadlocks when
+        # every worker does the same, so results are serialized in the
+        # thread that persists them.
+        h = Hydration(output_path,
+                      packed=serialization.get("packed", False),
+                      compress=serialization.get("compress", False),
+                      codec=serialization.get("codec", "json"))
         broker.add_observer(h.make_persister(to_persist))
-        dr.run_all(broker=broker, pool=pool)
+        dr.run(broker=broker, pool=pool, max_in_flight=max_in_flight)
+        h.close()
 
     if compress:
-        return create_archive(output_path)
+        return create_archive(output_path, workers=compression_workers)
     return output_path
 
 
@@ -278,6 +312,7 @@ def main():
     p.add_argument("-v", "--verbose", help="Verbose output.", action="store_true")
     p.add_argument("-d", "--debug", help="Debug output.", action="store_true")
     p.add_argument("-c", "--compress", help="Compress", action="store_true")
+    p.add_argument("-w", "--compression-workers", type=int, help="Threads to compress with.")
     args = p.parse_args()
 
     level = logging.WARNING
@@ -297,7 +332,8 @@ def main():
         manifest = default_manifest
 
     out_path = args.out_path or tempfile.gettempdir()
-    archive = collect(manifest, out_path, compress=args.compress)
+    archive = collect(manifest, out_path, compress=args.compress,
+                      compression_workers=args.compression_workers)
     print(archive)
 
 
@@ -18,6 +18,7 @@ Available commands:
   inspect     Execute component and shell out to ipython for evaluation.
   info        View info and docs for Insights Core components.
   run         Run insights-core against host or an archive.
+  worker      Evaluate a stream of archives in a long lived process.
 """
 
 
@@ -67,6 +68,10 @@ class InsightsCli(object):
             sys.path.insert(0, "")
         run(print_summary=True)
 
+    def worker(self):
+        from .worker import main as worker_main
+        worker_main()
+
 
 def fix_arg_dashes():
 
@@ -19,6 +19,7 @@ from insights.core.plugins import ContentException
 from insights.core.serde import deserializer, serializer
 from . import ls_parser
 from insights.util import deprecated
+from insights.util.line_filter import compile_strings
 
 import sys
 # Since XPath expression is not supported by the ElementTree in Python 2.6,
@@ -72,7 +73,18 @@ class Parser(object):
         'content.conf'
     """
 
+    shareable = False
+    """
+    bool: Set to True if the facts of a parser depend only on its content and
+    not on the path or args of its context. Instances parsed from identical
+    content in a run then share their facts, so rules must not modify them.
+    """
+
     def __init__(self, context):
+        self._handle_context(context)
+        self._handle_content(context)
+
+    def _handle_context(self, context):
         self.file_path = os.path.join("/", context.relative_path) if context.relative_path is not None else None
         """str: Full context path of the input file."""
         self.file_name = os.path.basename(context.path) \
@@ -83,7 +95,6 @@ class Parser(object):
         else:
             self.last_client_run = None
         self.args = context.args if hasattr(context, "args") else None
-        self._handle_content(context)
 
     def _handle_content(self, context):
         self.parse_content(context.content)
@@ -728,6 +739,7 @@ class ScanMeta(type):
     def __new__(cls, name, parents, dct):
         dct["scanners"] = []
         dct["scanner_keys"] = set()
+        dct["scanner_tokens"] = set()
         return super(ScanMeta, cls).__new__(cls, name, parents, dct)
 
 
@@ -846,6 +858,112 @@ class Scannable(six.with_metaclass(ScanMeta, Parser)):
                 scanner(self, obj)
 
 
+_TIME_PARSERS = {}
+
+
+def _time_format_key(time_format):
+    if isinstance(time_format, dict):
+        return tuple(time_format.values())
+    if isinstance(time_format, list):
+        return tuple(time_format)
+    if isinstance(time_format, six.string_types):
+        return time_format
+
+
+def _compile_time_format(time_format):
+    """
+    Returns a tuple of a regular expression that finds time stamps in the
+    given ``strptime()`` format or formats, a function that parses a found
+    time stamp, and whether the formats include the year. Results are cached
+    by format.
+    """
+    key = _time_format_key(time_format)
+    if key is not None and key in _TIME_PARSERS:
+        return _TIME_PARSERS[key]
+
+    # Annoyingly, strptime insists that it get the whole time string and
+    # nothing but the time string.  However, for most logs we only have a
+    # string with the timestamp in it.  We can't just catch the ValueError
+    # because at that point we do not actually have a valid datetime
+    # object.  So we convert the time format string to a regex, use that
+    # to find just the timestamp, and then use strptime on that.  Thanks,
+    # Python.  All these need to cope with different languages and
+    # character sets.  Note that we don't include time zone or other
+    # outputs (e.g. day-of-year) that don't usually occur in time stamps.
+    format_conversion_for = {
+        'a': r'\w{3}', 'A': r'\w+',  # Week day name
+        'w': r'[0123456]',  # Week day number
+        'd': r'([0 ][123456789]|[12]\d|3[01])',  # Day of month
+        'b': r'\w{3}', 'B': r'\w+',  # Month name
+        'm': r'([0 ]\d|1[012])',  # Month number
+        'y': r'\d{2}', 'Y': r'\d{4}',  # Year
+        'H': r'([01 ]\d|2[0123])',  # Hour - 24 hour format
+        'I': r'([0 ]?\d|1[012])',  # Hour - 12 hour format
+        'p': r'\w{2}',  # AM / PM
+        'M': r'([012345]\d)',  # Minutes
+        'S': r'([012345]\d|60)',  # Seconds, including leap second
+        'f': r'\d{6}',  # Microseconds
+    }
+
+    # Construct the regex from the time string
+    timefmt_re = re.compile(r'%(\w)')
+
+    def replacer(match):
+        if match.group(1) in format_conversion_for:
+            return format_conversion_for[match.group(1)]
+        else:
+            raise ParseException(
+                "get_after does not understand strptime format '{c}'".format(
+                    c=match.group(0)
+                )
+            )
+
+    # Please do not attempt to be tricky and put a regular expression
+    # inside your time format, as we are going to also use it in
+    # strptime too and that may not work out so well.
+
+    # Check time_format - must be string or list.  Set the 'logs_have_year'
+    # flag and timestamp parser function appropriately.
+    # Grab values of dict as a list first
+    if isinstance(time_format, dict):
+        time_format = list(time_format.values())
+    if isinstance(time_format, six.string_types):
+        logs_have_year = ('%Y' in time_format or '%y' in time_format)
+        time_re = re.compile('(' + timefmt_re.sub(replacer, time_format) + ')')
+
+        # Curry strptime with time_format string.
+        def test_parser(logstamp):
+            return datetime.datetime.strptime(logstamp, time_format)
+        parse_fn = test_parser
+    elif isinstance(time_format, list):
+        logs_have_year = all('%Y' in tf or '%y' in tf for tf in time_format)
+        time_re = re.compile('(' + '|'.join(
+            timefmt_re.sub(replacer, tf) for tf in time_format
+        ) + ')')
+
+        def test_all_parsers(logstamp):
+            # One of these must match, because the regex has selected only
+            # strings that will match.
+            for tf in time_format:
+                try:
+                    ts = datetime.datetime.strptime(logstamp, tf)
+                except ValueError:
+                    pass
+            return ts
+        parse_fn = test_all_parsers
+    else:
+        raise ParseException(
+            "get_after does not recognise time formats of type {t}".format(
+                t=type(time_format)
+            )
+        )
+
+    result = (time_re, parse_fn, logs_have_year)
+    if key is not None:
+        _TIME_PARSERS[key] = result
+    return result
+
+
 class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
     """
     Class for parsing log file content.
@@ -930,8 +1048,7 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
         Return ``True`` if any line contains the given text string or all the
         strings in the given list.
         """
-        search_by_expression = self._valid_search(s)
-        return any(search_by_expression(l) for l in self.lines)
+        return bool(self._find_lines(s))
 
     def _parse_line(self, line):
         """
@@ -953,6 +1070,61 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
         elif s is not None:
             raise TypeError('Search items must be given as a string or a list of strings')
 
+    def _iter_lines(self):
+        """
+        Returns an iterable of every line of the content for searches that
+        can't use the token index.
+        """
+        return self.lines
+
+    def _token_index(self, tokens):
+        """
+        Returns a dictionary of each token to the ascending indexes of the
+        lines that contain it. The index is built lazily and kept for later
+        searches. Tokens not yet in the index are found together with the
+        tokens of all scanners registered on the class in one pass over the
+        lines, and lines containing none of them are rejected by a single
+        compiled pattern.
+        """
+        lines = self.lines
+        index = self.__dict__.get("_token_lines")
+        if index is None or self._indexed_lines is not lines or self._indexed_len != len(lines):
+            index = self._token_lines = {}
+            self._indexed_lines = lines
+            self._indexed_len = len(lines)
+
+        missing = set(t for t in tokens if t not in index)
+        if missing:
+            missing.update(t for t in self.scanner_tokens if t not in index)
+            missing = list(missing)
+            found = dict((t, []) for t in missing)
+            prefilter = compile_strings(missing)
+            for i, l in enumerate(lines):
+                if prefilter(l):
+                    for t in missing:
+                        if t in l:
+                            found[t].append(i)
+            index.update(found)
+        return index
+
+    def _find_lines(self, s, check=all):
+        """
+        Returns the ascending indexes of the lines that contain `s`, which
+        is a string or a list of strings combined with `check`.
+        """
+        search_by_expression = self._valid_search(s, check)
+        if s is None or check not in (all, any):
+            return [i for i, l in enumerate(self.lines) if search_by_expression(l)]
+
+        tokens = [s] if isinstance(s, six.string_types) else s
+        index = self._token_index(tokens)
+        if len(tokens) == 1:
+            return index[tokens[0]]
+        found = [set(index[t]) for t in tokens]
+        if check is all:
+            return sorted(set.intersection(*found))
+        return sorted(set.union(*found))
+
     def get(self, s, check=all, num=None, reverse=False):
         """
         Returns all lines that contain `s` anywhere and wrap them in a list of
@@ -974,14 +1146,11 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
         """
         if num is not None and not isinstance(num, six.integer_types):
             raise TypeError('Required numbers must be given as a integer')
-        ret = []
-        search_by_expression = self._valid_search(s, check)
-        lines = self.lines[::-1] if reverse else self.lines
-        for l in lines:
-            if (num is None or len(ret) < num) and search_by_expression(l):
-                ret.append(self._parse_line(l))
-        # re-sort to original order
-        return ret[::-1] if reverse else ret
+        found = self._find_lines(s, check)
+        if num is not None:
+            found = (found[-num:] if reverse else found[:num]) if num > 0 else []
+        lines = self.lines
+        return [self._parse_line(lines[i]) for i in found]
 
     @classmethod
     def scan(cls, result_key, func):
@@ -1020,11 +1189,10 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
             (list): list of dictionaries corresponding to the parsed lines contain the `token`.
         """
         def _scan(self):
-            search_by_expression = self._valid_search(token, check)
-            lines = self.lines[::-1] if reverse else self.lines
-            return any(search_by_expression(l) for l in lines)
+            return bool(self._find_lines(token, check))
 
         cls.scan(result_key, _scan)
+        cls._add_scanner_tokens(token)
 
     @classmethod
     def keep_scan(cls, result_key, token, check=all, num=None, reverse=False):
@@ -1046,6 +1214,7 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
             return self.get(token, check=check, num=num, reverse=reverse)
 
         cls.scan(result_key, _scan)
+        cls._add_scanner_tokens(token)
 
     @classmethod
     def last_scan(cls, result_key, token, check=all):
@@ -1066,6 +1235,18 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
             return ret[0] if ret else dict()
 
         cls.scan(result_key, _scan)
+        cls._add_scanner_tokens(token)
+
+    @classmethod
+    def _add_scanner_tokens(cls, token):
+        """
+        Records the strings a scanner searches for so the lines containing
+        them are found for all scanners in the same pass.
+        """
+        if isinstance(token, six.string_types):
+            cls.scanner_tokens.add(token)
+        elif isinstance(token, list):
+            cls.scanner_tokens.update(t for t in token if isinstance(t, six.string_types))
 
     def get_after(self, timestamp, s=None):
         """
@@ -1132,127 +1313,193 @@ class LogFileOutput(six.with_metaclass(ScanMeta, Parser)):
                 made to recognise or parse the time zone or other obscure
                 values like day of year or week of year.
         """
-        time_format = self.time_format
-
-        # Annoyingly, strptime insists that it get the whole time string and
-        # nothing but the time string.  However, for most logs we only have a
-        # string with the timestamp in it.  We can't just catch the ValueError
-        # because at that point we do not actually have a valid datetime
-        # object.  So we convert the time format string to a regex, use that
-        # to find just the timestamp, and then use strptime on that.  Thanks,
-        # Python.  All these need to cope with different languages and
-        # character sets.  Note that we don't include time zone or other
-        # outputs (e.g. day-of-year) that don't usually occur in time stamps.
-        format_conversion_for = {
-            'a': r'\w{3}', 'A': r'\w+',  # Week day name
-            'w': r'[0123456]',  # Week day number
-            'd': r'([0 ][123456789]|[12]\d|3[01])',  # Day of month
-            'b': r'\w{3}', 'B': r'\w+',  # Month name
-            'm': r'([0 ]\d|1[012])',  # Month number
-            'y': r'\d{2}', 'Y': r'\d{4}',  # Year
-            'H': r'([01 ]\d|2[0123])',  # Hour - 24 hour format
-            'I': r'([0 ]?\d|1[012])',  # Hour - 12 hour format
-            'p': r'\w{2}',  # AM / PM
-            'M': r'([012345]\d)',  # Minutes
-            'S': r'([012345]\d|60)',  # Seconds, including leap second
-            'f': r'\d{6}',  # Microseconds
-        }
-
-        # Construct the regex from the time string
-        timefmt_re = re.compile(r'%(\w)')
-
-        def replacer(match):
-            if match.group(1) in format_conversion_for:
-                return format_conversion_for[match.group(1)]
-            else:
-                raise ParseException(
-                    "get_after does not understand strptime format '{c}'".format(
-                        c=match.group(0)
-                    )
-                )
+        time_re, parse_fn, logs_have_year = _compile_time_format(self.time_format)
+        eleven_months = datetime.timedelta(days=330)
 
-        # Please do not attempt to be tricky and put a regular expression
-        # inside your time format, as we are going to also use it in
-        # strptime too and that may not work out so well.
-
-        # Check time_format - must be string or list.  Set the 'logs_have_year'
-        # flag and timestamp parser function appropriately.
-        # Grab values of dict as a list first
-        if isinstance(time_format, dict):
-            time_format = list(time_format.values())
-        if isinstance(time_format, six.string_types):
-            logs_have_year = ('%Y' in time_format or '%y' in time_format)
-            time_re = re.compile('(' + timefmt_re.sub(replacer, time_format) + ')')
-
-            # Curry strptime with time_format string.
-            def test_parser(logstamp):
-                return datetime.datetime.strptime(logstamp, time_format)
-            parse_fn = test_parser
-        elif isinstance(time_format, list):
-            logs_have_year = all('%Y' in tf or '%y' in tf for tf in time_format)
-            time_re = re.compile('(' + '|'.join(
-                timefmt_re.sub(replacer, tf) for tf in time_format
-            ) + ')')
-
-            def test_all_parsers(logstamp):
-                # One of these must match, because the regex has selected only
-                # strings that will match.
-                for tf in time_format:
-                    try:
-                        ts = datetime.datetime.strptime(logstamp, tf)
-                    except ValueError:
-                        pass
-                return ts
-            parse_fn = test_all_parsers
+        def adjust(logstamp):
+            if not logs_have_year:
+                # Substitute timestamp year for logstamp year
+                logstamp = logstamp.replace(year=timestamp.year)
+                if logstamp - timestamp > eleven_months:
+                    # If timestamp in January and log in December, move
+                    # log to previous year
+                    logstamp = logstamp.replace(year=timestamp.year - 1)
+                elif timestamp - logstamp > eleven_months:
+                    # If timestamp in December and log in January, move
+                    # log to next year
+                    logstamp = logstamp.replace(year=timestamp.year + 1)
+            return logstamp
+
+        index = self._timestamp_index()
+        if index is None:
+            # Parse time stamps as the lines go by, and only of the lines
+            # that are searched
+            def parse(match):
+                return parse_fn(match.group(0))
+
+            def stamped_lines():
+                for line in self._iter_lines():
+                    yield line, time_re.search(line)
         else:
-            raise ParseException(
-                "get_after does not recognise time formats of type {t}".format(
-                    t=type(time_format)
-                )
-            )
-
-        # Most logs will appear in string format, but some logs (e.g.
-        # Messages) are available in list-of-dicts format.  So we choose one
-        # of two 'date_compare' functions.  HOWEVER: we still have to check
-        # the string found for a valid date, because log parsing often fails.
-        # Because of generators, we check this per line
-
-        # Now try to find the time stamp in each log line and add lines to
-        # our output if they are currently being included in the log.
-
-        eleven_months = datetime.timedelta(days=330)
+            # Time stamps have already been parsed. If the lines are in time
+            # order, bisect to the first line at or after the timestamp, since
+            # every time stamped line after it is included.
+            def parse(logstamp):
+                return logstamp
+
+            lines = self.lines
+            positions, stamps, ordered = index
+            first = 0
+            if ordered and stamps and adjust(stamps[0]).year == adjust(stamps[-1]).year:
+                hi = len(stamps)
+                while first < hi:
+                    mid = (first + hi) // 2
+                    if adjust(stamps[mid]) < timestamp:
+                        first = mid + 1
+                    else:
+                        hi = mid
+
+            def stamped_lines():
+                j = first
+                start = positions[j] if j < len(positions) else len(lines)
+                for i in range(start, len(lines)):
+                    if j < len(positions) and positions[j] == i:
+                        yield lines[i], stamps[j]
+                        j += 1
+                    else:
+                        yield lines[i], None
+
+        # Lines that do not contain a time stamp are considered part of the
+        # previous line and are included if it was included.
         including_lines = False
         search_by_expression = self._valid_search(s)
-        for line in self.lines:
+        for line, logstamp in stamped_lines():
             # If `s` is not None, keywords must be found in the line
             if s and not search_by_expression(line):
                 continue
-            # Otherwise, search all lines
-            match = time_re.search(line)
-            if match:
-                logstamp = parse_fn(match.group(0))
-                if not logs_have_year:
-                    # Substitute timestamp year for logstamp year
-                    logstamp = logstamp.replace(year=timestamp.year)
-                    if logstamp - timestamp > eleven_months:
-                        # If timestamp in January and log in December, move
-                        # log to previous year
-                        logstamp = logstamp.replace(year=timestamp.year - 1)
-                    elif timestamp - logstamp > eleven_months:
-                        # If timestamp in December and log in January, move
-                        # log to next year
-                        logstamp = logstamp.replace(year=timestamp.year + 1)
-                if logstamp >= timestamp:
-                    # Later - include
-                    including_lines = True
-                    yield self._parse_line(line)
-                else:
-                    # Earlier - start excluding
-                    including_lines = False
-            else:
-                # If we're including lines, add this continuation line
+            if logstamp is not None:
+                including_lines = adjust(parse(logstamp)) >= timestamp
                 if including_lines:
                     yield self._parse_line(line)
+            elif including_lines:
+                # If we're including lines, add this continuation line
+                yield self._parse_line(line)
+
+    def _timestamp_index(self):
+        """
+        Returns a tuple of the indexes of the lines with a time stamp in
+        ``time_format``, the time stamps parsed from them, and whether those
+        time stamps are in order. The index is built on first use and kept
+        until ``lines`` or ``time_format`` changes. Returns ``None`` if a
+        time stamp can't be parsed, so that :meth:`get_after` falls back to
+        parsing the time stamps of the lines that contain what it searches
+        for as it reads them.
+        """
+        lines = self.lines
+        key = (_time_format_key(self.time_format), len(lines))
+        cached = self.__dict__.get("_timestamps")
+        if cached is not None and cached[0] is lines and cached[1] == key:
+            return cached[2]
+
+        time_re, parse_fn, _ = _compile_time_format(self.time_format)
+        positions = []
+        stamps = []
+        try:
+            for i, line in enumerate(lines):
+                match = time_re.search(line)
+                if match:
+                    positions.append(i)
+                    stamps.append(parse_fn(match.group(0)))
+        except ValueError:
+            index = None
+        else:
+            ordered = all(a <= b for a, b in zip(stamps, stamps[1:]))
+            index = (positions, stamps, ordered)
+        self._timestamps = (lines, key, index)
+        return index
+
+
+class StreamingLogFileOutput(LogFileOutput):
+    """
+    A :class:`LogFileOutput` that never holds the whole log in memory. The
+    content is read from the datasource's stream, and ``lines`` keeps only
+    the lines that contain a string searched for by one of the class's
+    ``token_scan``, ``keep_scan`` or ``last_scan`` scanners.
+
+    Searching with :meth:`get` or ``in`` for a string that's not in ``lines``
+    reads the stream again once and adds the lines containing it. Methods
+    that need every line, such as :meth:`get_after`, read the stream each
+    time they're called. Functions registered with :meth:`scan` see only
+    the kept lines, and a ``check`` function other than ``all`` or ``any`` is
+    only applied to lines that contain at least one of the strings.
+
+    Only file-backed content is read more than once. A datasource that runs
+    a command would run it again for every read, and its output could
+    change between runs, so command output is read once and every line is
+    kept, the same as :class:`LogFileOutput`.
+
+    Use this for logs that can be very large when rules only look for
+    specific strings or recent lines.
+
+    Examples:
+        >>> class MyStreamingLogger(StreamingLogFileOutput):
+        ...     pass
+        >>> MyStreamingLogger.keep_scan('more_lines', 'more')
+        >>> my_logger = MyStreamingLogger(context_wrap(contents))
+        >>> my_logger.lines
+        ['Log file line three, and more']
+        >>> my_logger.get('two')
+        [{'raw_message': 'Log file line two'}]
+        >>> my_logger.lines
+        ['Log file line two', 'Log file line three, and more']
+    """
+
+    _keep_all = False
+
+    def _handle_content(self, context):
+        if getattr(context, "cmd", None) and not hasattr(context, "fs"):
+            self._context = None
+            self._keep_all = True
+            self.parse_content(context.content)
+        else:
+            self._context = context
+            self.parse_content(context.stream())
+
+    def parse_content(self, content):
+        """
+        Keeps the lines that the scanners search for, then runs the
+        scanners against them.
+        """
+        self._covered = set(self.scanner_tokens)
+        self.lines = list(content) if self._keep_all else self._keep_lines(content)
+        for scanner in self.scanners:
+            scanner(self)
+
+    def _keep_lines(self, lines):
+        keep = compile_strings(self._covered)
+        if keep is None:
+            return []
+        return [l for l in lines if keep(l)]
+
+    def _iter_lines(self):
+        context = getattr(self, "_context", None)
+        return context.stream() if context is not None else self.lines
+
+    def _timestamp_index(self):
+        return None
+
+    def _token_index(self, tokens):
+        missing = set(t for t in tokens if t not in self._covered)
+        if missing and getattr(self, "_context", None) is not None:
+            self._covered.update(missing)
+            self.lines = self._keep_lines(self._context.stream())
+        return super(StreamingLogFileOutput, self)._token_index(tokens)
+
+    def _find_lines(self, s, check=all):
+        if s is not None and check not in (all, any):
+            tokens = [s] if isinstance(s, six.string_types) else s
+            self._token_index(tokens)
+        return super(StreamingLogFileOutput, self)._find_lines(s, check)
 
 
 class Syslog(LogFileOutput):
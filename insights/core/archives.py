@@ -2,8 +2,11 @@
 
 import logging
 import os
+import posixpath
+import tarfile
 import tempfile
-from contextlib import contextmanager
+import zipfile
+from contextlib import closing, contextmanager
 from insights.util import fs, subproc
 from insights.util.content_type import from_file as content_type_from_file
 
@@ -76,6 +79,150 @@ class TarExtractor(object):
         return self
 
 
+class SelectiveExtractor(object):
+    """
+    Extracts only some members of a tar or zip archive with :mod:`tarfile`
+    or :mod:`zipfile` instead of unpacking all of it with an external
+    command. The member table is read first and passed to ``select``, which
+    returns the names of the members to extract.
+
+    Members with absolute paths, paths outside the archive, or that aren't
+    regular files, directories, or links are never extracted. Neither are
+    symlinks that resolve outside the archive, hard links to symlinks, or
+    members whose path goes through a symlink.
+
+    Args:
+        select (function): accepts a list of member names and returns the
+            names to extract. Names of directories end with a slash.
+    """
+    def __init__(self, select, timeout=None):
+        self.select = select
+        self.timeout = timeout
+        self.tmp_dir = None
+        self.created_tmp_dir = False
+        self.content_type = None
+
+    @staticmethod
+    def _is_safe(name):
+        name = posixpath.normpath(name)
+        return not (name.startswith("/") or name == ".." or name.startswith("../"))
+
+    @classmethod
+    def _resolve(cls, links, name, followed=None):
+        """
+        Returns the path that name points to inside the archive after
+        following the symlink members in links, or None if it leaves the
+        archive. Each symlink followed is added to followed.
+        """
+        parts = name.split("/")
+        resolved = "."
+        hops = 0
+        while parts:
+            path = posixpath.normpath(posixpath.join(resolved, parts.pop(0)))
+            if not cls._is_safe(path):
+                return None
+            link = links.get(path)
+            if link is None:
+                resolved = path
+                continue
+            hops += 1
+            if hops > 40 or link.linkname.startswith("/"):
+                return None
+            if followed is not None:
+                followed.add(path)
+            parts = link.linkname.split("/") + parts
+            resolved = posixpath.dirname(path) or "."
+        return resolved
+
+    @staticmethod
+    def _through_link(links, name):
+        """
+        Whether a parent directory of name is a symlink member.
+        """
+        parent = posixpath.dirname(name)
+        while parent:
+            if parent in links:
+                return True
+            parent = posixpath.dirname(parent)
+        return False
+
+    def _extract_tar(self, path):
+        # python versions with extraction filters check every member again
+        kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+        with closing(tarfile.open(path, "r:*")) as tf:
+            members = {}
+            for m in tf.getmembers():
+                name = posixpath.normpath(m.name)
+                if (m.isfile() or m.isdir() or m.issym() or m.islnk()) and self._is_safe(name):
+                    members[name] = m
+            links = dict((n, m) for n, m in members.items() if m.issym())
+            # directories end with a slash like they do in zip files
+            names = sorted(n + "/" if m.isdir() else n for n, m in members.items())
+            selected = set(posixpath.normpath(n) for n in self.select(names))
+
+            # links can't be read unless their targets are there too
+            for name in list(selected):
+                target = self._resolve(links, name, selected)
+                if target is not None:
+                    selected.add(target)
+                    m = members.get(target)
+                    if m is not None and m.islnk():
+                        selected.add(posixpath.normpath(m.linkname))
+
+            # only extract symlinks that stay inside the archive when
+            # resolved among each other. Dropping one changes how others
+            # resolve, so check until none are dropped.
+            extracted = dict((n, links[n]) for n in selected if n in links)
+            dropped = True
+            while dropped:
+                dropped = [n for n in extracted if self._resolve(extracted, n) is None]
+                for name in dropped:
+                    logger.debug("Skipping %s: its target is outside the archive", name)
+                    del extracted[name]
+
+            for name in sorted(selected):
+                m = members.get(name)
+                if m is None or (m.issym() and name not in extracted):
+                    continue
+                # nothing is written through a symlink
+                if self._through_link(links, name):
+                    logger.debug("Skipping %s: its path goes through a symlink", name)
+                    continue
+                if m.islnk():
+                    target = posixpath.normpath(m.linkname)
+                    if not self._is_safe(target) or target in links or self._through_link(links, target):
+                        logger.debug("Skipping %s: its target is a symlink or outside the archive", name)
+                        continue
+                if m.isdir():
+                    # permissions of directories in the archive could keep
+                    # their contents from being extracted
+                    fs.ensure_path(os.path.join(self.tmp_dir, name))
+                else:
+                    tf.extract(m, self.tmp_dir, **kwargs)
+
+    def _extract_zip(self, path):
+        with closing(zipfile.ZipFile(path)) as zf:
+            names = [n for n in zf.namelist() if self._is_safe(n)]
+            selected = set(self.select(names))
+            zf.extractall(self.tmp_dir, [n for n in names if n in selected])
+
+    def from_path(self, path, extract_dir=None, content_type=None):
+        self.content_type = content_type or content_type_from_file(path)
+        if self.content_type != "application/zip" and self.content_type not in TarExtractor.TAR_FLAGS:
+            raise InvalidContentType(self.content_type)
+        self.tmp_dir = tempfile.mkdtemp(prefix="insights-", dir=extract_dir)
+        self.created_tmp_dir = True
+        logging.debug("Extracting selected files in '%s'", self.tmp_dir)
+        try:
+            if self.content_type == "application/zip":
+                self._extract_zip(path)
+            else:
+                self._extract_tar(path)
+        except (tarfile.TarError, zipfile.BadZipfile) as ex:
+            raise InvalidArchive(str(ex))
+        return self
+
+
 def get_all_files(path):
     names = []
     for root, dirs, files in os.walk(path):
@@ -93,7 +240,7 @@ class Extraction(object):
 
 
 @contextmanager
-def extract(path, timeout=None, extract_dir=None, content_type=None):
+def extract(path, timeout=None, extract_dir=None, content_type=None, select=None):
     """
     Extract path into a temporary directory in `extract_dir`.
 
@@ -102,9 +249,14 @@ def extract(path, timeout=None, extract_dir=None, content_type=None):
 
     If the extraction takes longer than `timeout` seconds, the temporary path
     is removed, and an exception is raised.
+
+    If `select` is given, only the members it chooses are extracted. See
+    :class:`SelectiveExtractor`. `timeout` doesn't apply in that case.
     """
     content_type = content_type or content_type_from_file(path)
-    if content_type == "application/zip":
+    if select is not None:
+        extractor = SelectiveExtractor(select, timeout=timeout)
+    elif content_type == "application/zip":
         extractor = ZipExtractor(timeout=timeout)
     else:
         extractor = TarExtractor(timeout=timeout)
@@ -0,0 +1,157 @@
+"""
+The batch module evaluates many archives concurrently in a pool of
+processes. Each process extracts and evaluates one archive at a time and sends
+back only the result of a function applied to it, so brokers and extracted
+trees never leave the process that created them.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+
+import six
+from six.moves import cPickle as pickle
+from six.moves import queue
+
+log = logging.getLogger(__name__)
+
+_END = object()
+
+
+class ArchiveError(Exception):
+    """
+    Raised in place of an exception from another process. The message has
+    the archive and the text traceback of the original exception.
+    """
+    def __init__(self, archive, error):
+        super(ArchiveError, self).__init__("Failed to process %s:\n%s" % (archive, error))
+        self.archive = archive
+        self.error = error
+
+
+def _call(func, archive):
+    # the result is pickled here so that a result that can't be still
+    # reports back
+    try:
+        return pickle.dumps(func(archive), pickle.HIGHEST_PROTOCOL), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _get_size(path):
+    try:
+        return os.path.getsize(path) if os.path.isfile(path) else 0
+    except OSError:
+        return 0
+
+
+def map_archives(func, archives, processes=None, max_bytes=None,
+                 initializer=None, initargs=()):
+    """
+    Calls ``func`` on each archive in a pool of processes and yields a tuple
+    of ``(archive, result, error)`` for each as it completes. ``error`` is the
+    text traceback if ``func`` raised an exception and ``None`` otherwise.
+    ``archives`` is consumed from a background thread, so it can be an
+    unbounded stream of paths.
+
+    Temporary disk usage is bounded because at most ``processes`` archives are
+    in flight at once. If ``max_bytes`` is given, archives also aren't started
+    while the total size of the archives in flight would exceed it. An archive
+    larger than ``max_bytes`` still runs, but only by itself.
+
+    Args:
+        func (function): a module level function that accepts an archive path
+            and returns a picklable result.
+        archives (list): paths to archives or directories.
+        processes (int): number of processes. Defaults to the number of CPUs.
+        max_bytes (int): limit on the combined size of archives in flight.
+        initializer (function): called with ``initargs`` in each process when
+            it starts. Useful for building state ``func`` needs once instead of
+            for every archive.
+        initargs (tuple): arguments for ``initializer``.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    feed = queue.Queue(maxsize=processes)
+    # keys of finished archives, or None when an archive is fed
+    events = queue.Queue()
+    in_flight = {}
+    ids = itertools.count()
+    used = 0
+    archive = None
+    exhausted = False
+
+    def feeder():
+        try:
+            for a in archives:
+                feed.put(a)
+                events.put(None)
+        except Exception:
+            log.exception("Failed to read archives to process")
+        feed.put(_END)
+        events.put(None)
+
+    def finished(key):
+        done = {"callback": lambda _: events.put(key)}
+        if six.PY3:
+            # e.g. func couldn't be pickled
+            done["error_callback"] = done["callback"]
+        return done
+
+    # fork the processes before starting the thread, so they don't inherit
+    # locks it holds
+    pool = multiprocessing.Pool(processes, initializer, initargs)
+    t = threading.Thread(target=feeder)
+    t.daemon = True
+    t.start()
+    try:
+        while True:
+            while not exhausted and len(in_flight) < processes:
+                if archive is None:
+                    try:
+                        archive = feed.get_nowait()
+                    except queue.Empty:
+                        break
+                    if archive is _END:
+                        exhausted = True
+                        break
+                try:
+                    # Python 2 has no error_callback, so a task that can't be
+                    # sent to the pool would never finish
+                    pickle.dumps((func, archive), pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    a, archive = archive, None
+                    error = traceback.format_exc()
+                    log.warning("Failed to process %s: %s" % (a, error))
+                    yield a, None, error
+                    continue
+                size = _get_size(archive)
+                if max_bytes and in_flight and used + size > max_bytes:
+                    break
+                used += size
+                key = next(ids)
+                r = pool.apply_async(_call, (func, archive), **finished(key))
+                in_flight[key] = (archive, r, size)
+                archive = None
+
+            if exhausted and not in_flight:
+                break
+            key = events.get()
+            if key is None:
+                continue
+
+            a, r, size = in_flight.pop(key)
+            used -= size
+            try:
+                data, error = r.get()
+                result = pickle.loads(data) if data is not None else None
+            except Exception:
+                result, error = None, traceback.format_exc()
+            if error:
+                log.warning("Failed to process %s: %s" % (a, error))
+            yield a, result, error
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
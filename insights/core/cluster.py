@@ -8,7 +8,7 @@ import pandas as pd
 from ansible.parsing.dataloader import DataLoader
 from ansible.inventory.manager import InventoryManager
 
-from insights.core import dr, plugins
+from insights.core import batch, dr, plugins
 from insights.core.archives import extract
 from insights.core.hydration import create_context
 from insights.specs import Specs
@@ -46,32 +46,95 @@ def attach_machine_id(result, mid):
     return result
 
 
+def process_archive(graph, archive, extract_dir=None):
+    """
+    Evaluates graph against an archive or a directory and returns the broker.
+    """
+    if os.path.isfile(archive):
+        with extract(archive, extract_dir=extract_dir) as ex:
+            return process_archive(graph, ex.tmp_dir)
+    ctx = create_context(archive)
+    broker = dr.Broker()
+    broker[ctx.__class__] = ctx
+    return dr.run(graph, broker=broker)
+
+
 def process_archives(graph, archives):
     for archive in archives:
-        if os.path.isfile(archive):
-            with extract(archive) as ex:
-                ctx = create_context(ex.tmp_dir)
-                broker = dr.Broker()
-                broker[ctx.__class__] = ctx
-                yield dr.run(broker=broker)
-        else:
-            ctx = create_context(archive)
-            broker = dr.Broker()
-            broker[ctx.__class__] = ctx
-            yield dr.run(graph, broker=broker)
+        yield process_archive(graph, archive)
 
 
-def extract_facts(brokers):
-    results = defaultdict(list)
-    for b in brokers:
-        mid = b[machine_id]
-        for k, v in b.get_by_type(plugins.fact).items():
+def get_facts(broker):
+    """
+    Returns the machine id and a dictionary of fact components to results for
+    an evaluated broker.
+    """
+    return broker[machine_id], broker.get_by_type(plugins.fact)
+
+
+def merge_facts(results):
+    """
+    Combines ``(machine_id, facts)`` tuples from :func:`get_facts` into a
+    dictionary of fact components to lists of results.
+    """
+    merged = defaultdict(list)
+    for mid, facts in results:
+        for k, v in facts.items():
             r = attach_machine_id(v, mid)
             if isinstance(r, list):
-                results[k].extend(r)
+                merged[k].extend(r)
             else:
-                results[k].append(r)
-    return results
+                merged[k].append(r)
+    return merged
+
+
+def extract_facts(brokers):
+    return merge_facts(get_facts(b) for b in brokers)
+
+
+_BATCH = {}
+
+
+def _init_batch(names, extract_dir):
+    components = [dr.get_component(n) for n in names]
+    graph = dict((c, dr.get_dependencies(c)) for c in components if c is not None)
+    _BATCH["plan"] = dr.RunPlan(graph)
+    _BATCH["extract_dir"] = extract_dir
+
+
+def _archive_facts(archive):
+    broker = process_archive(_BATCH["plan"], archive, extract_dir=_BATCH["extract_dir"])
+    mid, facts = get_facts(broker)
+    return mid, dict((dr.get_name(k), v) for k, v in facts.items())
+
+
+def extract_facts_parallel(graph, archives, processes=None, extract_dir=None, max_bytes=None):
+    """
+    Evaluates graph against the archives in a pool of processes and returns
+    their merged facts. Only the facts and machine id of each archive are sent
+    back to this process. See :func:`insights.core.batch.map_archives` for the
+    meaning of ``processes`` and ``max_bytes``.
+
+    Like :func:`extract_facts`, the first archive that fails stops the
+    evaluation. It raises :class:`insights.core.batch.ArchiveError`.
+    """
+    names = [dr.get_name(c) for c in graph]
+    results = batch.map_archives(_archive_facts, archives, processes=processes,
+                                 max_bytes=max_bytes, initializer=_init_batch,
+                                 initargs=(names, extract_dir))
+
+    def resolve():
+        try:
+            for archive, result, error in results:
+                if error:
+                    raise batch.ArchiveError(archive, error)
+                mid, facts = result
+                yield mid, dict((dr.get_component(n), v) for n, v in facts.items())
+        finally:
+            # stops the pool
+            results.close()
+
+    return merge_facts(resolve())
 
 
 def process_facts(facts, meta, broker, cluster_graph):
@@ -81,15 +144,17 @@ def process_facts(facts, meta, broker, cluster_graph):
     return dr.run(cluster_graph, broker=broker)
 
 
-def process_cluster(graph, archives, broker, inventory=None):
+def process_cluster(graph, archives, broker, inventory=None, processes=None):
     host_graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
     host_graph[machine_id] = dr.DELEGATES[machine_id].dependencies
     cluster_graph = dict((k, v) for k, v in graph.items() if k not in host_graph)
 
     inventory = parse_inventory(inventory) if inventory else {}
 
-    brokers = process_archives(host_graph, archives)
-    facts = extract_facts(brokers)
+    if processes:
+        facts = extract_facts_parallel(host_graph, archives, processes=processes)
+    else:
+        facts = extract_facts(process_archives(host_graph, archives))
     meta = ClusterMeta(len(archives), inventory)
 
     return process_facts(facts, meta, broker, cluster_graph)
@@ -1,6 +1,7 @@
 import logging
 import os
 from contextlib import contextmanager
+from insights.core.vfs import LOCAL
 from insights.util import streams, subproc
 
 log = logging.getLogger(__name__)
@@ -124,10 +125,31 @@ class Context(object):
 
 
 class ExecutionContext(object):
-    def __init__(self, root="/", timeout=None, all_files=None):
+    """
+    The context datasources run under. Files beneath ``root`` are read through
+    ``fs``, which is the local file system unless another is given, such as
+    an :class:`insights.core.vfs.ArchiveFS` for an archive that isn't
+    extracted.
+
+    ``all_files`` is the list of files in the archive the context was created
+    from. It can also be a function that returns the list, which is called
+    the first time the list is used.
+    """
+    def __init__(self, root="/", timeout=None, all_files=None, fs=None):
         self.root = root
         self.timeout = timeout
-        self.all_files = all_files or []
+        self.all_files = all_files
+        self.fs = fs or LOCAL
+
+    @property
+    def all_files(self):
+        if callable(self._all_files):
+            self._all_files = self._all_files()
+        return self._all_files or []
+
+    @all_files.setter
+    def all_files(self, value):
+        self._all_files = value
 
     def check_output(self, cmd, timeout=None, keep_rc=False, env=None):
         """ Subclasses can override to provide special
@@ -163,6 +185,24 @@ class ExecutionContext(object):
     def locate_path(self, path):
         return os.path.expandvars(path)
 
+    def open(self, path, mode="r", encoding=None, errors=None):
+        return self.fs.open(path, mode, encoding=encoding, errors=errors)
+
+    def glob(self, pattern):
+        return self.fs.glob(pattern)
+
+    def listdir(self, path):
+        return self.fs.listdir(path)
+
+    def isfile(self, path):
+        return self.fs.isfile(path)
+
+    def isdir(self, path):
+        return self.fs.isdir(path)
+
+    def exists(self, path):
+        return self.fs.exists(path)
+
     def __repr__(self):
         msg = "<%s('%s', %s)>"
         return msg % (self.__class__.__name__, self.root, self.timeout)
@@ -170,8 +210,8 @@ class ExecutionContext(object):
 
 @fs_root
 class HostContext(ExecutionContext):
-    def __init__(self, root='/', timeout=30, all_files=None):
-        super(HostContext, self).__init__(root=root, timeout=timeout, all_files=all_files)
+    def __init__(self, root='/', timeout=30, all_files=None, fs=None):
+        super(HostContext, self).__init__(root=root, timeout=timeout, all_files=all_files, fs=fs)
 
 
 @fs_root
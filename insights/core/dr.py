@@ -56,10 +56,11 @@ import pkgutil
 import re
 import six
 import sys
+import threading
 import time
 import traceback
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import reduce as _reduce
 
 from insights.contrib import importlib
@@ -85,6 +86,8 @@ HIDDEN = set()
 IGNORE = defaultdict(set)
 ENABLED = defaultdict(lambda: True)
 
+RUN_PLANS = {}
+
 
 def set_enabled(component, enabled=True):
     """
@@ -102,7 +105,10 @@ def set_enabled(component, enabled=True):
     Returns:
         None
     """
-    ENABLED[get_component(component) or component] = enabled
+    if isinstance(component, six.string_types):
+        component = get_component(component) or component
+    ENABLED[component] = enabled
+    _invalidate_run_plans()
 
 
 def is_enabled(component):
@@ -217,6 +223,10 @@ def add_dependency(component, dep):
     get_delegate(component).add_dependency(dep)
 
 
+def _invalidate_run_plans():
+    RUN_PLANS.clear()
+
+
 class MissingRequirements(Exception):
     """
     Raised during evaluation if a component's dependencies aren't met.
@@ -331,12 +341,15 @@ def get_dependency_graph(component):
         return {component: set()}
 
     graph = defaultdict(set)
-
-    def visitor(c, parent):
-        if parent is not None:
+    seen = set([component])
+    frontier = [component]
+    while frontier:
+        parent = frontier.pop()
+        for c in get_dependencies(parent):
             graph[parent].add(c)
-
-    walk_dependencies(component, visitor)
+            if c not in seen:
+                seen.add(c)
+                frontier.append(c)
 
     graph = dict(graph)
 
@@ -486,6 +499,7 @@ def _register_component(delegate):
 
     MODULE_NAMES[component] = get_module_name(component)
     BASE_MODULE_NAMES[component] = get_base_module_name(component)
+    _invalidate_run_plans()
 
 
 class ComponentType(object):
@@ -684,6 +698,7 @@ class ComponentType(object):
 
         DEPENDENCIES[self.component].add(dep)
         COMPONENTS[group][self.component].add(dep)
+        _invalidate_run_plans()
 
 
 class Broker(object):
@@ -716,13 +731,26 @@ class Broker(object):
             :func:`time.time`. For components that produce multiple instances,
             the execution time here is the sum of their individual execution
             times.
+        loaders (dict): components that are available but haven't been loaded
+            yet. Values are functions that return the instance. See
+            :func:`Broker.add_loader`.
+        fingerprints (dict): component -> fingerprint of the value of each
+            input component evaluated by :func:`run_changed`.
+        interned (dict): content shared by datasource values with identical
+            content, and the parsers shared by instances of
+            :attr:`insights.core.Parser.shareable` parsers, keyed by content
+            hash.
     """
     def __init__(self, seed_broker=None):
         self.instances = dict(seed_broker.instances) if seed_broker else {}
+        self.loaders = dict(seed_broker.loaders) if seed_broker else {}
+        self.load_lock = threading.RLock()
         self.missing_requirements = {}
         self.exceptions = defaultdict(list)
         self.tracebacks = {}
         self.exec_times = {}
+        self.fingerprints = {}
+        self.interned = {}
 
         self.observers = defaultdict(set)
         if seed_broker is not None:
@@ -786,16 +814,60 @@ class Broker(object):
             self.exceptions[component].append(ex)
             self.tracebacks[ex] = tb
 
+    def add_loader(self, component, loader):
+        """
+        Makes a component available without creating its instance. The
+        broker reports the component as present, and ``loader`` is called
+        with no arguments the first time the instance is requested. Its
+        return value is cached as the instance.
+
+        If the loader raises an exception, the component is removed from the
+        broker and the request fails as if the component had never been
+        present. :class:`SkipComponent` does this without logging a warning.
+        """
+        msg = "Already exists in broker with key: %s"
+        if component in self.instances:
+            raise KeyError(msg % get_name(component))
+        self.loaders[component] = loader
+
+    def _load(self, component):
+        with self.load_lock:
+            if component in self.instances:
+                return True
+            loader = self.loaders.pop(component, None)
+            if loader is None:
+                return False
+            try:
+                self.instances[component] = loader()
+                return True
+            except SkipComponent:
+                pass
+            except Exception as ex:
+                log.warning("Could not load %s: %r" % (get_name(component), ex))
+            return False
+
+    def load_all(self):
+        """
+        Loads every component added with :func:`Broker.add_loader` that hasn't
+        been loaded yet.
+        """
+        for component in list(self.loaders):
+            self._load(component)
+
     def __iter__(self):
-        return iter(self.instances)
+        return iter(self.keys())
 
     def keys(self):
-        return self.instances.keys()
+        if not self.loaders:
+            return self.instances.keys()
+        return list(self.instances) + [c for c in list(self.loaders) if c not in self.instances]
 
     def items(self):
+        self.load_all()
         return self.instances.items()
 
     def values(self):
+        self.load_all()
         return self.instances.values()
 
     def get_by_type(self, _type):
@@ -803,22 +875,26 @@ class Broker(object):
         Return all of the instances of :class:`ComponentType` ``_type``.
         """
         r = {}
-        for k, v in self.items():
+        for k in self.keys():
             if get_component_type(k) is _type:
-                r[k] = v
+                try:
+                    r[k] = self[k]
+                except KeyError:
+                    pass
         return r
 
     def __contains__(self, component):
-        return component in self.instances
+        return component in self.instances or component in self.loaders
 
     def __setitem__(self, component, instance):
         msg = "Already exists in broker with key: %s"
-        if component in self.instances:
+        if component in self:
             raise KeyError(msg % get_name(component))
 
         self.instances[component] = instance
 
     def __delitem__(self, component):
+        self.loaders.pop(component, None)
         if component in self.instances:
             del self.instances[component]
             return
@@ -827,6 +903,9 @@ class Broker(object):
         if component in self.instances:
             return self.instances[component]
 
+        if component in self.loaders and self._load(component):
+            return self.instances[component]
+
         raise KeyError("Unknown component: %s" % get_name(component))
 
     def get(self, component, default=None):
@@ -924,50 +1003,279 @@ def _determine_components(components):
         return COMPONENTS[components]
 
 
-def run(components=None, broker=None):
+class RunPlan(object):
+    """
+    A compiled evaluation plan for a dependency graph. It holds everything
+    :func:`run` needs to evaluate the graph so the walk and sort aren't
+    repeated for every broker. Use :func:`get_run_plan` to get a plan that's
+    cached until the set of loaded or enabled components changes.
+
+    Attributes:
+        graph (dict): the dependency graph from which the plan was built.
+        order (list): components in an order that satisfies their dependency
+            relationships.
+        ids (dict): component -> integer index into ``order``.
+        dependencies (list): for each component index, the list of indexes of
+            its dependencies in the graph.
+        dependents (list): for each component index, the list of indexes of
+            the components in the graph that depend on it.
+        runnable (list): for each component index, whether the component is
+            in the graph, loaded, and enabled.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.enabled = ENABLED
+        self.order = run_order(graph)
+        self.ids = dict((c, i) for i, c in enumerate(self.order))
+        self.dependencies = []
+        self.dependents = [[] for _ in self.order]
+        self.runnable = []
+        for i, component in enumerate(self.order):
+            deps = sorted(set(self.ids[d] for d in graph.get(component, ())) - set([i]))
+            self.dependencies.append(deps)
+            for d in deps:
+                self.dependents[d].append(i)
+            self.runnable.append(component in graph and component in DELEGATES and is_enabled(component))
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __repr__(self):
+        return "<%s(%d components)>" % (self.__class__.__name__, len(self))
+
+
+def _get_plan_key(components):
+    if components is None:
+        return GROUPS.single
+    if isinstance(components, (list, set)):
+        if all(hashable(c) for c in components):
+            return frozenset(components)
+        return
+    if isinstance(components, dict):
+        for k, v in COMPONENTS.items():
+            if v is components:
+                return k
+        return
+    if hashable(components):
+        return components
+
+
+def get_run_plan(components=None):
+    """
+    Returns a :class:`RunPlan` for the components. Plans for anything other
+    than an explicit dependency graph are cached and reused until a component
+    is registered, enabled or disabled, or gains a dependency. Plans for
+    dependency graphs that aren't one of the component groups are built every
+    time, so hold onto the plan if the graph will be run repeatedly.
+
+    Keyword Args:
+        components: Can be one of a dependency graph, a single component, a
+            component group, a component type, or a list of components.
+            Defaults to ``GROUPS.single``.
+    Returns:
+        RunPlan: the compiled plan.
+    """
+    if isinstance(components, RunPlan):
+        return components
+
+    key = _get_plan_key(components)
+    plan = RUN_PLANS.get(key) if key is not None else None
+    if plan is not None and plan.enabled is ENABLED:
+        return plan
+
+    graph = _determine_components(components or COMPONENTS[GROUPS.single])
+    plan = RunPlan(graph)
+    if key is not None:
+        RUN_PLANS[key] = plan
+    return plan
+
+
+def _run_component(component, runnable, broker):
+    start = time.time()
+    try:
+        if runnable and component not in broker:
+            log.info("Trying %s" % get_name(component))
+            result = DELEGATES[component].process(broker)
+            broker[component] = result
+    except MissingRequirements as mr:
+        if log.isEnabledFor(logging.DEBUG):
+            name = get_name(component)
+            reqs = stringify_requirements(mr.requirements)
+            log.debug("%s missing requirements %s" % (name, reqs))
+        broker.add_exception(component, mr)
+    except SkipComponent:
+        pass
+    except Exception as ex:
+        tb = traceback.format_exc()
+        log.warning(tb)
+        broker.add_exception(component, ex, tb)
+    finally:
+        broker.exec_times[component] = time.time() - start
+        broker.fire_observers(component)
+
+
+def _run_parallel(plan, broker, pool, max_in_flight=None):
+    """
+    Executes components with a ready queue. A component is submitted to the
+    pool as soon as all of its dependencies in the graph have been attempted,
+    so independent components execute concurrently regardless of whether
+    they're in the same connected subgraph.
+    """
+    order = plan.order
+    waiting = [len(d) for d in plan.dependencies]
+    ready = deque(i for i, w in enumerate(waiting) if not w)
+    finished = six.moves.queue.Queue()
+    in_flight = 0
+
+    def release(i):
+        for d in plan.dependents[i]:
+            waiting[d] -= 1
+            if not waiting[d]:
+                ready.append(d)
+
+    while ready or in_flight:
+        while ready and (not max_in_flight or in_flight < max_in_flight):
+            i = ready.popleft()
+            component = order[i]
+            if plan.runnable[i] and component not in broker:
+                future = pool.submit(_run_component, component, True, broker)
+                future.add_done_callback(lambda f, i=i: finished.put(i))
+                in_flight += 1
+            else:
+                _run_component(component, False, broker)
+                release(i)
+
+        if in_flight:
+            release(finished.get())
+            in_flight -= 1
+
+    return broker
+
+
+def run(components=None, broker=None, pool=None, max_in_flight=None):
     """
     Executes components in an order that satisfies their dependency
     relationships.
 
     Keyword Args:
         components: Can be one of a dependency graph, a single component, a
-            component group, or a component type. If it's anything other than a
-            dependency graph, the appropriate graph is built for you and before
-            evaluation.
+            component group, a component type, or a :class:`RunPlan`. If it's
+            anything other than a dependency graph or plan, the appropriate
+            graph is built for you and before evaluation.
         broker (Broker): Optionally pass a broker to use for evaluation. One is
             created by default, but it's often useful to seed a broker with an
             initial dependency.
+        pool (Executor): Optionally pass a thread pool such as a
+            ``concurrent.futures.ThreadPoolExecutor``. If given, every
+            component whose dependencies have been attempted is submitted to
+            the pool instead of executing one at a time. Components and
+            observers run in the pool's threads, so observers must be thread
+            safe.
+        max_in_flight (int): The maximum number of components submitted to the
+            pool at once. Defaults to no limit. Ignored if pool is None.
     Returns:
         Broker: The broker after evaluation.
     """
-    components = components or COMPONENTS[GROUPS.single]
-    components = _determine_components(components)
+    plan = get_run_plan(components)
     broker = broker or Broker()
 
-    for component in run_order(components):
-        start = time.time()
-        try:
-            if (component not in broker and component in components and
-               component in DELEGATES and
-               is_enabled(component)):
-                log.info("Trying %s" % get_name(component))
-                result = DELEGATES[component].process(broker)
-                broker[component] = result
-        except MissingRequirements as mr:
-            if log.isEnabledFor(logging.DEBUG):
-                name = get_name(component)
-                reqs = stringify_requirements(mr.requirements)
-                log.debug("%s missing requirements %s" % (name, reqs))
-            broker.add_exception(component, mr)
-        except SkipComponent:
-            pass
-        except Exception as ex:
-            tb = traceback.format_exc()
-            log.warning(tb)
-            broker.add_exception(component, ex, tb)
-        finally:
-            broker.exec_times[component] = time.time() - start
-            broker.fire_observers(component)
+    if pool is not None:
+        return _run_parallel(plan, broker, pool, max_in_flight=max_in_flight)
+
+    for component, runnable in zip(plan.order, plan.runnable):
+        _run_component(component, runnable, broker)
+
+    return broker
+
+
+_ABSENT = "<absent>"
+
+
+def _reuse_component(component, previous, broker):
+    if component in previous:
+        broker[component] = previous[component]
+    if component in previous.missing_requirements:
+        broker.missing_requirements[component] = previous.missing_requirements[component]
+    for ex in previous.exceptions.get(component, []):
+        broker.add_exception(component, ex, previous.tracebacks.get(ex))
+    broker.exec_times[component] = previous.exec_times[component]
+    broker.fire_observers(component)
+
+
+def run_changed(components=None, broker=None, previous=None, fingerprint=None, inputs=None):
+    """
+    Executes components like :func:`run` but reuses the results of a previous
+    evaluation of the same components for everything that doesn't depend on
+    a changed input.
+
+    Input components are always executed, and the fingerprint of each one's
+    value is kept in ``broker.fingerprints``. An input whose fingerprint
+    differs from the one in ``previous.fingerprints`` is changed. Every
+    component that transitively depends on a changed input is executed again.
+    The instances, exceptions, and timings of the rest are copied from
+    previous, and observers are fired for them as usual.
+
+    Components in the broker before evaluation are used as they are and
+    aren't considered changed, so seed both runs with equivalent contexts.
+
+    .. code-block:: python
+
+        from insights.core.plugins import is_datasource
+        from insights.core.spec_factory import fingerprint
+
+        first = dr.run_changed(graph, broker=seed(), fingerprint=fingerprint, inputs=is_datasource)
+        second = dr.run_changed(graph, broker=seed(), previous=first,
+                                fingerprint=fingerprint, inputs=is_datasource)
+
+    Keyword Args:
+        components: anything :func:`run` accepts.
+        broker (Broker): Optionally pass a broker to use for evaluation.
+        previous (Broker): the broker of an earlier call. Everything is
+            executed if it's None.
+        fingerprint (function): called with an input component and its value.
+            Returns something that compares equal for equivalent values, or
+            None if the value can't be fingerprinted, in which case the input
+            is always changed. Defaults to the value itself.
+        inputs (function): called with a component and returns True if it's
+            an input. Defaults to components without dependencies in the graph.
+    Returns:
+        Broker: The broker after evaluation.
+    """
+    plan = get_run_plan(components)
+    broker = broker or Broker()
+    fingerprint = fingerprint or (lambda c, v: v)
+    seeded = set(broker.keys())
+    changed = [previous is None] * len(plan)
+
+    for i, component in enumerate(plan.order):
+        runnable = plan.runnable[i]
+        if component in seeded or not runnable:
+            _run_component(component, runnable, broker)
+            continue
+
+        is_input = inputs(component) if inputs else not plan.dependencies[i]
+        if is_input:
+            _run_component(component, runnable, broker)
+            if component in broker:
+                try:
+                    fp = fingerprint(component, broker[component])
+                except Exception as ex:
+                    log.debug("Can't fingerprint %s: %r" % (get_name(component), ex))
+                    fp = None
+            else:
+                fp = _ABSENT
+            broker.fingerprints[component] = fp
+            if previous is not None:
+                changed[i] = fp is None or previous.fingerprints.get(component) != fp
+        elif (changed[i] or component not in previous.exec_times or
+                any(changed[d] for d in plan.dependencies[i])):
+            changed[i] = True
+            _run_component(component, runnable, broker)
+        else:
+            _reuse_component(component, previous, broker)
 
     return broker
 
@@ -1,8 +1,12 @@
+import fnmatch
 import logging
 import os
+import re
+from functools import partial
 from itertools import product
 
 from insights.core import archives
+from insights.core.vfs import IndexedFS
 from insights.core.context import (ClusterArchiveContext,
                                    JDRContext,
                                    HostArchiveContext,
@@ -20,11 +24,14 @@ def get_all_files(path):
     return all_files
 
 
+MARKERS = {"insights_archive.txt": SerializedArchiveContext,
+           "insights_commands": HostArchiveContext,
+           "sos_commands": SosArchiveContext,
+           "JBOSS_HOME": JDRContext}
+
+
 def identify(files):
-    markers = {"insights_archive.txt": SerializedArchiveContext,
-               "insights_commands": HostArchiveContext,
-               "sos_commands": SosArchiveContext,
-               "JBOSS_HOME": JDRContext}
+    markers = MARKERS
 
     for f, m in product(files, markers):
         if m in f:
@@ -40,16 +47,126 @@ def identify(files):
     return common_path, HostArchiveContext
 
 
+def probe(path, depth=3):
+    """
+    Identifies the context of the directory tree at path like :func:`identify`
+    does, but only looks for markers in the names of its top ``depth``
+    levels. Levels are listed one at a time, so the shallowest marker wins.
+
+    Returns:
+        tuple: the common path and context class, or None if no marker was
+        found.
+    """
+    level = [path]
+    for _ in range(depth):
+        subdirs = []
+        for d in level:
+            try:
+                names = sorted(os.listdir(d))
+            except OSError:
+                continue
+            for n, m in product(names, MARKERS):
+                if m in n:
+                    return d, MARKERS[m]
+            for n in names:
+                full = os.path.join(d, n)
+                if os.path.isdir(full) and not os.path.islink(full):
+                    subdirs.append(full)
+        level = subdirs
+    return None
+
+
 def create_context(path, context=None):
     top = os.listdir(path)
     arc = [os.path.join(path, f) for f in top if f.endswith(archives.COMPRESSION_TYPES)]
     if arc:
         return ClusterArchiveContext(path, all_files=arc)
 
-    all_files = get_all_files(path)
+    # the tree is only walked if the top levels don't identify it, so large
+    # archives don't pay for listing every file unless something needs them
+    found = probe(path)
+    if found:
+        common_path, ctx = found
+        all_files = partial(get_all_files, path)
+    else:
+        all_files = get_all_files(path)
+        if not all_files:
+            raise archives.InvalidArchive("No files in archive")
+        common_path, ctx = identify(all_files)
+
+    context = context or ctx
+    return context(common_path, all_files=all_files, fs=IndexedFS(common_path))
+
+
+def create_archive_context(archive_fs, context=None):
+    """
+    Returns a context for an archive read in place through an
+    :class:`insights.core.vfs.ArchiveFS`, or ``None`` if the archive holds
+    other archives or serialized components, which must be extracted.
+    """
+    all_files = archive_fs.all_files()
     if not all_files:
         raise archives.InvalidArchive("No files in archive")
 
+    if any(os.path.dirname(f) == archive_fs.path and f.endswith(archives.COMPRESSION_TYPES) for f in all_files):
+        return None
+
     common_path, ctx = identify(all_files)
+    if ctx is SerializedArchiveContext:
+        return None
     context = context or ctx
-    return context(common_path, all_files=all_files)
+    return context(common_path, all_files=all_files, fs=archive_fs)
+
+
+def member_selector(patterns):
+    """
+    Returns a function for :func:`insights.core.archives.extract` that
+    chooses the members of an archive matching the glob patterns, such as
+    those from :func:`insights.core.spec_factory.get_archive_patterns`.
+
+    The context is identified from the member names, and patterns are
+    matched relative to the root it implies. A file with each context marker
+    is always chosen so the extracted tree is identified the same way.
+    Serialized and cluster archives and archives without a marker are
+    extracted completely.
+    """
+    matchers = {}
+
+    def get_matcher(ctx, common_path):
+        # patterns are located the same way for every root of a context
+        if ctx not in matchers:
+            locate = ctx(common_path).locate_path
+            regex = "|".join("(?:%s)" % fnmatch.translate(locate(p).lstrip("/")) for p in patterns)
+            matchers[ctx] = re.compile(regex).match
+        return matchers[ctx]
+
+    def select(names):
+        files = [n for n in names if not n.endswith("/")]
+        if not files:
+            return names
+        if any("/" not in n.strip("/") and n.endswith(archives.COMPRESSION_TYPES) for n in files):
+            return names
+
+        selected = set()
+        for m in MARKERS:
+            for f in files:
+                if m in f:
+                    selected.add(f)
+                    break
+
+        # without a marker, the root is the common path of every file
+        if not selected:
+            return names
+
+        common_path, ctx = identify(files)
+        if ctx is SerializedArchiveContext:
+            return names
+
+        if patterns:
+            match = get_matcher(ctx, common_path)
+            prefix = common_path + "/" if common_path else ""
+            for n in names:
+                if n.startswith(prefix) and match(n[len(prefix):].rstrip("/")):
+                    selected.add(n)
+        return sorted(selected)
+    return select
@@ -0,0 +1,202 @@
+"""
+The parser_cache module keeps parser results on disk so identical content
+isn't parsed again in later runs. Results are keyed by the parser, a hash of
+the source of every module in the parser's class hierarchy, the version of
+insights-core, the path and arguments of the datasource, and the sha256 of
+its content after filtering. Changing any of those makes a new entry.
+
+Helpers a parser calls from other modules aren't part of the key, so clear
+the cache after changing them outside of a release.
+
+Cached parsers are stored with :mod:`pickle`, so the cache directory must
+only be writable by the user running insights.
+
+>>> from insights.core import parser_cache
+>>> parser_cache.set_cache("/var/cache/insights/parsers")
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+import six
+
+from insights.util import fs
+
+log = logging.getLogger(__name__)
+
+_CACHE = [None]
+
+
+def set_cache(path):
+    """
+    Caches the results of parsers in the directory at path for every run in
+    the process, or stops caching if path is None.
+
+    Returns:
+        ParserCache: the cache, or None.
+    """
+    _CACHE[0] = ParserCache(path) if path else None
+    return _CACHE[0]
+
+
+def get_cache():
+    """ Returns the :class:`ParserCache` in use or None. """
+    return _CACHE[0]
+
+
+def _core_version():
+    from insights import package_info
+    return "%s-%s-%s" % (package_info["VERSION"], package_info["RELEASE"], package_info["COMMIT"])
+
+
+def _encode(line):
+    if isinstance(line, six.text_type):
+        try:
+            return line.encode("utf-8")
+        except UnicodeError:
+            return line.encode("utf-8", "replace")
+    if isinstance(line, bytes):
+        return line
+    raise TypeError("Can't hash %r" % type(line))
+
+
+def content_hash(content):
+    """
+    Returns the sha256 hex digest of content, which is either bytes or an
+    iterable of lines.
+    """
+    h = hashlib.sha256()
+    if isinstance(content, bytes):
+        h.update(b"raw\0")
+        h.update(content)
+    else:
+        h.update(b"text\0")
+        for line in content:
+            h.update(_encode(line))
+            h.update(b"\n")
+    return h.hexdigest()
+
+
+class ParserCache(object):
+    """
+    Stores parser instances in a directory keyed by what they were parsed
+    from. Entries are written to temporary files and renamed, so concurrent
+    runs can share a directory.
+
+    Attributes:
+        hits (int): number of parsers loaded from the cache.
+        misses (int): number of parsers that weren't in the cache.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.source_hashes = {}
+        self.lock = threading.Lock()
+        fs.ensure_path(path, mode=0o700)
+
+    def source_hash(self, component):
+        """
+        Returns a hash of the source files of every module in the class
+        hierarchy of component, or None if one can't be read.
+        """
+        if component not in self.source_hashes:
+            h = hashlib.sha256(_core_version().encode("utf-8"))
+            classes = getattr(component, "__mro__", [component])
+            for module in sorted(set(c.__module__ for c in classes if c is not object)):
+                path = getattr(sys.modules.get(module), "__file__", None)
+                if path and path.endswith((".pyc", ".pyo")) and os.path.exists(path[:-1]):
+                    path = path[:-1]
+                try:
+                    with open(path, "rb") as f:
+                        h.update(module.encode("utf-8"))
+                        h.update(f.read())
+                except Exception:
+                    h = None
+                    break
+            self.source_hashes[component] = h.hexdigest() if h else None
+        return self.source_hashes[component]
+
+    def _content_hash(self, component, provider):
+        from insights.core import Parser
+        streams = getattr(component, "_handle_content", None)
+        streams = streams is not None and six.get_unbound_function(streams) is not six.get_unbound_function(Parser._handle_content)
+        return content_hash(provider.stream() if streams else provider.content)
+
+    def key(self, component, provider):
+        """
+        Returns the key of the result of component for provider, or None if
+        the result can't be cached.
+        """
+        try:
+            source = self.source_hash(component)
+            if source is None:
+                return None
+            parts = [
+                sys.version_info[0],
+                "%s.%s" % (component.__module__, component.__name__),
+                source,
+                provider.relative_path,
+                os.path.basename(provider.path) if provider.path else None,
+                getattr(provider, "args", None),
+                getattr(provider, "last_client_run", None),
+                self._content_hash(component, provider),
+            ]
+            return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+        except Exception as ex:
+            log.debug("Can't cache %s: %r" % (component, ex))
+
+    def _path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """ Returns the parser stored with key or None. """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except Exception as ex:
+            if os.path.exists(path):
+                log.debug("Removing unreadable cache entry %s: %r" % (path, ex))
+                fs.remove(path)
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """ Stores result with key. Results that can't be pickled are skipped. """
+        path = self._path(key)
+        tmp = None
+        try:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            fs.ensure_path(os.path.dirname(path), mode=0o700)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.rename(tmp, path)
+        except Exception as ex:
+            log.debug("Can't cache %s: %r" % (type(result), ex))
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+    def parse(self, component, provider):
+        """
+        Returns the result of ``component(provider)`` from the cache, or
+        calls it and caches the result.
+        """
+        key = self.key(component, provider)
+        if key is None:
+            return component(provider)
+        result = self.get(key)
+        if result is None:
+            result = component(provider)
+            if result is not None:
+                self.put(key, result)
+        return result
@@ -25,13 +25,14 @@ may return:
 """
 from __future__ import print_function
 
+import copy
 import logging
 import traceback
 
 from pprint import pformat
 from six import StringIO
 
-from insights.core import dr
+from insights.core import dr, parser_cache
 from insights.util.subproc import CalledProcessError
 from insights import settings
 
@@ -116,11 +117,43 @@ class parser(PluginType):
         group = kwargs.get('group', dr.GROUPS.single)
         super(parser, self).__init__(*args, group=group)
 
+    def parse(self, provider, broker=None):
+        """
+        Returns the parser for provider, from the parser cache if one is in
+        use. See :mod:`insights.core.parser_cache`.
+
+        If the parser is :attr:`insights.core.Parser.shareable` and a broker
+        is given, the content of provider is interned in the broker. A parser
+        that already parsed identical content in the broker is copied instead
+        of parsing it again, and the copy shares its facts.
+        """
+        intern = getattr(provider, "intern", None)
+        if broker is None or intern is None or not getattr(self.component, "shareable", False):
+            return self._parse(provider)
+
+        key = (self.component, intern(broker.interned))
+        first = broker.interned.get(key)
+        if first is not None:
+            result = copy.copy(first)
+            result._handle_context(provider)
+            return result
+
+        result = self._parse(provider)
+        if result is not None:
+            broker.interned.setdefault(key, result)
+        return result
+
+    def _parse(self, provider):
+        cache = parser_cache.get_cache()
+        if cache is None:
+            return self.component(provider)
+        return cache.parse(self.component, provider)
+
     def invoke(self, broker):
         dep_value = broker[self.requires[0]]
         if not isinstance(dep_value, list):
             try:
-                return self.component(dep_value)
+                return self.parse(dep_value, broker)
             except ContentException as ce:
                 log.debug(ce)
                 broker.add_exception(self.component, ce, traceback.format_exc())
@@ -133,7 +166,7 @@ class parser(PluginType):
         results = []
         for d in dep_value:
             try:
-                r = self.component(d)
+                r = self.parse(d, broker)
                 if r is not None:
                     results.append(r)
             except dr.SkipComponent:
@@ -5,10 +5,18 @@ serializer and deserializer functions for types. It also provides a
 load objects from the file system. The Hydration class includes a
 :py:func`Hydration.make_persister` method that returns a function appropriate
 to register as an observer on a :py:class:`Broker`.
+
+The documents Hydration saves are encoded with a codec registered with
+:py:func:`register_codec`. ``json`` is always available. ``msgpack`` is a
+compact binary codec that's registered if the optional msgpack package is
+installed.
 """
 import json as ser
 import logging
 import os
+import shutil
+import tempfile
+import threading
 import time
 import traceback
 from glob import glob
@@ -16,11 +24,76 @@ from functools import partial
 
 from insights.core import dr
 from insights.util import fs
+from insights.util.pack import PackReader, PackWriter
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 log = logging.getLogger(__name__)
 
 SERIALIZERS = {}
 DESERIALIZERS = {}
+CODECS = {}
+
+
+class Codec(object):
+    """
+    Encodes the documents Hydration saves to bytes and decodes them again.
+    The name is also the file extension of saved documents.
+    """
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+def register_codec(name, dumps, loads):
+    """
+    Registers a codec. ``dumps`` should accept a document made of dicts,
+    lists, strings, numbers, booleans, and None and return bytes. ``loads``
+    should accept those bytes and return the document.
+    """
+    CODECS[name] = Codec(name, dumps, loads)
+
+
+def get_codec(name):
+    """
+    Returns the registered :py:class:`Codec` with the given name.
+
+    Raises:
+        ValueError: if there isn't a codec with the name.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError("Unknown codec: %s. Available: %s" % (name, ", ".join(sorted(CODECS))))
+
+
+def _json_dumps(doc):
+    return ser.dumps(doc).encode("utf-8")
+
+
+def _json_loads(data):
+    return ser.loads(data.decode("utf-8"))
+
+
+register_codec("json", _json_dumps, _json_loads)
+
+if msgpack is not None:
+    _MSGPACK_LOADS = {"raw": False}
+    if msgpack.version >= (1, 0, 0):
+        # parser attributes can be dicts with keys that aren't strings
+        _MSGPACK_LOADS["strict_map_key"] = False
+
+    def _msgpack_dumps(doc):
+        return msgpack.packb(doc, use_bin_type=True)
+
+    def _msgpack_loads(data):
+        return msgpack.unpackb(data, **_MSGPACK_LOADS)
+
+    register_codec("msgpack", _msgpack_dumps, _msgpack_loads)
 
 
 def serializer(_type):
@@ -120,14 +193,47 @@ class Hydration(object):
     components. It puts metadata about a component's evaluation in a metadata
     file for the component and allows the serializer for a component to put raw
     data beneath a working directory.
+
+    If ``packed`` is True, the metadata and raw data of every component are
+    written to entries of a single pack file instead (see
+    :mod:`insights.util.pack`), and :meth:`close` must be called once all
+    components are saved. :meth:`hydrate` reads whichever layout it finds.
+    Raw data of a packed component is extracted beneath the data directory
+    when the component is loaded.
+
+    Metadata is saved with the codec named by ``codec``. Each document's
+    file or entry name ends with the name of its codec, so :meth:`hydrate`
+    reads documents saved with any registered codec.
+
+    Args:
+        root (str): the directory to save to or load from.
+        meta_data (str): directory under root for metadata files.
+        data (str): directory under root for raw data.
+        pool (Executor): optional pool used to serialize lists of results.
+        packed (bool): save to a pack file instead of separate files.
+        compress (bool): compress the entries of the pack file.
+        codec (str): name of the codec used to save metadata.
     """
-    def __init__(self, root=None, meta_data="meta_data", data="data", pool=None):
+    pack_name = "components.pack"
+    meta_prefix = "meta_data/"
+    data_prefix = "data/"
+
+    def __init__(self, root=None, meta_data="meta_data", data="data", pool=None,
+                 packed=False, compress=False, codec="json"):
         self.root = root
         self.meta_data = os.path.join(root, meta_data) if root else None
         self.data = os.path.join(root, data) if root else None
-        self.ser_name = dr.get_base_module_name(ser)
+        self.pack_path = os.path.join(root, self.pack_name) if root else None
+        self.codec = get_codec(codec)
+        self.ser_name = self.codec.name
         self.created = False
         self.pool = pool
+        self.packed = packed
+        self.compress = compress
+        self.writer = None
+        self.reader = None
+        self.lock = threading.Lock()
+        self.saved = {}
 
     def _hydrate_one(self, doc):
         """ Returns (component, results, errors, duration) """
@@ -141,25 +247,160 @@ class Hydration(object):
         results = unmarshal(doc["results"], root=self.data)
         return (key, results, exec_time, ser_time)
 
-    def hydrate(self, broker=None):
+    def _get_reader(self):
+        if self.reader is None and self.pack_path and os.path.exists(self.pack_path):
+            self.reader = PackReader(self.pack_path)
+        return self.reader
+
+    def names(self):
+        """
+        Returns the names of the saved components.
+        """
+        reader = self._get_reader()
+        if reader is not None:
+            n = len(self.meta_prefix)
+            keys = [k[n:] for k in reader if k.startswith(self.meta_prefix)]
+        else:
+            keys = [os.path.basename(p) for p in glob(os.path.join(self.meta_data, "*"))]
+
+        saved = {}
+        for key in keys:
+            name, _, ext = key.rpartition(".")
+            if name and ext in CODECS:
+                saved[name] = key
+        self.saved = saved
+        return list(saved)
+
+    def load(self, name):
+        """
+        Returns the metadata document of a single saved component without
+        reading any others. Raw data of a packed component is extracted so
+        its deserializer can find it.
+        """
+        if name not in self.saved:
+            self.names()
+        key = self.saved[name]
+        codec = CODECS[key.rpartition(".")[2]]
+
+        reader = self._get_reader()
+        if reader is None:
+            with open(os.path.join(self.meta_data, key), "rb") as f:
+                return codec.loads(f.read())
+
+        doc = codec.loads(reader.read(self.meta_prefix + key))
+        for rel in doc.get("files", []):
+            dst = os.path.join(self.data, rel)
+            if not os.path.exists(dst):
+                fs.ensure_path(os.path.dirname(dst), mode=0o770)
+                with open(dst, "wb") as f:
+                    f.write(reader.read(self.data_prefix + rel))
+        return doc
+
+    def _load_one(self, name, broker):
+        comp, results, exec_time, ser_time = self._hydrate_one(self.load(name))
+        if not results:
+            raise dr.SkipComponent()
+        broker.exec_times[comp] = (exec_time or 0) + (ser_time or 0)
+        return results
+
+    def hydrate(self, broker=None, lazy=False):
         """
         Loads a Broker from a previously saved one. A Broker is created if one
         isn't provided.
+
+        If ``lazy`` is True, only the names of the saved components are read.
+        Each component is added to the broker with
+        :func:`insights.core.dr.Broker.add_loader` and deserialized the first
+        time it's requested, so evaluating a small part of the graph only
+        loads what that part needs. The files under root must remain until
+        the components are loaded, and :meth:`close` should be called once
+        they are.
         """
         broker = broker or dr.Broker()
-        for path in glob(os.path.join(self.meta_data, "*")):
+        if lazy:
+            for name in self.names():
+                comp = dr.get_component_by_name(name)
+                if comp is None:
+                    log.warning("{} is not a loaded component.".format(name))
+                elif comp not in broker:
+                    broker.add_loader(comp, partial(self._load_one, name, broker))
+            return broker
+
+        for name in self.names():
             try:
-                with open(path) as f:
-                    doc = ser.load(f)
-                    res = self._hydrate_one(doc)
-                    comp, results, exec_time, ser_time = res
-                    if results:
-                        broker[comp] = results
-                        broker.exec_times[comp] = exec_time + ser_time
+                doc = self.load(name)
+                res = self._hydrate_one(doc)
+                comp, results, exec_time, ser_time = res
+                if results:
+                    broker[comp] = results
+                    broker.exec_times[comp] = exec_time + ser_time
             except Exception as ex:
                 log.warning(ex)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
         return broker
 
+    def _ensure_created(self):
+        with self.lock:
+            if not self.created:
+                if self.packed:
+                    fs.ensure_path(self.root, mode=0o770)
+                    self.writer = PackWriter(self.pack_path, compress=self.compress)
+                else:
+                    fs.ensure_path(self.meta_data, mode=0o770)
+                    if self.data:
+                        fs.ensure_path(self.data, mode=0o770)
+                self.created = True
+
+    def _marshal(self, value, doc):
+        if not self.packed:
+            return marshal(value, root=self.data, pool=self.pool)
+
+        # Serializers write raw data beneath a scratch directory that's moved
+        # into the pack afterward.
+        scratch = tempfile.mkdtemp(dir=self.root)
+        try:
+            results = marshal(value, root=scratch, pool=self.pool)
+            files = []
+            for dirpath, _, filenames in os.walk(scratch):
+                for fn in filenames:
+                    path = os.path.join(dirpath, fn)
+                    rel = os.path.relpath(path, scratch)
+                    with open(path, "rb") as f:
+                        self.writer.add(self.data_prefix + rel, f.read())
+                    files.append(rel)
+            doc["files"] = sorted(files)
+            return results
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def _write(self, name, doc):
+        key = name + "." + self.ser_name
+        data = self.codec.dumps(doc)
+        if self.packed:
+            self.writer.add(self.meta_prefix + key, data)
+            return
+        path = os.path.join(self.meta_data, key)
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception:
+            fs.remove(path)
+            raise
+
+    def close(self):
+        """
+        Finishes the pack file if components were saved to one and closes
+        any open pack file.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
     def dehydrate(self, comp, broker):
         """
         Saves a component in the given broker to the file system.
@@ -167,11 +408,7 @@ class Hydration(object):
         if not self.meta_data:
             raise Exception("Hydration meta_path not set. Can't dehydrate.")
 
-        if not self.created:
-            fs.ensure_path(self.meta_data, mode=0o770)
-            if self.data:
-                fs.ensure_path(self.data, mode=0o770)
-            self.created = True
+        self._ensure_created()
 
         c = comp
         doc = None
@@ -188,7 +425,7 @@ class Hydration(object):
 
             try:
                 start = time.time()
-                doc["results"] = marshal(value, root=self.data, pool=self.pool)
+                doc["results"] = self._marshal(value, doc)
             except Exception:
                 errors.append(traceback.format_exc())
                 log.debug(traceback.format_exc())
@@ -200,13 +437,9 @@ class Hydration(object):
         else:
             if doc is not None and (doc["results"] or doc["errors"]):
                 try:
-                    path = os.path.join(self.meta_data, name + "." + self.ser_name)
-                    with open(path, "w") as f:
-                        ser.dump(doc, f)
+                    self._write(name, doc)
                 except Exception as boom:
                     log.error("Could not serialize %s to %s: %r" % (name, self.ser_name, boom))
-                    if path:
-                        fs.remove(path)
 
     def make_persister(self, to_persist):
         """
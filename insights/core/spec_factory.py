@@ -1,20 +1,25 @@
+import io
 import itertools
 import logging
 import os
 import re
+import shutil
 import six
 import traceback
 
 from collections import defaultdict
-from glob import glob
 from subprocess import call
 
 from insights.core import blacklist, dr
 from insights.core.filters import get_filters
-from insights.core.context import ExecutionContext, FSRoots, HostContext
+from insights.core.context import (ExecutionContext, FSRoots, HostArchiveContext, HostContext,
+                                   JDRContext, SosArchiveContext)
 from insights.core.plugins import datasource, ContentException, is_datasource
-from insights.util import fs, streams, which
+from insights.util import fs, which
+from insights.util.line_filter import LineFilter
 from insights.util.subproc import Pipeline
+from insights.core.vfs import LocalFS, get_fs
+from insights.core.parser_cache import content_hash
 from insights.core.serde import deserializer, serializer
 import shlex
 
@@ -90,10 +95,30 @@ class ContentProvider(object):
         self.loaded = False
         self._content = None
         self._exception = None
+        self._content_hash = None
 
     def load(self):
         raise NotImplemented()
 
+    @property
+    def content_hash(self):
+        """
+        The sha256 hex digest of the content. It's computed the first time
+        it's used, which loads the content.
+        """
+        if self._content_hash is None:
+            self._content_hash = content_hash(self.content)
+        return self._content_hash
+
+    def intern(self, table):
+        """
+        Replaces the content with the identical content already in table if
+        there is any, or adds it to table. Returns the content hash.
+        """
+        h = self.content_hash
+        self._content = table.setdefault(h, self._content)
+        return h
+
     def stream(self):
         """
         Returns a generator of lines instead of a list of lines.
@@ -170,23 +195,32 @@ class FileProvider(ContentProvider):
 
         self.ds = ds
         self.ctx = ctx
+        self.fs = get_fs(ctx)
         self.validate()
 
     def validate(self):
         if not blacklist.allow_file("/" + self.relative_path):
             raise dr.SkipComponent()
 
-        if not os.path.exists(self.path):
+        if not self.fs.exists(self.path):
             raise ContentException("%s does not exist." % self.path)
 
-        resolved = os.path.realpath(self.path)
-        if not resolved.startswith(os.path.realpath(self.root)):
+        resolved = self.fs.realpath(self.path)
+        if not resolved.startswith(self.fs.realpath(self.root)):
             msg = "Relative path points outside the root: %s -> %s."
             raise Exception(msg % (self.path, resolved))
 
-        if not os.access(self.path, os.R_OK):
+        if not self.fs.access(self.path):
             raise ContentException("Cannot access %s" % self.path)
 
+    def _copy(self, dst):
+        if isinstance(self.fs, LocalFS):
+            call([which("cp", env=SAFE_ENV), self.path, dst], env=SAFE_ENV)
+        else:
+            with self.fs.open(self.path, "rb") as f:
+                with open(dst, "wb") as out:
+                    shutil.copyfileobj(f, out)
+
     def __repr__(self):
         return '%s("%r")' % (self.__class__.__name__, self.path)
 
@@ -199,12 +233,41 @@ class RawFileProvider(FileProvider):
 
     def load(self):
         self.loaded = True
-        with open(self.path, 'rb') as f:
+        with self.fs.open(self.path, 'rb') as f:
             return f.read()
 
     def write(self, dst):
         fs.ensure_path(os.path.dirname(dst))
-        call([which("cp", env=SAFE_ENV), self.path, dst], env=SAFE_ENV)
+        self._copy(dst)
+
+
+_LINE_FILTERS = {}
+
+
+def get_line_filter(ds=None):
+    """
+    Returns a :class:`insights.util.line_filter.LineFilter` that keeps only
+    lines matching the filters for the datasource, drops lines containing
+    disallowed patterns, and replaces disallowed keywords with "keyword".
+    Compiled filters are cached by their rules.
+    """
+    filters = frozenset(get_filters(ds)) if ds else frozenset()
+    patterns = frozenset(blacklist.get_disallowed_patterns())
+    keywords = frozenset(blacklist.get_disallowed_keywords())
+    key = (filters, patterns, keywords)
+    line_filter = _LINE_FILTERS.get(key)
+    if line_filter is None:
+        replace = [(kw, "keyword") for kw in sorted(keywords)]
+        line_filter = LineFilter(include=filters, exclude=patterns, replace=replace)
+        _LINE_FILTERS[key] = line_filter
+    return line_filter
+
+
+def _filter_content(line_filter, lines, keep_rc, name):
+    lines = list(line_filter(lines))
+    if not lines and line_filter.drops_lines and not keep_rc:
+        raise ContentException("No lines of %s passed the filters." % name)
+    return lines
 
 
 class TextFileProvider(FileProvider):
@@ -213,37 +276,20 @@ class TextFileProvider(FileProvider):
     lines. Each line is filtered if filters are defined for the datasource.
     """
 
-    def create_args(self):
-        args = []
-        filters = "\n".join(get_filters(self.ds)) if self.ds else None
-        if filters:
-            args.append(["grep", "-F", filters, self.path])
-
-        patterns = "\n".join(blacklist.get_disallowed_patterns())
-        if patterns:
-            grep = ["grep", "-v" "-F", patterns]
-            if not args:
-                grep.append(self.path)
-            args.append(grep)
-
-        keywords = blacklist.get_disallowed_keywords()
-        if keywords:
-            sed = ["sed"]
-            for kw in keywords:
-                sed.extend(["-e", "s/%s/keyword/g" % kw.replace("/", "\\/")])
-            if not args:
-                sed.append(self.path)
-            args.append(sed)
-        return args
+    def create_filter(self):
+        line_filter = get_line_filter(self.ds)
+        return line_filter if line_filter else None
+
+    def _open(self):
+        # universal newlines, and the same text with or without filters
+        return self.fs.open(self.path, encoding="utf-8", errors="ignore")
 
     def load(self):
         self.loaded = True
-        args = self.create_args()
-        if args:
-            rc, out = self.ctx.shell_out(args, keep_rc=True, env=SAFE_ENV)
-            self.rc = rc
-            return out
-        with open(self.path, "rU") as f:  # universal newlines
+        line_filter = self.create_filter()
+        with self._open() as f:
+            if line_filter:
+                return [l.rstrip("\n") for l in line_filter(f)]
             return [l.rstrip("\n") for l in f]
 
     def _stream(self):
@@ -256,13 +302,9 @@ class TextFileProvider(FileProvider):
             if self._content:
                 yield self._content
             else:
-                args = self.create_args()
-                if args:
-                    with streams.connect(*args, env=SAFE_ENV) as s:
-                        yield s
-                else:
-                    with open(self.path, "rU") as f:  # universal newlines
-                        yield f
+                line_filter = self.create_filter()
+                with self._open() as f:
+                    yield line_filter(f) if line_filter else f
         except StopIteration:
             raise
         except Exception as ex:
@@ -271,16 +313,17 @@ class TextFileProvider(FileProvider):
 
     def write(self, dst):
         fs.ensure_path(os.path.dirname(dst))
-        args = self.create_args()
-        if args:
-            p = Pipeline(*args, env=SAFE_ENV)
-            p.write(dst)
+        line_filter = self.create_filter()
+        if line_filter:
+            with self._open() as f:
+                with io.open(dst, "w", encoding="utf-8") as out:
+                    out.writelines(line_filter(f))
         else:
-            call([which("cp", env=SAFE_ENV), self.path, dst], env=SAFE_ENV)
+            self._copy(dst)
 
 
 class SerializedOutputProvider(TextFileProvider):
-    def create_args(self):
+    def create_filter(self):
         pass
 
 
@@ -318,24 +361,13 @@ class CommandOutputProvider(ContentProvider):
             raise ContentException("Couldn't execute: %s" % self.cmd)
 
     def create_args(self):
-        command = [shlex.split(self.cmd)]
+        return [shlex.split(self.cmd)]
 
+    def create_filter(self):
         if self.split:
-            filters = "\n".join(get_filters(self.ds))
-            if filters:
-                command.append(["grep", "-F", filters])
-
-            patterns = "\n".join(blacklist.get_disallowed_patterns())
-            if patterns:
-                command.append(["grep", "-v", "-F", patterns])
-
-            keywords = blacklist.get_disallowed_keywords()
-            if keywords:
-                sed = ["sed"]
-                for kw in keywords:
-                    sed.extend(["-e", "s/%s/keyword/g" % kw.replace("/", "\\/")])
-                command.append(sed)
-        return command
+            line_filter = get_line_filter(self.ds)
+            if line_filter:
+                return line_filter
 
     def create_env(self):
         env = dict(SAFE_ENV)
@@ -353,6 +385,10 @@ class CommandOutputProvider(ContentProvider):
             self.rc, output = raw
         else:
             output = raw
+
+        line_filter = self.create_filter()
+        if line_filter:
+            output = _filter_content(line_filter, output, self.keep_rc, self.cmd)
         return output
 
     def _stream(self):
@@ -366,8 +402,9 @@ class CommandOutputProvider(ContentProvider):
                 yield self._content
             else:
                 args = self.create_args()
+                line_filter = self.create_filter()
                 with self.ctx.connect(*args, env=self.create_env(), timeout=self.timeout) as s:
-                    yield s
+                    yield line_filter(s) if line_filter else s
         except StopIteration:
             raise
         except Exception as ex:
@@ -378,8 +415,14 @@ class CommandOutputProvider(ContentProvider):
         args = self.create_args()
         fs.ensure_path(os.path.dirname(dst))
         if args:
+            line_filter = self.create_filter()
             p = Pipeline(*args, timeout=self.timeout, env=self.create_env())
-            return p.write(dst, keep_rc=self.keep_rc)
+            rc = p.write(dst, keep_rc=self.keep_rc, line_filter=line_filter)
+            # the same as load when nothing passes the filters
+            if line_filter and line_filter.drops_lines and not self.keep_rc and not os.path.getsize(dst):
+                os.remove(dst)
+                raise ContentException("No lines of %s passed the filters." % self.cmd)
+            return rc
 
     def __repr__(self):
         return 'CommandOutputProvider("%r")' % self.cmd
@@ -587,11 +630,12 @@ class glob_file(object):
     def __call__(self, broker):
         ctx = _get_context(self.context, broker)
         root = ctx.root
+        vfs = get_fs(ctx)
         results = []
         for pattern in self.patterns:
             pattern = ctx.locate_path(pattern)
-            for path in sorted(glob(os.path.join(root, pattern.lstrip('/')))):
-                if self.ignore_func(path) or os.path.isdir(path):
+            for path in sorted(vfs.glob(os.path.join(root, pattern.lstrip('/')))):
+                if self.ignore_func(path) or vfs.isdir(path):
                     continue
                 try:
                     results.append(self.kind(path[len(root):], root=root, ds=self, ctx=ctx))
@@ -682,9 +726,10 @@ class listdir(object):
 
     def __call__(self, broker):
         ctx = _get_context(self.context, broker)
+        vfs = get_fs(ctx)
         p = os.path.join(ctx.root, self.path.lstrip('/'))
         p = ctx.locate_path(p)
-        result = sorted(os.listdir(p)) if os.path.isdir(p) else sorted(glob(p))
+        result = sorted(vfs.listdir(p)) if vfs.isdir(p) else sorted(vfs.glob(p))
 
         if result:
             return [os.path.basename(r) for r in result if not self.ignore_func(r)]
@@ -836,14 +881,15 @@ class foreach_collect(object):
         source = broker[self.provider]
         ctx = _get_context(self.context, broker)
         root = ctx.root
+        vfs = get_fs(ctx)
         if isinstance(source, ContentProvider):
             source = source.content
         if not isinstance(source, (list, set)):
             source = [source]
         for e in source:
             pattern = ctx.locate_path(self.path % e)
-            for p in glob(os.path.join(root, pattern.lstrip('/'))):
-                if self.ignore_func(p) or os.path.isdir(p):
+            for p in vfs.glob(os.path.join(root, pattern.lstrip('/'))):
+                if self.ignore_func(p) or vfs.isdir(p):
                     continue
                 try:
                     result.append(self.kind(p[len(root):], root=root, ds=self, ctx=ctx))
@@ -871,6 +917,65 @@ class first_of(object):
                 return broker[c]
 
 
+def fingerprint(component, value):
+    """
+    Returns a fingerprint of the content of a datasource's value for
+    :func:`insights.core.dr.run_changed`. The value is a
+    :class:`ContentProvider` or a list of them. Returns ``None`` if the value
+    is something else or its content can't be read.
+    """
+    providers = value if isinstance(value, list) else [value]
+    if not all(isinstance(p, ContentProvider) for p in providers):
+        return None
+    try:
+        return tuple((p.relative_path, p.content_hash) for p in providers)
+    except Exception as ex:
+        log.debug("Can't fingerprint %s: %r" % (dr.get_name(component), ex))
+
+
+def _reads_archives(context):
+    contexts = context if isinstance(context, list) else [context]
+    archive_contexts = (HostArchiveContext, SosArchiveContext, JDRContext)
+    return any(c is ExecutionContext or issubclass(c, archive_contexts) for c in contexts)
+
+
+def get_archive_patterns(graph):
+    """
+    Returns the glob patterns of the paths the datasources in graph can read
+    from an archive, relative to the archive's root. Datasources that only
+    run against a live host are skipped.
+
+    Returns ``None`` if a datasource that can run against an archive isn't
+    one of the path based datasources of this module, since the files it
+    reads can't be known ahead of time.
+    """
+    patterns = set()
+    for comp in graph:
+        if not is_datasource(comp):
+            continue
+        if isinstance(comp, (simple_file, glob_file, first_file, listdir, foreach_collect)):
+            if not _reads_archives(comp.context):
+                continue
+            if isinstance(comp, simple_file):
+                patterns.add(comp.path)
+            elif isinstance(comp, glob_file):
+                patterns.update(comp.patterns)
+            elif isinstance(comp, first_file):
+                patterns.update(comp.paths)
+            elif isinstance(comp, listdir):
+                patterns.add(comp.path)
+                patterns.add(comp.path.rstrip("/") + "/*")
+            else:
+                patterns.add(re.sub(r"%[-#0 +]*\d*(?:\.\d+)?[sdifr]", "*", comp.path))
+        elif isinstance(comp, (simple_command, foreach_execute, head, first_of)):
+            continue
+        else:
+            for dep in dr.get_dependencies(comp):
+                if isinstance(dep, type) and issubclass(dep, ExecutionContext) and _reads_archives(dep):
+                    return None
+    return sorted(p.lstrip("/") for p in patterns)
+
+
 @serializer(CommandOutputProvider)
 def serialize_command_output(obj, root):
     rel = os.path.join("insights_commands", mangle_command(obj.cmd))
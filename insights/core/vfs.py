@@ -0,0 +1,408 @@
+"""
+The vfs module lets datasources read files through their
+:class:`insights.core.context.ExecutionContext` instead of directly from the
+local file system. :class:`LocalFS` reads real directories, and
+:class:`IndexedFS` answers globs beneath an extracted archive from an index
+built with a single walk. :class:`ArchiveFS` reads the members of a tar or zip
+archive in place, so an archive can be evaluated without extracting it.
+
+Paths passed to a file system are full paths. An archive is mounted at its
+own path, so the member ``insights-host/etc/hosts`` of ``/tmp/a.tar.gz`` is
+``/tmp/a.tar.gz/insights-host/etc/hosts``.
+
+>>> with ArchiveFS("/tmp/a.tar.gz") as fs:
+...     fs.listdir("/tmp/a.tar.gz/insights-host/etc")
+['hosts', 'redhat-release']
+"""
+import errno
+import fnmatch
+import io
+import os
+import posixpath
+import stat
+import tarfile
+import tempfile
+import threading
+import zipfile
+from contextlib import closing
+from glob import glob, has_magic
+
+from insights.core.archives import InvalidArchive
+
+
+class LocalFS(object):
+    """ Reads the local file system. """
+
+    def open(self, path, mode="r", encoding=None, errors=None):
+        """
+        Opens a file. ``encoding`` and ``errors`` are passed to :func:`io.open`
+        if an encoding is given. Otherwise the builtin ``open`` is used.
+        """
+        if encoding:
+            return io.open(path, mode, encoding=encoding, errors=errors)
+        return open(path, mode)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def islink(self, path):
+        return os.path.islink(path)
+
+    def access(self, path):
+        """ Returns True if the file can be read. """
+        return os.access(path, os.R_OK)
+
+    def realpath(self, path):
+        return os.path.realpath(path)
+
+    def listdir(self, path):
+        return os.listdir(path)
+
+    def glob(self, pattern):
+        return glob(pattern)
+
+    def close(self):
+        pass
+
+
+LOCAL = LocalFS()
+""" The :class:`LocalFS` used by contexts that aren't given a file system. """
+
+
+class IndexedFS(LocalFS):
+    """
+    Reads the local file system, but answers :meth:`glob` and :meth:`listdir`
+    for paths beneath root from an index of the names in each directory. The
+    index is built with a single walk of root the first time it's needed, so
+    only use this for trees that don't change, such as extracted archives.
+
+    Directories the walk doesn't enter, such as links to directories, are
+    listed when a glob reaches them.
+
+    Args:
+        root (str): the directory to index.
+    """
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        self.dirs = None
+        self.lock = threading.Lock()
+
+    def _build(self):
+        with self.lock:
+            if self.dirs is None:
+                dirs = {}
+                for d, dirnames, filenames in os.walk(self.root):
+                    rel = os.path.relpath(d, self.root)
+                    dirs["" if rel == "." else rel] = sorted(dirnames + filenames)
+                self.dirs = dirs
+        return self.dirs
+
+    def _rel(self, path):
+        path = os.path.normpath(path)
+        if path == self.root:
+            return ""
+        if path.startswith(self.root + "/"):
+            return path[len(self.root) + 1:]
+
+    def _names(self, rel):
+        dirs = self._build()
+        if rel in dirs:
+            return dirs[rel]
+        path = os.path.join(self.root, rel)
+        if os.path.isdir(path):
+            try:
+                return sorted(os.listdir(path))
+            except OSError:
+                pass
+
+    def listdir(self, path):
+        rel = self._rel(path)
+        if rel is None or rel not in self._build():
+            return os.listdir(path)
+        return list(self.dirs[rel])
+
+    def glob(self, pattern):
+        """
+        Returns the paths matching a glob pattern the same way
+        :func:`glob.glob` does, in sorted order.
+        """
+        rel = self._rel(pattern)
+        if not rel:
+            return glob(pattern)
+        matches = [""]
+        for part in rel.split("/"):
+            found = []
+            for m in matches:
+                names = self._names(m)
+                if not names:
+                    continue
+                if has_magic(part):
+                    hits = fnmatch.filter(names, part)
+                    if not part.startswith("."):
+                        hits = [n for n in hits if not n.startswith(".")]
+                else:
+                    hits = [part] if part in names else []
+                found.extend(os.path.join(m, n) if m else n for n in hits)
+            matches = found
+        return [os.path.join(self.root, m) for m in matches]
+
+
+def get_fs(ctx):
+    """
+    Returns the file system of ctx, or :data:`LOCAL` if ctx is None or
+    doesn't have one.
+    """
+    return getattr(ctx, "fs", None) or LOCAL
+
+
+def _normalize(name):
+    name = posixpath.normpath(name.lstrip("/"))
+    if name == "." or name == ".." or name.startswith("../"):
+        return None
+    return name
+
+
+class ArchiveFS(object):
+    """
+    Reads the members of a tar or zip archive without extracting them. Only
+    the member table is read when the archive is opened. Compressed tar
+    archives are decompressed once into a spooled temporary file so members
+    can be read in any order. Members are read from multiple threads one at
+    a time.
+
+    Args:
+        path (str): path of the archive. It's also the mount point of the
+            members.
+
+    Raises:
+        InvalidArchive: if path isn't a tar or zip archive.
+    """
+    spool_size = 64 * 1024 * 1024
+    """ Decompressed tar archives larger than this are spooled to disk. """
+
+    max_links = 40
+
+    def __init__(self, path):
+        self.path = os.path.realpath(path)
+        self.lock = threading.Lock()
+        self.tar = None
+        self.zip = None
+        self.spool = None
+        self.files = {}
+        self.links = {}
+        self.dirs = {"": set()}
+        try:
+            if zipfile.is_zipfile(self.path):
+                self._index_zip()
+            else:
+                self._index_tar()
+        except (tarfile.TarError, zipfile.BadZipfile, EOFError, IOError) as ex:
+            self.close()
+            raise InvalidArchive("Unable to read %s: %s" % (path, ex))
+
+    def _add(self, name, member=None, link=None, is_dir=False):
+        name = _normalize(name)
+        if not name:
+            return
+        parent, base = posixpath.split(name)
+        while True:
+            self.dirs.setdefault(parent, set()).add(base)
+            if not parent:
+                break
+            parent, base = posixpath.split(parent)
+        if is_dir:
+            self.dirs.setdefault(name, set())
+        elif link is not None:
+            self.links[name] = link
+        else:
+            self.files[name] = member
+
+    def _index_tar(self):
+        try:
+            self.tar = tarfile.open(self.path, "r:")
+        except tarfile.ReadError:
+            # compressed archives can only be read forward, so they're
+            # decompressed once for random access
+            with closing(tarfile.open(self.path, "r:*")) as tf:
+                self.spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+                src = tf.fileobj
+                src.seek(0)
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    self.spool.write(chunk)
+            self.spool.seek(0)
+            self.tar = tarfile.open(fileobj=self.spool, mode="r:")
+
+        for m in self.tar.getmembers():
+            if m.isdir():
+                self._add(m.name, is_dir=True)
+            elif m.issym():
+                self._add(m.name, link=m.linkname)
+            elif m.isfile() or m.islnk():
+                self._add(m.name, member=m)
+
+    def _index_zip(self):
+        self.zip = zipfile.ZipFile(self.path)
+        for info in self.zip.infolist():
+            mode = info.external_attr >> 16
+            if info.filename.endswith("/"):
+                self._add(info.filename, is_dir=True)
+            elif stat.S_ISLNK(mode):
+                self._add(info.filename, link=self.zip.read(info).decode("utf-8"))
+            else:
+                self._add(info.filename, member=info)
+
+    def _rel(self, path):
+        path = os.path.normpath(path)
+        if path == self.path:
+            return ""
+        if path.startswith(self.path + "/"):
+            return path[len(self.path) + 1:]
+
+    def _resolve(self, rel):
+        """
+        Follows links in each part of rel. Returns the name of the member it
+        refers to, an absolute path if a link leads outside the archive, or
+        None if there are too many links.
+        """
+        resolved = ""
+        for part in rel.split("/") if rel else []:
+            cur = posixpath.join(resolved, part) if resolved else part
+            hops = 0
+            while cur in self.links:
+                hops += 1
+                if hops > self.max_links:
+                    return None
+                target = self.links[cur]
+                if target.startswith("/"):
+                    return target
+                cur = posixpath.normpath(posixpath.join(posixpath.dirname(cur), target))
+                if cur == ".":
+                    cur = ""
+                if cur == ".." or cur.startswith("../"):
+                    return "/" + cur
+            resolved = cur
+        return resolved
+
+    def _lookup(self, path):
+        rel = self._rel(path)
+        if rel is None:
+            return None
+        return self._resolve(rel)
+
+    def open(self, path, mode="r", encoding=None, errors=None):
+        """
+        Opens a member. The member is read into memory. Text modes decode it
+        as utf-8 with universal newlines unless another encoding is given.
+        """
+        name = self._lookup(path)
+        if name not in self.files:
+            raise IOError(errno.ENOENT, "No such file in archive", path)
+        member = self.files[name]
+        with self.lock:
+            if self.tar is None and self.zip is None:
+                raise IOError("%s is closed." % self.path)
+            if self.zip is not None:
+                data = self.zip.read(member)
+            else:
+                f = self.tar.extractfile(member)
+                try:
+                    data = f.read()
+                finally:
+                    f.close()
+        f = io.BytesIO(data)
+        if "b" in mode:
+            return f
+        return io.TextIOWrapper(f, encoding=encoding or "utf-8", errors=errors or "strict")
+
+    def exists(self, path):
+        name = self._lookup(path)
+        return name in self.files or name in self.dirs
+
+    def isfile(self, path):
+        return self._lookup(path) in self.files
+
+    def isdir(self, path):
+        return self._lookup(path) in self.dirs
+
+    def islink(self, path):
+        rel = self._rel(path)
+        if not rel:
+            return False
+        parent, base = posixpath.split(rel)
+        parent = self._resolve(parent)
+        return parent is not None and posixpath.join(parent, base) in self.links
+
+    def access(self, path):
+        return self.exists(path)
+
+    def realpath(self, path):
+        rel = self._rel(path)
+        if rel is None:
+            return os.path.realpath(path)
+        name = self._resolve(rel)
+        if name is None or name.startswith("/"):
+            return name or path
+        return os.path.join(self.path, name) if name else self.path
+
+    def listdir(self, path):
+        name = self._lookup(path)
+        if name not in self.dirs:
+            raise OSError(errno.ENOTDIR, "No such directory in archive", path)
+        return sorted(self.dirs[name])
+
+    def glob(self, pattern):
+        """
+        Returns the paths matching a glob pattern the same way
+        :func:`glob.glob` does for a directory.
+        """
+        rel = self._rel(pattern)
+        if rel is None:
+            return []
+        matches = [""]
+        for part in rel.split("/") if rel else []:
+            found = []
+            for m in matches:
+                d = self._resolve(m)
+                if d not in self.dirs:
+                    continue
+                if has_magic(part):
+                    names = [n for n in self.dirs[d]
+                             if fnmatch.fnmatchcase(n, part) and (part.startswith(".") or not n.startswith("."))]
+                else:
+                    names = [part] if part in self.dirs[d] else []
+                found.extend(posixpath.join(m, n) if m else n for n in sorted(names))
+            matches = found
+        return [os.path.join(self.path, m) for m in matches if m]
+
+    def all_files(self):
+        """
+        Returns the full paths of the regular files in the archive, like
+        :func:`insights.core.hydration.get_all_files` does for a directory.
+        """
+        return [os.path.join(self.path, n) for n in sorted(self.files)]
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+        if self.zip is not None:
+            self.zip.close()
+            self.zip = None
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,4 +1,6 @@
+import bisect
 import pkgutil
+import six
 from collections import OrderedDict
 from insights.core.dr import SkipComponent
 
@@ -278,10 +280,311 @@ def calc_offset(lines, target, invert_search=False):
         return 0
 
 
+# Allows us to transform the key and do lookups like __contains and
+# __startswith
+_KEYWORD_MATCHERS = {
+    'default': lambda s, v: s == v,
+    'contains': lambda s, v: v in s,
+    'startswith': lambda s, v: s.startswith(v),
+    'lower_value': lambda s, v: s.lower() == v.lower(),
+}
+
+
+def _normalize_keyword(key):
+    return key.replace(' ', '_').replace('-', '_')
+
+
+def _keyword_matcher(key):
+    """
+    Splits a :func:`keyword_search` argument name into the key to look up and
+    the name of the matcher that compares a row value with the search value.
+    """
+    if '__' in key:
+        name, matcher = key.split('__', 1)
+        if matcher in _KEYWORD_MATCHERS:
+            return name, matcher
+    return key, 'default'
+
+
+_MISSING = object()
+
+
+class _ColumnSearch(object):
+    """
+    Evaluates :func:`keyword_search` arguments against columns of values,
+    building indexes as they're needed. Equality searches use a hash index
+    of each column, ``__startswith`` searches bisect a sorted copy of the
+    column, ``__lower_value`` searches use a hash index of the lower case
+    values, and the results of other searches are remembered, so searches
+    that are repeated or differ only in their values are close to constant
+    time after the first.
+
+    Arguments:
+        get_column (function): returns the list of values for a normalized
+            key, or ``None`` if no row has the key.
+        missing: the value marking rows that don't have the key.
+    """
+    def __init__(self, get_column, missing):
+        self.get_column = get_column
+        self.missing = missing
+        self.indexes = {}
+        self.results = {}
+
+    def _index(self, kind, key, column):
+        """
+        Returns the index of the given kind for a column, or ``None`` if the
+        column's values don't support it.
+        """
+        index = self.indexes.get((kind, key), _MISSING)
+        if index is not _MISSING:
+            return index
+        missing = self.missing
+        values = [(v, i) for i, v in enumerate(column) if v is not missing]
+        try:
+            if kind == 'default':
+                index = {}
+                for v, i in values:
+                    index.setdefault(v, []).append(i)
+            elif not all(isinstance(v, six.string_types) for v, _ in values):
+                index = None
+            elif kind == 'startswith':
+                values.sort()
+                index = ([v for v, _ in values], [i for _, i in values])
+            else:
+                index = {}
+                for v, i in values:
+                    index.setdefault(v.lower(), []).append(i)
+        except TypeError:
+            # Unhashable or unorderable values.
+            index = None
+        self.indexes[(kind, key)] = index
+        return index
+
+    def _find(self, key, matcher, value):
+        column = self.get_column(key)
+        if column is None:
+            return []
+
+        if matcher in ('default', 'startswith', 'lower_value') and \
+                (matcher == 'default' or isinstance(value, six.string_types)):
+            index = self._index(matcher, key, column)
+            if index is not None:
+                try:
+                    if matcher == 'default':
+                        return index.get(value, [])
+                    if matcher == 'lower_value':
+                        return index.get(value.lower(), [])
+                except TypeError:
+                    # Unhashable search value
+                    pass
+                else:
+                    sorted_values, positions = index
+                    lo = bisect.bisect_left(sorted_values, value)
+                    hi = lo
+                    while hi < len(sorted_values) and sorted_values[hi].startswith(value):
+                        hi += 1
+                    return sorted(positions[lo:hi])
+
+        try:
+            query = (key, matcher, value)
+            return self.results[query]
+        except TypeError:
+            query = None
+        except KeyError:
+            pass
+        matcher_fn = _KEYWORD_MATCHERS[matcher]
+        missing = self.missing
+        found = [i for i, v in enumerate(column) if v is not missing and matcher_fn(v, value)]
+        if query is not None:
+            self.results[query] = found
+        return found
+
+    def search(self, **kwargs):
+        """
+        Returns the ascending positions of the rows that match all of the
+        keyword arguments.
+        """
+        found = None
+        for key, value in kwargs.items():
+            name, matcher = _keyword_matcher(key)
+            positions = self._find(name, matcher, value)
+            found = set(positions) if found is None else found.intersection(positions)
+            if not found:
+                return []
+        return sorted(found)
+
+
+class KeywordIndex(object):
+    """
+    Answers :func:`keyword_search` queries against a list of rows with
+    indexes that are built on the first query that needs them and kept for
+    later ones. Parsers whose ``search`` method is called many times against
+    the same rows should keep one of these instead of calling
+    :func:`keyword_search` on the list each time. If rows are appended to the
+    list, the indexes are rebuilt on the next query. Rows must not be changed
+    in place once they've been searched.
+
+    Arguments:
+        rows (list): the list of dictionaries to search.
+
+    Examples:
+        >>> index = KeywordIndex(rows)
+        >>> index.search(domain='root')
+        [{'domain': 'root', 'type': 'soft', 'item': 'nproc', 'value': -1}]
+        >>> keyword_search(index, item__startswith='no', type='hard')
+        [{'domain': 'oracle', 'type': 'hard', 'item': 'nofile', 'value': 65536}]
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self._reset()
+
+    def _reset(self):
+        self._size = len(self.rows)
+        self._columns = None
+        self._search = _ColumnSearch(self._get_column, _MISSING)
+
+    def _get_column(self, key):
+        if self._columns is None:
+            columns = {}
+            size = self._size
+            for i, row in enumerate(self.rows):
+                for k, v in row.items():
+                    k = _normalize_keyword(k)
+                    if k not in columns:
+                        columns[k] = [_MISSING] * size
+                    columns[k][i] = v
+            self._columns = columns
+        return self._columns.get(key)
+
+    def search(self, **kwargs):
+        """
+        Returns the rows that match all the keyword arguments. See
+        :func:`keyword_search` for the arguments.
+        """
+        if not kwargs:
+            return []
+        if len(self.rows) != self._size:
+            self._reset()
+        rows = self.rows
+        return [rows[i] for i in self._search.search(**kwargs)]
+
+
+class ColumnTable(object):
+    """
+    A table that stores one list of values per column instead of a
+    dictionary per row, which takes a fraction of the memory for tables with
+    many rows. It's returned by :func:`parse_delimited_table` and
+    :func:`parse_fixed_table` when they're called with ``columnar=True``.
+
+    Indexing and iterating produce a dictionary for each row, the same as the
+    rows of the list those functions return by default, and
+    :func:`keyword_search` evaluates its arguments one column at a time.
+
+    Arguments:
+        headings (list): the column names. If a name appears more than once,
+            the value of its last column is kept, like the dictionary rows.
+
+    Examples:
+        >>> table = parse_delimited_table(["NAME SIZE", "sda 10G", "sdb 5G"], columnar=True)
+        >>> table.headings
+        ['NAME', 'SIZE']
+        >>> table.column('SIZE')
+        ['10G', '5G']
+        >>> table[1]
+        {'NAME': 'sdb', 'SIZE': '5G'}
+        >>> table.search(NAME__startswith='sd', SIZE='10G')
+        [{'NAME': 'sda', 'SIZE': '10G'}]
+    """
+    def __init__(self, headings):
+        self.headings = []
+        positions = {}
+        for i, h in enumerate(headings):
+            if h not in positions:
+                self.headings.append(h)
+            positions[h] = i
+        self._positions = [positions[h] for h in self.headings]
+        self._columns = dict((h, []) for h in self.headings)
+        self._keys = dict((_normalize_keyword(h), h) for h in self.headings)
+        self._size = 0
+        self._search = None
+
+    def append(self, values):
+        """
+        Adds a row from a list of values in heading order. Missing values at
+        the end of a short row and values of ``None`` are left out of the
+        row's dictionary.
+        """
+        n = len(values)
+        for h, i in zip(self.headings, self._positions):
+            self._columns[h].append(values[i] if i < n else None)
+        self._size += 1
+        self._search = None
+
+    def column(self, heading):
+        """
+        Returns the list of values of a column. Rows without a value have
+        ``None``.
+        """
+        return self._columns[heading]
+
+    def row(self, index):
+        """ Returns the dictionary for the row at index. """
+        columns = self._columns
+        row = {}
+        for h in self.headings:
+            v = columns[h][index]
+            if v is not None:
+                row[h] = v
+        return row
+
+    def search(self, **kwargs):
+        """
+        Returns the dictionaries of the rows that match all the keyword
+        arguments. See :func:`keyword_search` for the arguments.
+        """
+        if not kwargs:
+            return []
+        if self._search is None:
+            self._search = _ColumnSearch(self._get_column, None)
+        return [self.row(i) for i in self._search.search(**kwargs)]
+
+    def _get_column(self, key):
+        heading = self._keys.get(key)
+        return self._columns[heading] if heading is not None else None
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ColumnTable index out of range")
+        return self.row(index)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.row(i)
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnTable):
+            other = list(other)
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<%s(%s, %d rows)>" % (self.__class__.__name__, self.headings, self._size)
+
+
 def parse_fixed_table(table_lines,
                       heading_ignore=[],
                       header_substitute=[],
-                      trailing_ignore=[]):
+                      trailing_ignore=[],
+                      columnar=False):
     """
     Function to parse table data containing column headings in the first row and
     data in fixed positions in each remaining row of table data.
@@ -305,6 +608,8 @@ def parse_fixed_table(table_lines,
         trailing_ignore (list): Optional list of strings to look for at the end
             rows of the content.  Lines starting with these strings will be ignored,
             thereby truncating the rows of data.
+        columnar (bool): If `True`, return a :class:`ColumnTable` instead of a
+            list of dictionaries.
 
     Returns:
         list: Returns a list of dict for each row of column data.  Dict keys
@@ -347,6 +652,15 @@ def parse_fixed_table(table_lines,
     col_headers = header.strip().split()
     col_index = calc_column_indices(header, col_headers)
 
+    if columnar:
+        table = ColumnTable(col_headers)
+        for line in table_lines[first_line + 1:last_line]:
+            values = [line[col_index[c]:col_index[c + 1]].strip()
+                      for c in range(len(col_index) - 1)]
+            values.append(line[col_index[-1]:].strip())
+            table.append(values)
+        return table
+
     table_data = []
     for line in table_lines[first_line + 1:last_line]:
         col_data = dict(
@@ -367,7 +681,8 @@ def parse_delimited_table(table_lines,
                           heading_ignore=None,
                           header_substitute=None,
                           trailing_ignore=None,
-                          raw_line_key=None):
+                          raw_line_key=None,
+                          columnar=False):
     """
     Parses table-like text.  Uses the first (non-ignored) row as the list of
     column names, which cannot contain the delimiter.  Fields cannot contain
@@ -407,13 +722,15 @@ def parse_delimited_table(table_lines,
             be ignored, thereby truncating the rows of data.
         raw_line_key (str): Key under which to save the raw line. If None, line
             is not saved.
+        columnar (bool): If `True`, return a :class:`ColumnTable` instead of a
+            list of dictionaries.
     Returns:
         list: Returns a list of dictionaries for each row of column data,
         keyed on the column headings in the same case as input.
 
     """
     if not table_lines:
-        return []
+        return ColumnTable([]) if columnar else []
     first_line = calc_offset(table_lines, heading_ignore)
     try:
         # Ignore everything before the heading in this search
@@ -423,7 +740,7 @@ def parse_delimited_table(table_lines,
     except ValueError:
         # We seem to have run out of content before we found something we
         # wanted - return an empty list.
-        return []
+        return ColumnTable([]) if columnar else []
 
     if header_delim == 'same as delimiter':
         header_delim = delim
@@ -434,6 +751,21 @@ def parse_delimited_table(table_lines,
 
     content = table_lines[first_line + 1:last_line]
     headings = [c.strip() if strip else c for c in header.split(header_delim)]
+    if columnar:
+        table = ColumnTable(headings + [raw_line_key] if raw_line_key else headings)
+        for row in content:
+            row = row.strip()
+            if row:
+                rowsplit = row.split(delim, max_splits)
+                if strip:
+                    rowsplit = [i.strip() for i in rowsplit]
+                if raw_line_key:
+                    rowsplit = rowsplit[:len(headings)]
+                    rowsplit.extend([None] * (len(headings) - len(rowsplit)))
+                    rowsplit.append(row)
+                table.append(rowsplit)
+        return table
+
     r = []
     for row in content:
         row = row.strip()
@@ -493,36 +825,22 @@ def keyword_search(rows, **kwargs):
         >>> keyword_search(rows, domain__startswith='r')
         [{'domain': 'root', 'type': 'soft', 'item': 'nproc', 'value': -1}]
     """
-    results = []
     if not kwargs:
-        return results
-
-    # Allows us to transform the key and do lookups like __contains and
-    # __startswith
-    matchers = {
-        'default': lambda s, v: s == v,
-        'contains': lambda s, v: v in s,
-        'startswith': lambda s, v: s.startswith(v),
-        'lower_value': lambda s, v: s.lower() == v.lower(),
-    }
-
-    def key_match(row, key, value):
-        # Translate ' ' and '-' of keys in dict to '_' to match keyword arguments.
-        my_row = {}
-        for my_key, val in row.items():
-            my_row[my_key.replace(' ', '_').replace('-', '_')] = val
-        matcher_fn = matchers['default']
-        if '__' in key:
-            key, matcher = key.split('__', 1)
-            if matcher not in matchers:
-                # put key back the way we found it, matcher fn unchanged
-                key = key + '__' + matcher
-            else:
-                matcher_fn = matchers[matcher]
-        return key in my_row and matcher_fn(my_row[key], value)
+        return []
+
+    if isinstance(rows, (ColumnTable, KeywordIndex)):
+        return rows.search(**kwargs)
 
+    search = []
+    for k, v in kwargs.items():
+        key, matcher = _keyword_matcher(k)
+        search.append((key, _KEYWORD_MATCHERS[matcher], v))
     data = []
     for row in rows:
-        if all(map(lambda kv: key_match(row, kv[0], kv[1]), kwargs.items())):
+        # Translate ' ' and '-' of keys in dict to '_' to match keyword arguments.
+        my_row = {}
+        for my_key, val in row.items():
+            my_row[_normalize_keyword(my_key)] = val
+        if all(key in my_row and matcher_fn(my_row[key], value) for key, matcher_fn, value in search):
             data.append(row)
     return data
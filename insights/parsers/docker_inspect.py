@@ -48,6 +48,8 @@ class DockerInspect(LegacyItemAccess, CommandParser):
     as JSON, so "json.loads" is an option to parse the output in the future.
     """
 
+    shareable = True
+
     def parse_content(self, content):
         content = "\n".join(list(content))
         try:
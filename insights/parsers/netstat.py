@@ -27,7 +27,7 @@ SsTUPNA - command ``ss -tupna``
 from collections import defaultdict
 from . import ParseException, parse_delimited_table
 from .. import parser, LegacyItemAccess, CommandParser
-from insights.parsers import keyword_search
+from insights.parsers import KeywordIndex, keyword_search
 from insights.specs import Specs
 
 
@@ -472,6 +472,7 @@ class Netstat(CommandParser):
         self.data = dict((s.name, s._merge_data_index()) for s in sections)
         self.lines = dict((s.name, s.lines) for s in sections)
         self.datalist = dict((s.name, s.datalist) for s in sections)
+        self._search_index = dict((name, KeywordIndex(rows)) for name, rows in self.datalist.items())
 
     @property
     def running_processes(self):
@@ -573,7 +574,7 @@ class Netstat(CommandParser):
 
         found = []
         for l in search_list:
-            found.extend(keyword_search(self.datalist[l], **kwargs))
+            found.extend(keyword_search(self._search_index[l], **kwargs))
         return found
 
 
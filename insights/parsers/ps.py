@@ -5,7 +5,7 @@ Ps - command ``ps auxww`` and others
 This module provides processing for the various outputs of the ``ps`` command.
 """
 from .. import parser, CommandParser
-from . import ParseException, parse_delimited_table, keyword_search
+from . import KeywordIndex, ParseException, parse_delimited_table, keyword_search
 from insights.specs import Specs
 from insights.core.filters import add_filter
 
@@ -53,6 +53,7 @@ class Ps(CommandParser):
 
     def __init__(self, *args, **kwargs):
         self.data = []
+        self._search_index = None
         self.running = set()
         self.cmd_names = set()
         self.services = []
@@ -196,7 +197,9 @@ class Ps(CommandParser):
             ... ]
             True
         """
-        return keyword_search(self.data, **kwargs)
+        if self._search_index is None:
+            self._search_index = KeywordIndex(self.data)
+        return keyword_search(self._search_index, **kwargs)
 
 
 add_filter(Specs.ps_auxww, "COMMAND")
@@ -3,6 +3,7 @@ from collections import OrderedDict
 from insights.parsers import split_kv_pairs, unsplit_lines, parse_fixed_table
 from insights.parsers import calc_offset, optlist_to_dict, keyword_search
 from insights.parsers import parse_delimited_table, ParseException, SkipException
+from insights.parsers import ColumnTable, KeywordIndex
 
 SPLIT_TEST_1 = """
 # Comment line
@@ -456,6 +457,58 @@ def test_parse_delimited_table():
     assert expected == result
 
 
+def test_columnar_tables():
+    fixed = [
+        (FIXED_CONTENT_1.splitlines(), {}),
+        (FIXED_CONTENT_3.splitlines(), dict(heading_ignore=['Column1 '], trailing_ignore=['Trailing', 'Another'])),
+        (FIXED_CONTENT_4.splitlines(), dict(heading_ignore=['Column1 '],
+                                            header_substitute=[('Column 2', 'Column_2'), ('Column 3', 'Column_3')],
+                                            trailing_ignore=['Trailing', 'Another'])),
+        (FIXED_CONTENT_DUP_HEADER_PREFIXES.splitlines(), {}),
+    ]
+    for lines, kwargs in fixed:
+        table = parse_fixed_table(lines, columnar=True, **kwargs)
+        assert isinstance(table, ColumnTable)
+        assert table == parse_fixed_table(lines, **kwargs)
+
+    delimited = [
+        ([], {}),
+        (PS_AUX_TEST.splitlines(), dict(max_splits=10, heading_ignore=['USER'])),
+        (PS_AUX_TEST.splitlines(), dict(max_splits=10, heading_ignore=['USER'], raw_line_key='_line')),
+        (PS_AUX_TEST.splitlines(), dict(heading_ignore=['USER'], raw_line_key='COMMAND')),
+        (MISSING_DATA_TEST.splitlines(), dict(delim='|', heading_ignore=['LVM2_PV_FMT'],
+                                              trailing_ignore=['WARNING', 'ERROR', 'Cannot get lock'])),
+        (SUBSTITUTE_HEADERS_TEST.splitlines(), dict(delim=',', strip=False,
+                                                    header_substitute=[('read-only', 'read_only')])),
+        (POSTGRESQL_LOG.splitlines(), dict(delim='|', trailing_ignore=['('])),
+        (TABLE3.splitlines(), dict(delim="^", header_delim="|")),
+        (TABLE2, dict(delim='|', header_delim=None)),
+    ]
+    for lines, kwargs in delimited:
+        table = parse_delimited_table(lines, columnar=True, **kwargs)
+        rows = parse_delimited_table(lines, **kwargs)
+        assert isinstance(table, ColumnTable)
+        assert table == rows
+        assert len(table) == len(rows)
+        assert table[-1:] == rows[-1:]
+        if rows:
+            assert table[-1] == rows[-1]
+            for key, value in rows[-1].items():
+                if key == 'rows':
+                    continue
+                kw = {key.replace(' ', '_').replace('-', '_'): value}
+                assert keyword_search(table, **kw) == keyword_search(rows, **kw)
+
+    table = parse_delimited_table(PS_AUX_TEST.splitlines(), max_splits=10, heading_ignore=['USER'], columnar=True)
+    rows = parse_delimited_table(PS_AUX_TEST.splitlines(), max_splits=10, heading_ignore=['USER'])
+    assert table.column('USER') == [r['USER'] for r in rows]
+    for kw in [dict(USER='root'), dict(COMMAND__contains='qemu'), dict(USER='root', STAT__startswith='S'),
+               dict(USER__lower_value='ROOT'), dict(USER='nobody'), dict(MISSING='x'), {}]:
+        assert keyword_search(table, **kw) == keyword_search(rows, **kw)
+    with pytest.raises(IndexError):
+        table[len(rows)]
+
+
 DATA_LIST = [
     {'name': 'test 1', 'role': 'server', 'memory_gb': 16, 'ssd': True},
     {'name': 'test 2', 'role': 'server', 'memory_gb': 256, 'ssd': False},
@@ -588,6 +641,47 @@ def test_keyword_search():
     ) == []
 
 
+def test_keyword_index():
+    searches = [
+        dict(role='server'), dict(memory_gb=16), dict(ssd=False), dict(memory_gb=16, ssd=True),
+        dict(role__contains='e'), dict(role__startswith='e'), dict(role__startswith='s'),
+        dict(role__startswith=''), dict(role__lower_value='SERVER'), dict(cpu_count=4),
+        dict(name='test 1', role='embedded'),
+    ]
+    index = KeywordIndex(DATA_LIST)
+    for kwargs in searches + searches:
+        assert keyword_search(index, **kwargs) == keyword_search(DATA_LIST, **kwargs), kwargs
+    assert keyword_search(index) == []
+
+    cert_searches = [
+        dict(pre_save_command='', key_pair_storage__startswith="type=NSSDB,location='/etc/dirsrv/slapd-PKI-IPA'"),
+        dict(post_save_command__contains='PKI-IPA'), dict(status__lower_value='Monitoring'),
+        dict(dash__space='tested'), dict(certificate__contains='type'),
+        dict(certificate=CERT_LIST[0]['certificate']), dict(status=['MONITORING']),
+    ]
+    index = KeywordIndex(CERT_LIST)
+    for kwargs in cert_searches + cert_searches:
+        assert index.search(**kwargs) == keyword_search(CERT_LIST, **kwargs), kwargs
+
+    # Rows appended after a search are found by the next one
+    rows = list(DATA_LIST)
+    index = KeywordIndex(rows)
+    assert index.search(role='embedded') == [DATA_LIST[3]]
+    rows.append({'name': 'test 6', 'role': 'embedded'})
+    assert index.search(role='embedded') == [DATA_LIST[3], rows[-1]]
+    assert index.search(role__startswith='emb') == [DATA_LIST[3], rows[-1]]
+
+    # The same errors as keyword_search for values that don't support a matcher
+    with pytest.raises(AttributeError):
+        KeywordIndex(DATA_LIST).search(memory_gb__startswith='1')
+
+    # Columnar tables use the same indexes
+    table = parse_delimited_table(PS_AUX_TEST.splitlines(), heading_ignore=['USER'], columnar=True)
+    rows = parse_delimited_table(PS_AUX_TEST.splitlines(), heading_ignore=['USER'])
+    for kwargs in [dict(USER='root'), dict(STAT__startswith='S'), dict(COMMAND__contains='qemu'), dict(USER='root')]:
+        assert table.search(**kwargs) == keyword_search(rows, **kwargs)
+
+
 def test_parse_exception():
     with pytest.raises(ParseException) as e_info:
         raise ParseException('This is a parse exception')
@@ -0,0 +1,111 @@
+import base64
+import json
+import os
+
+import requests
+from insights.client.config import InsightsConfig
+from insights.client.connection import InsightsConnection
+from insights.tests.mock_web_server import RequestHandler, TestMockServer
+from mock.mock import patch
+from pytest import raises
+
+DATA = os.urandom(5000)
+
+
+class TestChunkedUpload(TestMockServer):
+
+    def setup_method(self, method):
+        RequestHandler.uploads.clear()
+        del RequestHandler.faults[:]
+        del RequestHandler.post_faults[:]
+
+    def connection(self, **kwargs):
+        options = dict(upload_url="http://localhost:%s/upload/" % self.server_port,
+                       upload_chunk_size=1024, http_timeout=10, legacy_upload=False)
+        options.update(kwargs)
+        return InsightsConnection(InsightsConfig(**options))
+
+    def upload(self, conn, path):
+        with patch("insights.client.connection.get_canonical_facts", return_value={"fqdn": "test"}):
+            with patch("insights.client.connection.generate_machine_id", return_value="abc"):
+                with patch("insights.client.connection.time.sleep") as sleep:
+                    return conn.upload_archive(path, "application/gzip", 1), sleep
+
+    def archive(self, tmpdir):
+        path = tmpdir.join("insights-test.tar.gz")
+        path.write_binary(DATA)
+        return path.strpath
+
+    def test_upload(self, tmpdir):
+        conn = self.connection()
+        upload, sleep = self.upload(conn, self.archive(tmpdir))
+        assert upload.status_code == 200
+        assert not sleep.called
+        assert not conn.resumable_uploads
+
+        stored = RequestHandler.uploads["1"]
+        assert stored["data"] == DATA
+        assert stored["patches"] == 5
+        metadata = dict(m.split(" ") for m in stored["metadata"].split(","))
+        assert base64.b64decode(metadata["filename"]) == b"insights-test.tar.gz"
+        assert json.loads(base64.b64decode(metadata["metadata"]).decode("utf-8")) == {"fqdn": "test"}
+
+    def test_legacy_upload(self, tmpdir):
+        conn = self.connection(legacy_upload=True)
+        upload, sleep = self.upload(conn, self.archive(tmpdir))
+        assert upload.status_code == 200
+        assert conn.config.account_number == "12345"
+        assert RequestHandler.uploads["1"]["data"] == DATA
+
+    def test_resume_after_failures(self, tmpdir):
+        RequestHandler.faults.extend([None, 503, None])
+        upload, sleep = self.upload(self.connection(), self.archive(tmpdir))
+        assert upload.status_code == 200
+        assert RequestHandler.uploads["1"]["data"] == DATA
+        assert len(RequestHandler.uploads) == 1
+        assert [c[0][0] for c in sleep.call_args_list] == [2, 4, 8]
+        # the chunks after a dropped connection start where the server left
+        # off, so only 1024 bytes are sent twice
+        assert RequestHandler.uploads["1"]["patches"] == 3 + 4
+
+    def test_create_after_failure(self, tmpdir):
+        RequestHandler.post_faults.append(503)
+        conn = self.connection()
+        upload, sleep = self.upload(conn, self.archive(tmpdir))
+        assert upload.status_code == 200
+        assert [c[0][0] for c in sleep.call_args_list] == [2]
+        assert RequestHandler.uploads["1"]["data"] == DATA
+        assert len(RequestHandler.uploads) == 1
+        assert not conn.resumable_uploads
+
+    def test_resume_next_upload(self, tmpdir):
+        RequestHandler.faults.extend([None, None, 503, 503])
+        conn = self.connection(upload_chunk_retries=2)
+        path = self.archive(tmpdir)
+        with raises(requests.ConnectionError):
+            self.upload(conn, path)
+        assert list(conn.resumable_uploads.values()) == [
+            "http://localhost:%s/upload/1" % self.server_port]
+        assert len(RequestHandler.uploads["1"]["data"]) == 1024
+
+        upload, sleep = self.upload(conn, path)
+        assert upload.status_code == 503
+        assert conn.resumable_uploads
+
+        upload, sleep = self.upload(conn, path)
+        assert upload.status_code == 200
+        assert not conn.resumable_uploads
+        assert RequestHandler.uploads["1"]["data"] == DATA
+        assert len(RequestHandler.uploads) == 1
+
+    def test_rejected(self, tmpdir):
+        RequestHandler.faults.append(413)
+        conn = self.connection()
+        upload, sleep = self.upload(conn, self.archive(tmpdir))
+        assert upload.status_code == 413
+        assert not sleep.called
+
+        conn = self.connection(upload_url="http://localhost:%s/mock/" % self.server_port)
+        upload, sleep = self.upload(conn, self.archive(tmpdir))
+        assert upload.status_code == 404
+        assert not conn.resumable_uploads
@@ -0,0 +1,163 @@
+import os
+import tarfile
+import threading
+from contextlib import closing
+
+from insights.client.archive import InsightsArchive, StreamingInsightsArchive
+from insights.client.client import _create_archive
+from insights.client.config import InsightsConfig
+from insights.client.insights_spec import InsightsCommand
+from mock.mock import MagicMock, patch
+from pytest import mark
+
+
+def command(archive_path, output):
+    cmd = MagicMock(spec=InsightsCommand)
+    cmd.archive_path = archive_path
+    cmd.get_output.return_value = output
+    return cmd
+
+
+def collect(archive):
+    try:
+        archive.add_to_archive(command("uname_-a", u"Linux test 3.10.0 caf\xe9"))
+        archive.add_to_archive(command("missing", "timeout: failed to run command blah: No such file or directory"))
+        archive.add_metadata_to_archive('{"branch": 1}', "/branch_info")
+        archive.write_data("127.0.0.1 localhost", archive.get_full_archive_path("/etc/hosts"))
+        path = archive.create_tar_file()
+        with closing(tarfile.open(path)) as tf:
+            members = dict((m.name.lstrip("./"), m) for m in tf.getmembers() if m.name.strip("./"))
+            files = dict((n, tf.extractfile(m).read()) for n, m in members.items() if m.isfile())
+        return path, archive.archive_name, members, files
+    finally:
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
+
+
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_streaming_archive(determine_hostname):
+    staged_path, name, staged, staged_files = collect(InsightsArchive())
+    path, name, streamed, files = collect(StreamingInsightsArchive())
+
+    assert os.path.basename(path) == name + ".tar.gz"
+    assert sorted(streamed) == sorted(staged)
+    assert files == staged_files
+    assert files[name + "/insights_commands/uname_-a"] == u"Linux test 3.10.0 caf\xe9".encode("utf-8")
+    assert name + "/insights_commands/missing" not in files
+    assert all(m.isdir() for n, m in streamed.items() if n not in files)
+
+
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_streaming_archive_names(determine_hostname):
+    names = []
+    for archive in [InsightsArchive(), StreamingInsightsArchive()]:
+        try:
+            archive.add_to_archive(command("uname_-a", "Linux"))
+            archive.add_metadata_to_archive("x", "/display_name")
+            archive.write_data("127.0.0.1 localhost", archive.get_full_archive_path("/etc/hosts"))
+            with closing(tarfile.open(archive.create_tar_file())) as tf:
+                names.append(sorted(tf.getnames()))
+        finally:
+            archive.delete_tmp_dir()
+            archive.delete_archive_file()
+    staged, streamed = names
+    assert streamed == staged
+    assert "./" + archive.archive_name + "/insights_commands/uname_-a" in streamed
+
+
+@mark.parametrize("compressor", ["none", "bz2"])
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_streaming_archive_compressors(determine_hostname, compressor):
+    archive = StreamingInsightsArchive(compressor=compressor)
+    try:
+        archive.add_metadata_to_archive("x", "/display_name")
+        path = archive.create_tar_file()
+        assert path.endswith(".tar" if compressor == "none" else ".tar.bz2")
+        with closing(tarfile.open(path)) as tf:
+            assert tf.extractfile("./" + archive.archive_name + "/display_name").read() == b"x"
+    finally:
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
+    assert not os.path.exists(archive.archive_dir)
+
+
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_streaming_archive_threads(determine_hostname):
+    archive = StreamingInsightsArchive()
+    try:
+        def add(i):
+            for j in range(20):
+                archive.add_to_archive(command("cmd_%d_%d" % (i, j), "output %d %d" % (i, j) * 100))
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with closing(tarfile.open(archive.create_tar_file())) as tf:
+            names = [m.name for m in tf.getmembers()]
+            data = tf.extractfile("./" + archive.archive_name + "/insights_commands/cmd_3_19").read()
+        assert len(names) == len(set(names)) == 80 + 3
+        assert data == b"output 3 19" * 100
+    finally:
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
+
+
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_staged_archive_threads(determine_hostname):
+    archive = InsightsArchive()
+    try:
+        def add(i):
+            # every thread writes into the same new directories
+            for j in range(20):
+                archive.add_to_archive(command("sub_%d/cmd_%d" % (j, i), "output %d %d" % (i, j) * 100))
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with closing(tarfile.open(archive.create_tar_file())) as tf:
+            names = [m.name for m in tf.getmembers() if m.isfile()]
+            data = tf.extractfile("./" + archive.archive_name + "/insights_commands/sub_19/cmd_3").read()
+        assert len(names) == len(set(names)) == 80
+        assert data == b"output 3 19" * 100
+    finally:
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
+
+
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_create_archive(determine_hostname):
+    for kwargs, cls in [({}, InsightsArchive),
+                        ({"stream_archive": True}, StreamingInsightsArchive),
+                        ({"stream_archive": True, "obfuscate": True}, InsightsArchive)]:
+        archive = _create_archive(InsightsConfig(**kwargs), None)
+        try:
+            assert type(archive) is cls
+        finally:
+            archive.delete_tmp_dir()
+            archive.delete_archive_file()
+
+    with patch("insights.client.archive.tarfile.open", side_effect=tarfile.CompressionError):
+        archive = _create_archive(InsightsConfig(stream_archive=True, compressor="xz"), None)
+        assert type(archive) is InsightsArchive
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
+
+
+@mark.parametrize("cls", [InsightsArchive, StreamingInsightsArchive])
+@patch("insights.client.archive.determine_hostname", return_value="test")
+def test_parallel_compression(determine_hostname, cls):
+    path, name, members, files = collect(cls(compression_workers=3))
+    assert path.endswith(".tar.gz")
+    assert files[name + "/insights_commands/uname_-a"] == u"Linux test 3.10.0 caf\xe9".encode("utf-8")
+    assert files[name + "/etc/hosts"] == b"127.0.0.1 localhost"
+
+    archive = _create_archive(InsightsConfig(compression_workers=3), None)
+    try:
+        assert archive.compress_in_parallel()
+    finally:
+        archive.delete_tmp_dir()
+        archive.delete_archive_file()
@@ -8,6 +8,8 @@ from json import dump as json_dump, dumps as json_dumps
 from mock.mock import Mock, patch
 from pytest import mark, raises
 from tempfile import NamedTemporaryFile
+import threading
+import time
 
 
 stdin_uploader_json = {"some key": "some value"}
@@ -305,3 +307,74 @@ def test_cmd_blacklist():
     assert dc._blacklist_check('echo ""; shutdown')
     assert dc._blacklist_check('/bin/bash -c "rm -rf /"')
     assert dc._blacklist_check('echo ""; /bin/bash -c "rm -rf /"; reboot')
+
+
+class SlowArchive(object):
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.collected = []
+        self.threads = set()
+
+    def add_to_archive(self, spec):
+        self.threads.add(threading.current_thread())
+        time.sleep(self.delay)
+        if spec.archive_path == "fail":
+            raise RuntimeError(spec.archive_path)
+        self.collected.append(spec.archive_path)
+
+
+def spec(archive_path, timeout=None):
+    s = Mock(spec=["archive_path", "timeout"] if timeout else ["archive_path"])
+    s.archive_path = archive_path
+    if timeout:
+        s.timeout = timeout
+    return s
+
+
+def test_collect_specs_concurrently():
+    config, pconn = collect_args(collection_workers=4)
+    archive = SlowArchive(0.2)
+    dc = DataCollector(config, archive)
+    start = time.time()
+    dc._collect_specs([spec(str(i)) for i in range(8)])
+    assert time.time() - start < 1.2
+    assert sorted(archive.collected) == [str(i) for i in range(8)]
+    assert len(archive.threads) == 4
+
+
+def test_collect_specs_sequentially():
+    config, pconn = collect_args()
+    archive = SlowArchive(0)
+    DataCollector(config, archive)._collect_specs([spec(str(i)) for i in range(4)])
+    assert archive.collected == ["0", "1", "2", "3"]
+    assert archive.threads == set([threading.current_thread()])
+
+
+def test_collect_specs_error():
+    config, pconn = collect_args(collection_workers=2)
+    archive = SlowArchive(0.05)
+    with raises(RuntimeError):
+        DataCollector(config, archive)._collect_specs([spec("fail")] + [spec(str(i)) for i in range(10)])
+    assert len(archive.collected) < 10
+
+
+def test_collect_specs_deadline():
+    config, pconn = collect_args(collection_timeout=1)
+    archive = SlowArchive(0)
+    clock = [1000.0]
+
+    def add_to_archive(spec):
+        SlowArchive.add_to_archive(archive, spec)
+        clock[0] += 0.6
+
+    archive.add_to_archive = add_to_archive
+    command = spec("command", timeout=120)
+    with patch("insights.client.data_collector.time.time", lambda: clock[0]):
+        DataCollector(config, archive)._collect_specs([spec("0"), command, spec("1"), spec("2")])
+    assert command.timeout == 1
+    assert archive.collected == ["0", "command"]
+
+
+def test_collection_workers_validated():
+    with raises(ValueError):
+        InsightsConfig(collection_workers=0)._validate_options()
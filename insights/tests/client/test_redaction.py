@@ -0,0 +1,164 @@
+import os
+import subprocess
+
+from insights.client.config import InsightsConfig
+from insights.client.data_collector import DataCollector
+from insights.client.insights_spec import InsightsCommand, InsightsFile
+from insights.client.redaction import Redactor, load_sed_rules, parse_sed_script
+from mock.mock import patch
+from pytest import fixture, raises
+
+SED_SCRIPT = r"""
+# redact passwords
+s/(password[a-zA-Z0-9_]*)(\s*\:\s*\"*\s*|\s*\"*\s*=\s*\"\s*|\s*=+\s*|\s*--md5+\s*|\s*)([a-zA-Z0-9_!@#$%^&*()+=/-]*)/\1\2********/
+s/(password[a-zA-Z0-9_]*)(\s*\*+\s+)(.+)/\1\2********/
+s|[[:digit:]]+\.[[:digit:]]+\.[[:digit:]]+\.[[:digit:]]+|<ip>|g
+s/secret/[&]/I
+"""
+
+CONTENT = u"""password = hunter2
+db_password: "s3cr3t"
+password --md5 abcdef
+passwords ** stars here
+connect 10.0.0.1 to 192.168.1.1
+SECRET stuff and secret stuff
+nothing to see
+café password=x
+"""
+
+EXPECTED = [
+    "password = ********",
+    'db_password: "********"',
+    "password --md5 ********",
+    "passwords ******** ********",
+    "connect <ip> to <ip>",
+    "[SECRET] stuff and secret stuff",
+    "nothing to see",
+    u"café password=********",
+]
+
+
+@fixture
+def sed_file(tmpdir):
+    path = tmpdir.join(".exp.sed")
+    path.write(SED_SCRIPT)
+    return path.strpath
+
+
+@fixture
+def content_file(tmpdir):
+    path = tmpdir.join("content")
+    path.write_binary(CONTENT.encode("utf-8"))
+    return path.strpath
+
+
+def test_redactor(sed_file):
+    redactor = Redactor(load_sed_rules(sed_file))
+    assert list(redactor(CONTENT.splitlines())) == EXPECTED
+
+    redactor = Redactor(load_sed_rules(sed_file), exclude=["see", "<ip>"])
+    assert list(redactor(CONTENT.splitlines(), pattern=["password", "see", "stuff"])) == [
+        EXPECTED[0], EXPECTED[1], EXPECTED[2], EXPECTED[3], EXPECTED[5], EXPECTED[7]]
+
+
+def test_unsupported_scripts():
+    for script in ["/foo/d", "s/a/b/2", "s/a/b/w out", "y/abc/xyz/", "s/a(/b/", "s/a)/b/", "s/(a)/\\2/"]:
+        with raises(ValueError):
+            parse_sed_script(script)
+    with raises(ValueError):
+        load_sed_rules("/does/not/exist")
+
+
+def test_delimiters_and_replacements():
+    def sub(script, line):
+        return list(Redactor(parse_sed_script(script))([line]))[0]
+
+    assert sub(r"s|a\|b|<&>|", "a|b") == "<a|b>"
+    assert sub(r"s/\/x/y\/z/g", "/x/x") == "y/zy/z"
+    assert sub(r"s/[/]/_/g", "a/b/c") == "a_b_c"
+    assert sub(r"s/[]x]/_/g", "a]x") == "a__"
+    assert sub(r"s/b/\\\&/", "abc") == r"a\&c"
+    assert sub(r"s/(a)(b)/\2\1-&/g", "abab") == "ba-abba-ab"
+    assert sub(r"s/(a)|(c)/[\2]/g", "ac") == "[][c]"
+
+
+def sed(script, lines):
+    proc = subprocess.Popen(["sed", "-r", "-e", script], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output = proc.communicate("".join(l + "\n" for l in lines).encode("utf-8"))[0]
+    return output.decode("utf-8", "ignore").split("\n")[:-1]
+
+
+def test_exact_translations():
+    lines = [u"a\\nb", u"a.b\\c", "abcd", "x.y[z]", "word words", u"caf\xe9 tab\there"]
+    for script in [r"s/[\.]/X/g", r"s/[\\]+/B/g", r"s/[]\[^]+/_/g", r"s/[a-z]{2,}/W/",
+                   r"s/(b)(c)/\2\1/", r"s/\./\t/", r"s/b\tt/E/"]:
+        rules = parse_sed_script(script)
+        assert all(not isinstance(r, str) for r in rules), script
+        assert list(Redactor(rules)(lines)) == sed(script, lines), script
+
+
+def test_inexact_rules_left_to_sed():
+    lines = ["abcd", "ababab", "xyz", "a,b,c", "password= secret", u"caf\xe9 words"]
+    for script in [
+        # POSIX takes the longest alternative, python the first
+        r"s/(a|ab)(c|bcd)?/[\1\2]/",
+        r"s/(password[a-zA-Z0-9_]*)(\s*|\s*=\s*)([a-z]*)/\1\2****/",
+        # python takes the first match of a repeated group
+        r"s/(ab)+(abab)?/[&]/",
+        # python 3.7 also replaces an empty match after another match
+        r"s/x*/-/g",
+        # \n can't be in a line
+        r"s/a\nb/X/",
+        r"s/[\n]/X/g",
+        r"s/[[=a=]]/A/",
+        # classes and word boundaries follow sed's locale
+        r"s/[[:alpha:]]{2,}/W/",
+        r"s/[[:digit:]]+/D/",
+        r"s/\w+/W/g",
+        r"s/\s+/_/",
+        r"s/\<w/W/g",
+        r"s/o\>/O/g",
+        r"s/\bs/S/",
+    ]:
+        rules = parse_sed_script(script)
+        assert rules == [script], script
+        assert list(Redactor(rules)(lines)) == sed(script, lines), script
+
+    # lines sed splits are excluded on their own, like with grep
+    script = r"s/,/\n/g"
+    assert parse_sed_script(script) == [script]
+    assert list(Redactor(parse_sed_script(script), exclude=["b"])(["a,b,c"])) == ["a", "c"]
+
+    # python and sed rules are applied in order
+    script = "s/a/b/\ns/(b|bc)/[&]/g\ns/c/d/"
+    rules = parse_sed_script(script)
+    assert [type(r) is str for r in rules] == [False, True, False]
+    assert list(Redactor(rules)(lines)) == sed(script, lines)
+
+
+@patch.dict(os.environ, {"PYTHONPATH": ""})
+def test_same_as_pipeline(sed_file, content_file):
+    with patch("insights.client.insights_spec.constants") as constants:
+        constants.default_sed_file = sed_file
+        constants.command_blacklist = set()
+        redactor = Redactor(load_sed_rules(sed_file), exclude=["nothing"])
+        for pattern in [[], ["password", "stuff"]]:
+            spec = {"file": content_file, "pattern": pattern}
+            expected = InsightsFile(spec, ["nothing"], "/").get_output()
+            assert InsightsFile(spec, ["nothing"], "/", redactor).get_output() == expected
+
+            spec = {"command": "/bin/cat " + content_file, "pattern": pattern}
+            config = InsightsConfig()
+            expected = InsightsCommand(config, spec, ["nothing"], "/").get_output()
+            assert InsightsCommand(config, spec, ["nothing"], "/", redactor).get_output() == expected
+            assert "hunter2" not in expected
+
+
+def test_data_collector_redactor(sed_file):
+    dc = DataCollector(InsightsConfig())
+    with patch("insights.client.data_collector.constants.default_sed_file", sed_file):
+        redactor = dc._get_redactor(["nothing"])
+    assert list(redactor(["nothing to see", "password=x"])) == ["password=********"]
+
+    with patch("insights.client.data_collector.constants.default_sed_file", "/does/not/exist"):
+        assert dc._get_redactor(None) is None
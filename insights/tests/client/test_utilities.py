@@ -1,9 +1,11 @@
+import errno
 import os
 import tempfile
 import uuid
 import insights.client.utilities as util
 from insights.client.constants import InsightsConstants as constants
 import re
+import pytest
 from mock.mock import patch
 
 
@@ -145,3 +147,26 @@ def test_delete_unregistered_file():
     util.delete_unregistered_file()
     for u in constants.unregistered_files:
         assert os.path.isfile(u) is False
+
+
+def test_write_data_to_file():
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "sub", "data")
+    util.write_data_to_file("one", path)
+    # the directory already exists
+    util.write_data_to_file("two", path)
+    with open(path) as f:
+        assert f.read() == "two"
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    os.rmdir(tmp)
+
+
+@patch('insights.client.utilities.write_to_disk')
+@patch('insights.client.utilities.os.makedirs',
+       side_effect=OSError(errno.ENOSPC, "No space left on device"))
+def test_write_data_to_file_makedirs_error(makedirs, write_to_disk):
+    with pytest.raises(OSError) as e:
+        util.write_data_to_file("data", "/tmp/nowhere/data")
+    assert e.value.errno == errno.ENOSPC
+    write_to_disk.assert_not_called()
@@ -29,7 +29,16 @@ class RequestHandler(BaseHTTPRequestHandler):
     """
     BaseHTTPRequestHandler subclass configured to handle GET requests for the TestMockServer.
 
+    It also accepts resumable uploads to /upload/ with the core tus protocol.
+    Uploads are kept in ``uploads`` by id. Each PATCH takes the first entry
+    of ``faults`` if there is one: a status code to answer with, or None to
+    keep half of the chunk and drop the connection. Each POST likewise takes
+    the first entry of ``post_faults``, a status code to answer with.
     """
+    uploads = {}
+    faults = []
+    post_faults = []
+
     def do_GET(self):
         """
         Handles the get call from the HTTPServer
@@ -65,6 +74,72 @@ class RequestHandler(BaseHTTPRequestHandler):
             return
         return
 
+    def _reply(self, status, headers=None, body=b""):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _upload(self):
+        return self.uploads.get(self.path.rstrip("/").split("/")[-1])
+
+    def do_POST(self):
+        """
+        Creates an upload.
+
+        """
+        if not self.path.startswith("/upload/") or "Upload-Length" not in self.headers:
+            return self._reply(404)
+        if self.post_faults:
+            return self._reply(self.post_faults.pop(0))
+        upload_id = str(len(self.uploads) + 1)
+        self.uploads[upload_id] = {
+            "length": int(self.headers["Upload-Length"]),
+            "metadata": self.headers.get("Upload-Metadata"),
+            "data": b"",
+            "patches": 0,
+        }
+        self._reply(201, {"Location": "/upload/" + upload_id, "Tus-Resumable": "1.0.0"})
+
+    def do_HEAD(self):
+        """
+        Reports the offset of an upload.
+
+        """
+        upload = self._upload()
+        if upload is None:
+            return self._reply(404)
+        self._reply(200, {"Upload-Offset": str(len(upload["data"])),
+                          "Upload-Length": str(upload["length"]),
+                          "Cache-Control": "no-store"})
+
+    def do_PATCH(self):
+        """
+        Appends a chunk to an upload.
+
+        """
+        upload = self._upload()
+        chunk = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if upload is None:
+            return self._reply(404)
+        upload["patches"] += 1
+        if self.faults:
+            fault = self.faults.pop(0)
+            if fault is None:
+                upload["data"] += chunk[:len(chunk) // 2]
+                self.close_connection = True
+                return
+            return self._reply(fault)
+        if int(self.headers["Upload-Offset"]) != len(upload["data"]):
+            return self._reply(409)
+        upload["data"] += chunk
+        if len(upload["data"]) < upload["length"]:
+            return self._reply(204, {"Upload-Offset": str(len(upload["data"]))})
+        self._reply(200, {"Upload-Offset": str(len(upload["data"]))},
+                    b'{"upload": {"account_number": "12345"}}')
+
 
 class TestMockServer(object):
     """
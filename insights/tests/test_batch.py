@@ -0,0 +1,67 @@
+import os
+import threading
+
+from insights.core.batch import ArchiveError, map_archives
+
+
+def size_of(path):
+    if path.endswith("bad"):
+        raise Exception("boom")
+    return os.path.getsize(path), os.getpid()
+
+
+def make_files(tmpdir, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        p = tmpdir / ("archive%d" % i)
+        p.write("x" * size)
+        paths.append(p.strpath)
+    return paths
+
+
+def test_map_archives(tmpdir):
+    paths = make_files(tmpdir, [1, 2, 3, 4])
+    bad = tmpdir.join("bad")
+    bad.write("")
+
+    results = list(map_archives(size_of, iter(paths + [bad.strpath]), processes=2))
+    assert len(results) == 5
+
+    good = dict((a, r[0]) for a, r, e in results if not e)
+    assert good == dict(zip(paths, [1, 2, 3, 4]))
+    assert set(r[1] for a, r, e in results if not e).isdisjoint([os.getpid()])
+
+    errors = [(a, e) for a, r, e in results if e]
+    assert errors[0][0] == bad.strpath
+    assert "boom" in errors[0][1]
+
+
+def test_map_archives_max_bytes(tmpdir):
+    paths = make_files(tmpdir, [10, 10, 30])
+    results = list(map_archives(size_of, paths, processes=3, max_bytes=15))
+    assert sorted(r[0] for _, r, _ in results) == [10, 10, 30]
+
+
+def unpicklable(path):
+    return lambda: path
+
+
+def test_map_archives_errors(tmpdir):
+    paths = make_files(tmpdir, [1, 2])
+    results = list(map_archives(unpicklable, paths, processes=2))
+    assert sorted(a for a, _, _ in results) == paths
+    assert all(r is None and "pickle" in e for _, r, e in results)
+
+    # tasks that can't be sent to the pool
+    lock = threading.Lock()
+    results = list(map_archives(size_of, [paths[0], lock, paths[1]], processes=2))
+    assert sorted(r[0] for _, r, e in results if not e) == [1, 2]
+    assert [(a, "pickle" in e) for a, _, e in results if e] == [(lock, True)]
+
+    results = list(map_archives(lambda p: p, paths, processes=2))
+    assert sorted(a for a, _, _ in results) == paths
+    assert all(r is None and "pickle" in e for _, r, e in results)
+
+    ex = ArchiveError(paths[0], "Traceback...")
+    assert ex.archive == paths[0]
+    assert paths[0] in str(ex) and "Traceback..." in str(ex)
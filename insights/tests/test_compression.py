@@ -0,0 +1,80 @@
+import gzip
+import io
+import os
+import subprocess
+import tarfile
+from contextlib import closing
+
+from insights.collect import create_archive
+from insights.core import archives
+from insights.util.compression import BLOCK_COMPRESSORS, ParallelCompressor
+from pytest import mark, raises
+
+DATA = b"".join(b"line %d of the data\n" % i for i in range(20000))
+
+
+def compress(data, compressor="gz", sizes=(1000, 7, 4096, 1)):
+    out = io.BytesIO()
+    c = ParallelCompressor(out, compressor, workers=3, block_size=4096)
+    i = 0
+    while i < len(data):
+        for size in sizes:
+            c.write(data[i:i + size])
+            i += size
+    c.close()
+    assert not out.closed
+    return out.getvalue()
+
+
+def test_gzip_roundtrip():
+    value = compress(DATA)
+    assert len(value) < len(DATA)
+    with closing(gzip.GzipFile(fileobj=io.BytesIO(value))) as f:
+        assert f.read() == DATA
+
+    p = subprocess.Popen(["gzip", "-dc"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    assert p.communicate(value)[0] == DATA
+
+
+def test_empty():
+    for data in [b"", b"x"]:
+        with closing(gzip.GzipFile(fileobj=io.BytesIO(compress(data)))) as f:
+            assert f.read() == data
+
+
+@mark.skipif("xz" not in BLOCK_COMPRESSORS, reason="lzma isn't available")
+def test_xz_roundtrip():
+    import lzma
+    assert lzma.decompress(compress(DATA, "xz")) == DATA
+
+
+def test_errors(tmpdir):
+    with raises(ValueError):
+        ParallelCompressor(io.BytesIO(), "bz2")
+
+    path = tmpdir.join("out.gz").strpath
+    with ParallelCompressor(path, workers=2) as c:
+        c.write(DATA)
+    with raises(ValueError):
+        c.write(b"more")
+    assert c.fileobj.closed
+    with closing(gzip.open(path)) as f:
+        assert f.read() == DATA
+
+
+def test_create_archive(tmpdir):
+    path = tmpdir.mkdir("insights-test").strpath
+    os.makedirs(os.path.join(path, "data", "etc"))
+    with open(os.path.join(path, "data", "etc", "hosts"), "wb") as f:
+        f.write(DATA)
+    open(os.path.join(path, "insights_archive.txt"), "w").close()
+
+    archive = create_archive(path, workers=4)
+    assert archive == path + ".tar.gz"
+    assert not os.path.exists(path)
+    with closing(tarfile.open(archive)) as tf:
+        assert tf.extractfile("insights-test/data/etc/hosts").read() == DATA
+
+    with archives.extract(archive) as ex:
+        with open(os.path.join(ex.tmp_dir, "insights-test", "data", "etc", "hosts"), "rb") as f:
+            assert f.read() == DATA
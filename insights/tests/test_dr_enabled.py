@@ -4,8 +4,8 @@ from insights.parsers.uname import Uname
 
 
 def teardown_function(*args):
-    for k in dr.ENABLED:
-        dr.ENABLED[k] = True
+    for k in list(dr.ENABLED):
+        dr.set_enabled(k, True)
 
 
 @combiner()
@@ -1,4 +1,7 @@
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from insights import run, make_pass
 from insights.core import dr
 from insights.plugins import always_fires, never_fires
@@ -59,6 +62,99 @@ def test_run_incremental():
     assert len(brokers) == 3
 
 
+def test_run_pool():
+    broker = dr.Broker()
+    broker["dep1"] = 1
+    broker["dep2"] = 2
+    broker["common"] = 3
+
+    graph = dr.get_dependency_graph(stage1)
+    graph.update(dr.get_dependency_graph(stage2))
+    graph.update(dr.get_dependency_graph(stage3))
+    graph.update(dr.get_dependency_graph(stage4))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        broker = dr.run(graph, broker, pool=pool)
+
+    assert broker[stage1] == "stage1"
+    assert broker[stage2] == "stage2"
+    assert broker[stage3] == 3
+    assert broker[stage4] == 3
+
+
+class slow(dr.ComponentType):
+    pass
+
+
+IN_FLIGHT = {"current": 0, "max": 0}
+IN_FLIGHT_LOCK = threading.Lock()
+
+
+def _sleep_counted():
+    with IN_FLIGHT_LOCK:
+        IN_FLIGHT["current"] += 1
+        IN_FLIGHT["max"] = max(IN_FLIGHT["max"], IN_FLIGHT["current"])
+    time.sleep(0.05)
+    with IN_FLIGHT_LOCK:
+        IN_FLIGHT["current"] -= 1
+
+
+@slow("root")
+def slow1(root):
+    _sleep_counted()
+    return 1
+
+
+@slow("root")
+def slow2(root):
+    _sleep_counted()
+    return 2
+
+
+@slow("root")
+def slow3(root):
+    _sleep_counted()
+    return 3
+
+
+@slow(slow1, slow2, slow3)
+def slow_sum(a, b, c):
+    return a + b + c
+
+
+@slow(slow1, "missing")
+def slow_missing(a, m):
+    return a
+
+
+def test_run_pool_dependencies():
+    IN_FLIGHT["max"] = 0
+    broker = dr.Broker()
+    broker["root"] = True
+    graph = dr.get_dependency_graph(slow_sum)
+    graph.update(dr.get_dependency_graph(slow_missing))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        broker = dr.run(graph, broker, pool=pool)
+
+    assert broker[slow_sum] == 6
+    assert slow_missing in broker.missing_requirements
+    assert IN_FLIGHT["max"] == 3
+
+
+def test_run_pool_max_in_flight():
+    IN_FLIGHT["max"] = 0
+    broker = dr.Broker()
+    broker["root"] = True
+    graph = dr.get_dependency_graph(slow_sum)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        broker = dr.run(graph, broker, pool=pool, max_in_flight=1)
+
+    assert broker[slow_sum] == 6
+    assert IN_FLIGHT["max"] == 1
+
+
 ALWAYS_FIRES_RESULT = make_pass("ALWAYS_FIRES", kernel="this is junk")
 NEVER_FIRES_RESULT = {
     'rule_fqdn': 'insights.plugins.never_fires.report',
@@ -115,3 +211,184 @@ def test_run_command(tmpdir):
         assert broker[never_fires.report] == NEVER_FIRES_RESULT
         assert Specs.uname in broker
         assert broker[Specs.uname].content == [UNAME]
+
+
+def test_run_plan():
+    plan = dr.get_run_plan(slow_sum)
+    assert plan is dr.get_run_plan(slow_sum)
+    assert plan.order.index("root") < plan.order.index(slow1) < plan.order.index(slow_sum)
+
+    ids = plan.ids
+    assert sorted(plan.dependencies[ids[slow_sum]]) == sorted([ids[slow1], ids[slow2], ids[slow3]])
+    assert plan.dependents[ids["root"]] == sorted([ids[slow1], ids[slow2], ids[slow3]])
+    assert not plan.runnable[ids["root"]]
+    assert plan.runnable[ids[slow_sum]]
+
+    broker = dr.Broker()
+    broker["root"] = True
+    assert dr.run(plan, broker)[slow_sum] == 6
+
+
+def test_run_plan_invalidation():
+    plan = dr.get_run_plan(slow_sum)
+    dr.set_enabled(slow2, False)
+    try:
+        disabled = dr.get_run_plan(slow_sum)
+        assert disabled is not plan
+        assert not disabled.runnable[disabled.ids[slow2]]
+
+        broker = dr.Broker()
+        broker["root"] = True
+        broker = dr.run(slow_sum, broker)
+        assert slow2 not in broker
+        assert slow_sum in broker.missing_requirements
+    finally:
+        dr.set_enabled(slow2, True)
+    assert dr.get_run_plan(slow_sum).runnable[plan.ids[slow2]]
+
+    @slow(slow1)
+    def slow_late(a):
+        return a
+
+    assert dr.get_run_plan(slow_sum) is not plan
+
+
+def test_broker_loader():
+    calls = []
+
+    def load():
+        calls.append(1)
+        return "common"
+
+    broker = dr.Broker()
+    broker.add_loader("common", load)
+    broker.add_loader("missing", lambda: 1 / 0)
+    assert "common" in broker
+    assert "missing" in broker
+    assert not calls
+
+    broker = dr.run(dr.get_dependency_graph(stage3), broker)
+    assert broker[stage3] == "common"
+    assert broker["common"] == "common"
+    assert len(calls) == 1
+    assert "missing" in broker.loaders
+
+    assert broker.get("missing") is None
+    assert "missing" not in broker
+
+
+INPUTS = {}
+CALLS = []
+
+
+@stage()
+def input1():
+    return INPUTS["input1"]
+
+
+@stage()
+def input2():
+    if "input2" not in INPUTS:
+        raise dr.SkipComponent()
+    return INPUTS["input2"]
+
+
+@stage(input1)
+def derived1(i):
+    CALLS.append(derived1)
+    return i * 2
+
+
+@stage(input2)
+def derived2(i):
+    CALLS.append(derived2)
+    return i * 3
+
+
+@stage(derived1, optional=[derived2])
+def combined(d1, d2):
+    CALLS.append(combined)
+    return d1 + (d2 or 0)
+
+
+def test_run_changed():
+    graph = dr.get_dependency_graph(combined)
+    INPUTS.update(input1=1, input2=2)
+    del CALLS[:]
+
+    first = dr.run_changed(graph)
+    assert first[combined] == 8
+    assert first.fingerprints == {input1: 1, input2: 2}
+    assert len(CALLS) == 3
+
+    del CALLS[:]
+    seen = []
+    broker = dr.Broker()
+    broker.add_observer(lambda c, b: seen.append(c), stage)
+    second = dr.run_changed(graph, broker=broker, previous=first)
+    assert second[combined] == 8
+    assert second.exec_times[derived1] == first.exec_times[derived1]
+    assert not CALLS
+    assert set(seen) == set(graph)
+
+    INPUTS["input2"] = 3
+    third = dr.run_changed(graph, previous=second)
+    assert third[combined] == 11
+    assert CALLS == [derived2, combined]
+
+    del CALLS[:]
+    del INPUTS["input2"]
+    fourth = dr.run_changed(graph, previous=third)
+    assert fourth[combined] == 2
+    assert derived2 not in fourth
+    assert derived2 in fourth.missing_requirements
+    assert CALLS == [combined]
+
+    del CALLS[:]
+    fifth = dr.run_changed(graph, previous=fourth)
+    assert fifth[combined] == 2
+    assert fifth.missing_requirements[derived2] == fourth.missing_requirements[derived2]
+    assert not CALLS
+
+
+def test_run_changed_datasources(tmpdir):
+    from insights.core import Parser
+    from insights.core.context import HostContext
+    from insights.core.plugins import is_datasource, parser
+    from insights.core.spec_factory import fingerprint, simple_file
+
+    calls = []
+    redhat_release = simple_file("etc/redhat-release", context=HostContext)
+    hostname = simple_file("etc/hostname", context=HostContext)
+
+    @parser(redhat_release)
+    class Release(Parser):
+        def parse_content(self, content):
+            calls.append(1)
+            self.content = content
+
+    @parser(hostname)
+    class Hostname(Parser):
+        def parse_content(self, content):
+            calls.append(2)
+            self.content = content
+
+    root = tmpdir.mkdir("host")
+    root.mkdir("etc").join("redhat-release").write("7.3")
+    root.join("etc", "hostname").write("test")
+    graph = dr.get_dependency_graph(Release)
+    graph.update(dr.get_dependency_graph(Hostname))
+
+    def seed():
+        broker = dr.Broker()
+        broker[HostContext] = HostContext(root=root.strpath)
+        return broker
+
+    previous = None
+    for release, expected in [("7.3", [1, 2]), ("7.3", []), ("7.4", [1])]:
+        root.join("etc", "redhat-release").write(release)
+        del calls[:]
+        previous = dr.run_changed(graph, broker=seed(), previous=previous,
+                                  fingerprint=fingerprint, inputs=is_datasource)
+        assert previous[Release].content == [release]
+        assert sorted(calls) == expected
@@ -1,12 +1,20 @@
+import io
 import os
 import shlex
 import subprocess
+import tarfile
 import tempfile
 import zipfile
 from contextlib import closing
 
-from insights.core import archives
+from insights import load_default_plugins
+from insights.core import archives, dr
 from insights.core.archives import extract
+from insights.core.context import HostArchiveContext, SosArchiveContext
+from insights.core.hydration import create_context, get_all_files, member_selector, probe
+from insights.core.plugins import datasource
+from insights.core.spec_factory import get_archive_patterns
+from insights.specs import Specs
 
 
 def test_with_zip():
@@ -44,3 +52,153 @@ def test_with_zip():
         os.unlink("/tmp/test.zip")
 
     subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def _make_tree(tmp_dir):
+    root = os.path.join(tmp_dir, "insights-host")
+    for d in ("etc", "insights_commands", "var/log"):
+        os.makedirs(os.path.join(root, d))
+    for rel, content in (("etc/redhat-release", "Red Hat Enterprise Linux Server release 7.3 (Maipo)"),
+                         ("etc/hosts", "127.0.0.1 localhost"),
+                         ("insights_commands/uname_-a", "Linux test 3.10.0"),
+                         ("var/log/messages", "hello")):
+        with open(os.path.join(root, rel), "w") as f:
+            f.write(content)
+    os.symlink("redhat-release", os.path.join(root, "etc/system-release"))
+    return root
+
+
+def test_selective_tar():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        _make_tree(tmp_dir)
+        path = os.path.join(tmp_dir, "test.tar.gz")
+        with closing(tarfile.open(path, "w:gz")) as tf:
+            tf.add(os.path.join(tmp_dir, "insights-host"), "insights-host")
+
+        select = member_selector(["etc/system-release", "/var/log/mess*"])
+        with extract(path, select=select) as ex:
+            files = sorted(os.path.relpath(f, ex.tmp_dir) for f in get_all_files(ex.tmp_dir))
+            assert files == ["insights-host/etc/redhat-release",
+                             "insights-host/insights_commands/uname_-a",
+                             "insights-host/var/log/messages"]
+            assert os.path.islink(os.path.join(ex.tmp_dir, "insights-host/etc/system-release"))
+            ctx = create_context(ex.tmp_dir)
+            assert isinstance(ctx, HostArchiveContext)
+            assert ctx.root == os.path.join(ex.tmp_dir, "insights-host")
+    finally:
+        subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def test_selective_tar_traversal():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        out = os.path.join(tmp_dir, "out")
+        os.makedirs(out)
+        extract_dir = os.path.join(tmp_dir, "x")
+        os.makedirs(extract_dir)
+        path = os.path.join(tmp_dir, "test.tar")
+
+        def member(name, data=None, link=None, hard=False):
+            info = tarfile.TarInfo("insights-h/" + name)
+            if link is not None:
+                info.type = tarfile.LNKTYPE if hard else tarfile.SYMTYPE
+                info.linkname = link
+                tf.addfile(info)
+            else:
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+
+        with closing(tarfile.open(path, "w")) as tf:
+            member("insights_commands/uname_-a", b"Linux")
+            member("etc/hosts", b"127.0.0.1 localhost")
+            # climbs from <extract_dir>/insights-XXX/insights-h/etc to out
+            member("etc/yum.repos.d", link="../../../../out")
+            member("etc/yum.repos.d/evil.repo", b"evil")
+            # up2 stays inside through up, but up3 leaves through up2
+            member("etc/up", link="..")
+            member("etc/up2", link="up/..")
+            member("etc/up3", link="up2/../out")
+            member("etc/up3/evil2", b"evil")
+            member("etc/hard", link="insights-h/etc/yum.repos.d", hard=True)
+            member("etc/sub/file", b"ok")
+            member("etc/dir", link="sub")
+            member("etc/dir/file", b"overwrite")
+            member("etc/hosts.link", link="hosts")
+
+        with extract(path, extract_dir=extract_dir, select=lambda names: names) as ex:
+            root = os.path.join(ex.tmp_dir, "insights-h", "etc")
+            assert os.listdir(out) == []
+            assert sorted(os.listdir(root)) == ["dir", "hosts", "hosts.link", "sub", "up", "up2"]
+            with open(os.path.join(root, "hosts.link")) as f:
+                assert f.read() == "127.0.0.1 localhost"
+            with open(os.path.join(root, "sub", "file")) as f:
+                assert f.read() == "ok"
+
+        select = member_selector(["etc/yum.repos.d/*"])
+        with extract(path, extract_dir=extract_dir, select=select) as ex:
+            assert os.listdir(out) == []
+            assert not os.path.lexists(os.path.join(ex.tmp_dir, "insights-h", "etc", "yum.repos.d"))
+    finally:
+        subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def test_probe():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        root = _make_tree(tmp_dir)
+        assert probe(tmp_dir) == (root, HostArchiveContext)
+        assert probe(tmp_dir, depth=1) is None
+
+        ctx = create_context(tmp_dir)
+        assert isinstance(ctx, HostArchiveContext)
+        assert ctx.root == root
+        assert callable(ctx._all_files)
+        assert os.path.join(root, "var/log/messages") in ctx.all_files
+        assert not callable(ctx._all_files)
+
+        sos = os.path.join(tmp_dir, "deep", "er", "sosreport")
+        os.makedirs(os.path.join(sos, "sos_commands"))
+        with open(os.path.join(sos, "sos_commands", "uname"), "w") as f:
+            f.write("Linux")
+        subprocess.call(["rm", "-rf", root])
+        assert probe(tmp_dir) is None
+        ctx = create_context(tmp_dir)
+        assert isinstance(ctx, SosArchiveContext)
+        assert ctx.root == sos
+        assert ctx.all_files == [os.path.join(sos, "sos_commands", "uname")]
+    finally:
+        subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def test_selective_zip():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        root = _make_tree(tmp_dir)
+        path = os.path.join(tmp_dir, "test.zip")
+        with closing(zipfile.ZipFile(path, "w")) as zf:
+            for rel in ("etc/redhat-release", "etc/hosts", "insights_commands/uname_-a"):
+                zf.write(os.path.join(root, rel), os.path.join("insights-host", rel))
+
+        load_default_plugins()
+        patterns = get_archive_patterns(dr.get_dependency_graph(Specs.redhat_release))
+        assert "etc/redhat-release" in patterns
+        with extract(path, select=member_selector(patterns)) as ex:
+            files = sorted(os.path.relpath(f, ex.tmp_dir) for f in get_all_files(ex.tmp_dir))
+            assert files == ["insights-host/etc/redhat-release",
+                             "insights-host/insights_commands/uname_-a"]
+    finally:
+        subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def test_selector_extracts_everything_without_markers():
+    names = ["root/etc/hosts", "root/var/log/messages"]
+    assert member_selector(["etc/hosts"])(names) == names
+
+
+def test_archive_patterns_unknown():
+    @datasource(HostArchiveContext)
+    def custom(broker):
+        pass
+
+    assert get_archive_patterns(dr.get_dependency_graph(custom)) is None
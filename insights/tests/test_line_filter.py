@@ -0,0 +1,55 @@
+from insights.util.line_filter import LineFilter, trie_pattern
+
+LINES = [
+    "error: disk full\n",
+    "warning: password=secret\n",
+    "info: all is well on myhost\n",
+    "errors on myhost and myhost\n",
+]
+
+
+def test_trie_pattern():
+    assert trie_pattern(["abc"]) == "abc"
+    assert trie_pattern(["abc", "abd"]) == "ab(?:c|d)"
+    # a string with another string as its prefix is redundant
+    assert trie_pattern(["error", "errors"]) == "error"
+    assert trie_pattern(["errors", "error"]) == "error"
+    assert trie_pattern(["a.b"]) == "a\\.b"
+
+
+def test_empty_filter():
+    f = LineFilter()
+    assert not f
+    assert not f.drops_lines
+    assert list(f(LINES)) == LINES
+
+
+def test_include():
+    f = LineFilter(include=["error", "warn"])
+    assert f.drops_lines
+    assert list(f(LINES)) == [LINES[0], LINES[1], LINES[3]]
+
+
+def test_include_empty_string():
+    f = LineFilter(include=["", "error"])
+    assert list(f(LINES)) == LINES
+
+
+def test_exclude():
+    f = LineFilter(exclude=["password", "[", "disk full"])
+    assert list(f(LINES)) == [LINES[2], LINES[3]]
+
+
+def test_replace():
+    f = LineFilter(replace=[("myhost", "keyword"), ("", "nothing")])
+    assert f
+    assert not f.drops_lines
+    result = list(f(LINES))
+    assert result[2] == "info: all is well on keyword\n"
+    assert result[3] == "errors on keyword and keyword\n"
+
+
+def test_all():
+    f = LineFilter(include=["error", "warn"], exclude=["password"],
+                   replace=[("myhost", "keyword")])
+    assert list(f(LINES)) == [LINES[0], "errors on keyword and keyword\n"]
@@ -1,5 +1,5 @@
 # -*- coding: UTF-8 -*-
-from insights.core import LogFileOutput
+from insights.core import LogFileOutput, StreamingLogFileOutput
 from insights.parsers import ParseException
 from insights.tests import context_wrap
 
@@ -301,3 +301,220 @@ def test_logs_with_two_timestamps():
         logerr = BadClassMariaDBLog(ctx)
         assert list(logerr.get_after(datetime(2017, 3, 27, 3, 39, 46))) is None
     assert 'get_after does not recognise time formats of type ' in str(exc)
+
+
+class FakeIndexedClass(LogFileOutput):
+    pass
+
+
+FakeIndexedClass.keep_scan('pulp_lines', 'pulp')
+FakeIndexedClass.token_scan('has_rate_limit', ['rate', 'limit'])
+FakeIndexedClass.last_scan('last_drop', ['drop', 'lost'], check=any)
+
+
+def test_token_index():
+    log = FakeIndexedClass(context_wrap(MESSAGES))
+    lines = log.lines
+
+    def linear(s, check=all):
+        tokens = [s] if isinstance(s, str) else s
+        return [{'raw_message': l} for l in lines if check(t in l for t in tokens)]
+
+    # Scanner tokens are indexed in the same pass as the first search
+    assert set(log._token_lines) == set(['pulp', 'rate', 'limit', 'drop', 'lost'])
+    assert log.pulp_lines == linear('pulp')
+    assert log.has_rate_limit is True
+    assert log.last_drop == linear(['drop', 'lost'], any)[-1]
+
+    for s in ['puppet', ['pulp', 'ERROR'], 'Mar 27', '', 'not there']:
+        assert log.get(s) == linear(s)
+        assert log.get(s, check=any) == linear(s, any)
+        assert log.get(s, num=2) == linear(s)[:2]
+        assert log.get(s, num=2, reverse=True) == linear(s)[-2:]
+        assert log.get(s, num=0, reverse=True) == []
+        assert (s in log) == bool(linear(s))
+    assert 'puppet' in log._token_lines
+
+    # The index follows changes to the lines
+    log.lines = lines[:1]
+    assert log.get('pulp') == []
+    log.lines.append(lines[3])
+    assert log.get('pulp') == [{'raw_message': lines[3]}]
+
+
+def test_token_index_custom_check():
+    log = FakeIndexedClass(context_wrap(MESSAGES))
+
+    def one(found):
+        return sum(found) == 1
+
+    assert log.get(['pulp', 'ERROR'], check=one) == [
+        {'raw_message': l} for l in log.lines if ('pulp' in l) != ('ERROR' in l)
+    ]
+
+
+class FakeStreamingClass(StreamingLogFileOutput):
+    time_format = '%b %d %H:%M:%S'
+
+
+FakeStreamingClass.keep_scan('puppet_lines', 'puppet-master')
+FakeStreamingClass.token_scan('has_pulp_error', ['pulp', 'ERROR'])
+
+
+class CountingContext(object):
+    def __init__(self, content):
+        self.content = content.strip().splitlines()
+        self.path = self.relative_path = '/var/log/messages'
+        self.streams = 0
+
+    def stream(self):
+        self.streams += 1
+        for line in self.content:
+            yield line
+
+
+def test_streaming():
+    ctx = CountingContext(MESSAGES)
+    log = FakeStreamingClass(ctx)
+    full = FakeMessagesClass(context_wrap(MESSAGES))
+    assert ctx.streams == 1
+
+    # Only the lines the scanners look for are kept
+    assert all('puppet-master' in l or 'pulp' in l for l in log.lines)
+    assert len(log.lines) < len(ctx.content)
+    assert log.puppet_lines == full.get('puppet-master')
+    assert log.has_pulp_error is True
+
+    # Searches for kept strings don't read the stream again
+    assert log.get('puppet-master', num=1, reverse=True) == full.get('puppet-master', num=1, reverse=True)
+    assert 'pulp' in log
+    assert ctx.streams == 1
+
+    # Other strings are read from the stream once
+    assert log.get('imuxsock') == full.get('imuxsock')
+    assert log.get(['imuxsock', 'lost']) == full.get(['imuxsock', 'lost'])
+    assert 'not there' not in log
+    assert ctx.streams == 4
+    assert log.puppet_lines == log.get('puppet-master')
+
+    def one(found):
+        return sum(found) == 1
+
+    assert log.get(['drop', 'lost'], check=one) == full.get(['drop', 'lost'], check=one)
+
+    # get_after reads the whole stream
+    streams = ctx.streams
+    ts = datetime(2017, 3, 27, 3, 39, 46)
+    assert list(log.get_after(ts)) == list(full.get_after(ts))
+    assert ctx.streams == streams + 1
+
+
+class CountingCommandContext(CountingContext):
+    def __init__(self, content):
+        super(CountingCommandContext, self).__init__(content)
+        self.cmd = '/usr/bin/journalctl --no-pager --boot'
+
+
+def test_streaming_command():
+    ctx = CountingCommandContext(MESSAGES)
+    log = FakeStreamingClass(ctx)
+    full = FakeMessagesClass(context_wrap(MESSAGES))
+
+    # the command's output is read once and kept whole
+    assert log.lines == ctx.content
+    assert log.puppet_lines == full.get('puppet-master')
+    assert log.get('imuxsock') == full.get('imuxsock')
+    ts = datetime(2017, 3, 27, 3, 39, 46)
+    assert list(log.get_after(ts)) == list(full.get_after(ts))
+    assert ctx.streams == 0
+
+
+def test_streaming_context_wrap():
+    log = FakeStreamingClass(context_wrap(MESSAGES))
+    assert log.get('rsyslogd') == FakeMessagesClass(context_wrap(MESSAGES)).get('rsyslogd')
+
+
+class FakeYearClass(LogFileOutput):
+    time_format = '%Y-%m-%d %H:%M:%S'
+
+
+class FakeStreamingYearClass(StreamingLogFileOutput):
+    time_format = '%Y-%m-%d %H:%M:%S'
+
+
+ROLLOVER = """
+Dec 31 23:59:58 system kernel: last of the year
+    continued
+Dec 31 23:59:59 system pulp: pulp before midnight
+Jan  1 00:00:01 system kernel: first of the year
+    continued pulp
+Jan  1 00:00:02 system pulp: pulp after midnight
+"""
+
+WITH_YEAR = """
+2019-03-27 03:18:15 pulp start
+    pulp continued
+2019-03-27 03:18:16 kernel middle
+    pulp continued after kernel
+2019-03-27 03:18:17 pulp more
+2019-03-27 03:18:18 kernel out of order follows
+2019-03-27 03:18:14 pulp out of order
+2019-03-27 03:18:19 pulp end
+"""
+
+
+def test_get_after_index():
+    cases = [
+        (FakeMessagesClass, FakeStreamingClass, MESSAGES, [
+            datetime(2017, 3, 27, 3, 18, 20), datetime(2017, 3, 27, 3, 39, 46),
+            datetime(2017, 3, 27, 3, 49, 10), datetime(2017, 3, 28, 0, 0, 0),
+            datetime(2017, 1, 1, 0, 0, 0), datetime(2017, 12, 31, 0, 0, 0),
+        ]),
+        (FakeMessagesClass, FakeStreamingClass, ROLLOVER, [
+            datetime(2017, 12, 31, 23, 59, 59), datetime(2018, 1, 1, 0, 0, 0),
+            datetime(2018, 1, 1, 0, 0, 2), datetime(2017, 6, 1, 0, 0, 0),
+        ]),
+        (FakeYearClass, FakeStreamingYearClass, WITH_YEAR, [
+            datetime(2019, 3, 27, 3, 18, 15), datetime(2019, 3, 27, 3, 18, 16),
+            datetime(2019, 3, 27, 3, 18, 17), datetime(2019, 3, 27, 3, 18, 20),
+        ]),
+        (FakeYearClass, FakeStreamingYearClass, WITH_YEAR.replace("2019-03-27 03:18:14", "2019-03-27 03:18:18"), [
+            datetime(2019, 3, 27, 3, 18, 15), datetime(2019, 3, 27, 3, 18, 16),
+            datetime(2019, 3, 27, 3, 18, 18), datetime(2019, 3, 27, 3, 18, 20),
+        ]),
+    ]
+    for indexed_class, streaming_class, content, timestamps in cases:
+        log = indexed_class(context_wrap(content))
+        reference = streaming_class(context_wrap(content))
+        for ts in timestamps:
+            for s in [None, 'pulp', ['pulp', 'continued']]:
+                expected = list(reference.get_after(ts, s))
+                assert list(log.get_after(ts, s)) == expected, (content, ts, s)
+
+    # The index is built once and reused
+    log = FakeMessagesClass(context_wrap(MESSAGES))
+    list(log.get_after(datetime(2017, 3, 27, 3, 39, 46)))
+    index = log._timestamp_index()
+    assert index[2] is True
+    list(log.get_after(datetime(2017, 3, 27, 3, 18, 20)))
+    assert log._timestamp_index() is index
+
+
+def test_get_after_unparseable_stamp():
+    # Without a year, Feb 29 can't be parsed, but it's only an error if the
+    # line is searched
+    content = """
+Feb 28 10:00:00 host pulp: first
+Feb 29 10:00:00 host kernel: leap day
+Mar  1 10:00:00 host pulp: second
+""".strip()
+    for cls in (FakeMessagesClass, FakeStreamingClass):
+        log = cls(context_wrap(content))
+        assert log._timestamp_index() is None
+        lines = list(log.get_after(datetime(2017, 1, 1), 'pulp'))
+        assert [l['raw_message'] for l in lines] == [
+            "Feb 28 10:00:00 host pulp: first",
+            "Mar  1 10:00:00 host pulp: second",
+        ]
+        with pytest.raises(ValueError):
+            list(log.get_after(datetime(2017, 1, 1)))
@@ -0,0 +1,49 @@
+import os
+import pytest
+
+from insights.util.pack import PackError, PackReader, PackWriter
+
+
+def test_round_trip(tmpdir):
+    path = str(tmpdir.join("test.pack"))
+    entries = {
+        "empty": b"",
+        "small": b"abc",
+        "big": b"line of text\n" * 1000,
+        "nested/name": os.urandom(100),
+    }
+    for compress in (False, True):
+        with PackWriter(path, compress=compress) as w:
+            for name, data in entries.items():
+                w.add(name, data)
+            w.add("small", b"replaced")
+
+        with PackReader(path) as r:
+            assert sorted(r.names()) == sorted(entries)
+            assert len(r) == len(entries)
+            assert "big" in r
+            assert "missing" not in r
+            assert r.read("small") == b"replaced"
+            for name in ("big", "empty", "nested/name"):
+                assert r.read(name) == entries[name]
+            with pytest.raises(KeyError):
+                r.read("missing")
+
+        if compress:
+            assert os.path.getsize(path) < len(entries["big"])
+
+
+def test_incomplete(tmpdir):
+    path = str(tmpdir.join("test.pack"))
+    w = PackWriter(path)
+    w.add("one", b"data")
+    w.f.flush()
+    with pytest.raises(PackError):
+        PackReader(path)
+    w.close()
+    assert PackReader(path).read("one") == b"data"
+
+    with open(path, "wb") as f:
+        f.write(b"not a pack")
+    with pytest.raises(PackError):
+        PackReader(path)
@@ -0,0 +1,98 @@
+import threading
+
+from insights import run
+from insights.core import Parser, StreamParser
+from insights.core import parser_cache
+from insights.core.parser_cache import ParserCache
+from insights.parsers.redhat_release import RedhatRelease
+from insights.tests import context_wrap
+
+REDHAT_RELEASE = "Red Hat Enterprise Linux Server release 7.3 (Maipo)"
+
+
+class Counting(Parser):
+    calls = 0
+
+    def parse_content(self, content):
+        Counting.calls += 1
+        self.lines = list(content)
+
+
+class CountingStream(StreamParser):
+    calls = 0
+
+    def parse_content(self, content):
+        CountingStream.calls += 1
+        self.lines = list(content)
+
+
+class Unpicklable(Parser):
+    def parse_content(self, content):
+        self.lock = threading.Lock()
+
+
+def test_parse(tmpdir):
+    cache = ParserCache(tmpdir.strpath)
+    Counting.calls = 0
+
+    first = cache.parse(Counting, context_wrap("a\nb"))
+    second = cache.parse(Counting, context_wrap("a\nb"))
+    assert Counting.calls == 1
+    assert second is not first
+    assert second.lines == first.lines == ["a", "b"]
+    assert second.file_path == "/path"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.parse(Counting, context_wrap("a\nc"))
+    cache.parse(Counting, context_wrap("a\nb", path="other"))
+    assert Counting.calls == 3
+
+
+def test_stream(tmpdir):
+    cache = ParserCache(tmpdir.strpath)
+    CountingStream.calls = 0
+    for i in range(2):
+        assert cache.parse(CountingStream, context_wrap("a\nb")).lines == ["a", "b"]
+    assert CountingStream.calls == 1
+
+
+def test_key(tmpdir):
+    cache = ParserCache(tmpdir.strpath)
+    ctx = context_wrap("a")
+    other = context_wrap("a")
+    assert cache.key(Counting, ctx) == cache.key(Counting, other)
+    assert cache.key(Counting, ctx) != cache.key(CountingStream, ctx)
+    other.args = "x"
+    assert cache.key(Counting, ctx) != cache.key(Counting, other)
+
+
+def test_unpicklable(tmpdir):
+    cache = ParserCache(tmpdir.strpath)
+    cache.parse(Unpicklable, context_wrap("a"))
+    cache.parse(Unpicklable, context_wrap("a"))
+    assert cache.hits == 0
+
+
+def test_corrupt_entry(tmpdir):
+    cache = ParserCache(tmpdir.strpath)
+    ctx = context_wrap("a")
+    cache.parse(Counting, ctx)
+    key = cache.key(Counting, ctx)
+    with open(cache._path(key), "wb") as f:
+        f.write(b"junk")
+    assert cache.get(key) is None
+    assert cache.parse(Counting, ctx).lines == ["a"]
+
+
+def test_run(tmpdir):
+    root = tmpdir.mkdir("host")
+    root.mkdir("etc").join("redhat-release").write(REDHAT_RELEASE)
+    root.mkdir("insights_commands").join("hostname").write("test")
+    cache = parser_cache.set_cache(tmpdir.join("cache").strpath)
+    try:
+        for i in range(2):
+            broker = run(RedhatRelease, root=root.strpath)
+            assert broker[RedhatRelease].major == 7
+        assert cache.hits == 1
+    finally:
+        parser_cache.set_cache(None)
@@ -5,6 +5,8 @@ from insights import dr
 from insights.core.plugins import component
 from insights.core.serde import (serializer,
                                  deserializer,
+                                 get_codec,
+                                 CODECS,
                                  Hydration,
                                  marshal,
                                  unmarshal)
@@ -125,3 +127,11 @@ def test_round_trip():
         pass
         if os.path.exists(tmp_path):
             fs.remove(tmp_path)
+
+
+def test_codecs():
+    doc = {"name": "thing", "results": {"a": [1, 2.5, None, True], "b": u"caf\xe9"}}
+    assert "json" in CODECS
+    for name in CODECS:
+        codec = get_codec(name)
+        assert codec.loads(codec.dumps(doc)) == doc
@@ -1,6 +1,8 @@
 import os
+import pytest
 from tempfile import mkdtemp
-from insights import dr
+from insights import dr, process_dir
+from insights.core import serde
 from insights.core.plugins import component
 from insights.core.serde import Hydration
 from insights.core.spec_factory import (
@@ -18,6 +20,16 @@ def thing():
     pass
 
 
+@component()
+def other_thing():
+    pass
+
+
+@component(thing)
+def uses_thing(t):
+    return t.content
+
+
 def test_text_file():
     before = TextFileProvider(relative_path, root)
     broker = dr.Broker()
@@ -48,3 +60,101 @@ def test_raw_file():
     finally:
         if tmp_path and os.path.exists(tmp_path):
             fs.remove(tmp_path)
+
+
+def test_packed():
+    text = TextFileProvider(relative_path, root)
+    raw = RawFileProvider(relative_path, root)
+    broker = dr.Broker()
+    broker[thing] = [text, raw]
+
+    tmp_path = mkdtemp()
+    try:
+        hydra = Hydration(tmp_path, packed=True, compress=True)
+        hydra.dehydrate(thing, broker)
+        hydra.close()
+        assert os.listdir(tmp_path) == [Hydration.pack_name]
+
+        hydra = Hydration(tmp_path)
+        assert hydra.names() == [dr.get_name(thing)]
+        after = hydra.hydrate()[thing]
+        assert after[0].content == text.content
+        assert after[1].content == raw.content
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            fs.remove(tmp_path)
+
+
+def test_lazy():
+    before = TextFileProvider(relative_path, root)
+    broker = dr.Broker()
+    broker[thing] = before
+
+    tmp_path = mkdtemp()
+    try:
+        hydra = Hydration(tmp_path)
+        hydra.dehydrate(thing, broker)
+        broker = hydra.hydrate(lazy=True)
+        assert thing in broker
+        assert thing not in broker.instances
+        assert broker[thing].content == before.content
+        assert thing in broker.instances
+        assert thing in broker.exec_times
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            fs.remove(tmp_path)
+
+
+def test_process_dir_lazy():
+    broker = dr.Broker()
+    broker[thing] = TextFileProvider(relative_path, root)
+    broker[other_thing] = RawFileProvider(relative_path, root)
+
+    tmp_path = mkdtemp()
+    try:
+        hydra = Hydration(tmp_path)
+        hydra.dehydrate(thing, broker)
+        hydra.dehydrate(other_thing, broker)
+        open(os.path.join(tmp_path, "insights_archive.txt"), "w").close()
+        graph = dr.get_dependency_graph(uses_thing)
+
+        eager = process_dir(dr.Broker(), tmp_path, graph, None)
+        assert eager[uses_thing] == broker[thing].content
+        assert other_thing in eager.instances
+        assert other_thing in eager.get_by_type(component)
+
+        lazy = process_dir(dr.Broker(), tmp_path, graph, None, lazy=True)
+        assert lazy[uses_thing] == broker[thing].content
+        assert thing in lazy.instances
+        assert other_thing not in lazy
+        assert not lazy.loaders
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            fs.remove(tmp_path)
+
+
+def test_codecs():
+    before = TextFileProvider(relative_path, root)
+    broker = dr.Broker()
+    broker[thing] = before
+
+    for name in serde.CODECS:
+        for packed in (False, True):
+            tmp_path = mkdtemp()
+            try:
+                hydra = Hydration(tmp_path, packed=packed, codec=name)
+                hydra.dehydrate(thing, broker)
+                hydra.close()
+
+                hydra = Hydration(tmp_path)
+                assert hydra.names() == [dr.get_name(thing)]
+                after = hydra.hydrate()[thing]
+                assert after.content == before.content
+            finally:
+                if tmp_path and os.path.exists(tmp_path):
+                    fs.remove(tmp_path)
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        Hydration(codec="nope")
@@ -1,14 +1,15 @@
 import os
 
 from insights import add_filter, dr
-from insights.core import Parser
+from insights.core import Parser, blacklist
 from insights.core.context import HostContext
-from insights.core.plugins import ContentException
-from insights.core.spec_factory import (DatasourceProvider, simple_file,
+from insights.core.plugins import ContentException, parser
+from insights.core.spec_factory import (DatasourceProvider, TextFileProvider, simple_file,
                                         simple_command, glob_file, SpecSet)
 import tempfile
 import pytest
 import glob
+import shutil
 
 here = os.path.abspath(os.path.dirname(__file__))
 
@@ -102,3 +103,135 @@ def test_datasource_provider():
     p = MyParser(ds)
     assert p.content == data.splitlines()
     assert list(ds.stream()) == data.splitlines()
+
+
+def test_content_interning():
+    calls = []
+
+    class Shared(Parser):
+        shareable = True
+
+        def parse_content(self, content):
+            calls.append(1)
+            self.content = content
+
+    class NotShared(Shared):
+        shareable = False
+
+    @dr.ComponentType()
+    def providers():
+        return [DatasourceProvider("a\nb", relative_path="one"),
+                DatasourceProvider("a\nb", relative_path="two"),
+                DatasourceProvider("c", relative_path="three")]
+
+    assert providers().pop().content_hash != providers()[0].content_hash
+    first, second, _ = providers()
+    assert first.content_hash == second.content_hash
+    assert first.content is not second.content
+
+    table = {}
+    assert first.intern(table) == second.intern(table)
+    assert first.content is second.content
+
+    shared = parser(providers)(Shared)
+    not_shared = parser(providers)(NotShared)
+    broker = dr.run(dr.get_dependency_graph(shared), dr.Broker())
+    one, two, three = broker[shared]
+    assert len(calls) == 2
+    assert [p.file_path for p in (one, two, three)] == ["/one", "/two", "/three"]
+    assert one.content is two.content
+    assert three.content == ["c"]
+
+    del calls[:]
+    broker = dr.run(dr.get_dependency_graph(not_shared), dr.Broker())
+    assert len(calls) == 3
+
+
+@pytest.fixture
+def blacklisted():
+    blacklist.add_pattern("def test_")
+    blacklist.add_keyword("Stuff")
+    yield
+    blacklist._PATTERN_FILTERS.discard("def test_")
+    blacklist._KEYWORD_FILTERS.discard("Stuff")
+
+
+def test_blacklist_text_file(blacklisted):
+    hn = HostContext()
+    broker = dr.Broker()
+    broker[HostContext] = hn
+    provider = Stuff.smpl_file(broker)
+
+    content = provider.content
+    assert content
+    assert not any("def test_" in l for l in content)
+    assert not any("Stuff" in l for l in content)
+    assert any("keyword.smpl_file" in l for l in content)
+    assert list(provider.stream()) == content
+
+    tmp = tempfile.mkdtemp()
+    try:
+        dst = os.path.join(tmp, "out")
+        provider.write(dst)
+        with open(dst) as f:
+            assert f.read().splitlines() == content
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_blacklist_command(blacklisted):
+    hn = HostContext()
+    broker = dr.Broker()
+    broker[HostContext] = hn
+    cmd = simple_command("echo 'def test_this\nStuff here'")
+    provider = cmd(broker)
+    assert provider.content == ["keyword here"]
+    assert list(provider.stream()) == ["keyword here"]
+
+    tmp = tempfile.mkdtemp()
+    try:
+        dst = os.path.join(tmp, "out")
+        provider.write(dst)
+        with open(dst) as f:
+            assert f.read() == "keyword here\n"
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_command_filtered_out():
+    hn = HostContext()
+    broker = dr.Broker()
+    broker[HostContext] = hn
+    cmd = simple_command("echo nothing to see", filterable=True)
+    add_filter(cmd, "something")
+    with pytest.raises(ContentException):
+        cmd(broker).content
+
+    # serializing it fails the same way, and leaves no file behind
+    tmp = tempfile.mkdtemp()
+    try:
+        dst = os.path.join(tmp, "out")
+        with pytest.raises(ContentException):
+            cmd(broker).write(dst)
+        assert not os.path.exists(dst)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_text_file_same_with_or_without_filters():
+    tmp = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(tmp, "data"), "wb") as f:
+            f.write(b"caf\xc3\xa9\r\nbad \xff byte\nStuff\n")
+
+        plain = TextFileProvider("data", root=tmp)
+        assert plain.content == [u"caf\xe9", u"bad  byte", u"Stuff"]
+
+        blacklist.add_keyword("Stuff")
+        try:
+            filtered = TextFileProvider("data", root=tmp)
+            assert filtered.content == [u"caf\xe9", u"bad  byte", u"keyword"]
+        finally:
+            blacklist._KEYWORD_FILTERS.discard("Stuff")
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,140 @@
+import glob
+import os
+import pytest
+import tarfile
+import zipfile
+from contextlib import closing
+
+from insights import run
+from insights.core.archives import InvalidArchive
+from insights.core.context import HostArchiveContext
+from insights.core.hydration import create_archive_context, create_context
+from insights.core.spec_factory import RawFileProvider, TextFileProvider
+from insights.core.vfs import ArchiveFS, IndexedFS, LOCAL
+from insights.parsers.uname import Uname
+from insights.specs import Specs
+
+REDHAT_RELEASE = "Red Hat Enterprise Linux Server release 7.3 (Maipo)"
+UNAME = "Linux test.redhat.com 3.10.0-514.el7.x86_64 #1 SMP Wed Oct 19 11:24:13 EDT 2016 x86_64 x86_64 x86_64 GNU/Linux"
+
+
+def make_tree(tmpdir):
+    root = tmpdir.mkdir("insights-host")
+    root.mkdir("etc").join("redhat-release").write(REDHAT_RELEASE)
+    root.join("etc", "hosts").write("127.0.0.1 localhost\n::1 localhost\n")
+    root.join("etc", ".hidden").write("")
+    root.mkdir("insights_commands").join("uname_-a").write(UNAME)
+    root.mkdir("empty")
+    os.symlink("redhat-release", root.join("etc", "system-release").strpath)
+    os.symlink("/etc/shadow", root.join("etc", "shadow").strpath)
+    return root
+
+
+@pytest.fixture(params=["tar.gz", "tar", "zip"])
+def archive(request, tmpdir):
+    root = make_tree(tmpdir)
+    path = tmpdir.join("archive." + request.param).strpath
+    if request.param == "zip":
+        with closing(zipfile.ZipFile(path, "w")) as zf:
+            for d, dirs, files in os.walk(root.strpath):
+                for n in dirs + files:
+                    full = os.path.join(d, n)
+                    rel = os.path.relpath(full, tmpdir.strpath)
+                    if os.path.islink(full):
+                        info = zipfile.ZipInfo(rel)
+                        info.external_attr = 0o120777 << 16
+                        zf.writestr(info, os.readlink(full))
+                    else:
+                        zf.write(full, rel)
+    else:
+        mode = "w:gz" if request.param == "tar.gz" else "w"
+        with closing(tarfile.open(path, mode)) as tf:
+            tf.add(root.strpath, "insights-host")
+    return path
+
+
+def test_archive_fs(archive):
+    with ArchiveFS(archive) as fs:
+        root = os.path.join(fs.path, "insights-host")
+        etc = os.path.join(root, "etc")
+
+        assert fs.listdir(etc) == [".hidden", "hosts", "redhat-release", "shadow", "system-release"]
+        assert fs.isdir(os.path.join(root, "empty"))
+        assert fs.isfile(os.path.join(etc, "hosts"))
+        assert not fs.exists(os.path.join(etc, "missing"))
+        assert not fs.exists("/etc/hosts")
+
+        assert fs.glob(os.path.join(fs.path, "*", "etc", "*release")) == [
+            os.path.join(etc, "redhat-release"), os.path.join(etc, "system-release")]
+        assert fs.glob(os.path.join(etc, "*")) == [os.path.join(etc, n) for n in fs.listdir(etc) if n != ".hidden"]
+
+        release = os.path.join(etc, "system-release")
+        assert fs.islink(release)
+        assert fs.realpath(release) == os.path.join(etc, "redhat-release")
+        assert fs.realpath(os.path.join(etc, "shadow")) == "/etc/shadow"
+        with fs.open(release) as f:
+            assert f.read() == REDHAT_RELEASE
+        with fs.open(release, "rb") as f:
+            assert f.read() == REDHAT_RELEASE.encode("utf-8")
+
+        assert sorted(os.path.relpath(f, root) for f in fs.all_files()) == [
+            "etc/.hidden", "etc/hosts", "etc/redhat-release", "insights_commands/uname_-a"]
+
+
+def test_providers(archive):
+    with ArchiveFS(archive) as fs:
+        ctx = create_archive_context(fs)
+        assert isinstance(ctx, HostArchiveContext)
+        assert ctx.root == os.path.join(fs.path, "insights-host")
+
+        assert TextFileProvider("etc/hosts", root=ctx.root, ctx=ctx).content == ["127.0.0.1 localhost", "::1 localhost"]
+        assert RawFileProvider("etc/system-release", root=ctx.root, ctx=ctx).content == REDHAT_RELEASE.encode("utf-8")
+        with pytest.raises(Exception):
+            TextFileProvider("etc/shadow", root=ctx.root, ctx=ctx)
+
+
+def test_run_in_place(archive):
+    broker = run([Uname, Specs.redhat_release], root=archive, in_place=True)
+    assert broker[Uname].version == "3.10.0"
+    assert isinstance(broker[HostArchiveContext].fs, ArchiveFS)
+
+
+def test_not_an_archive(tmpdir):
+    path = tmpdir.join("junk").strpath
+    with open(path, "w") as f:
+        f.write("junk")
+    with pytest.raises(InvalidArchive):
+        ArchiveFS(path)
+
+
+def test_default_fs():
+    assert HostArchiveContext("/tmp").fs is LOCAL
+
+
+def test_indexed_fs(tmpdir):
+    root = make_tree(tmpdir)
+    root.mkdir("sub").join("inner").write("x")
+    os.symlink(root.join("sub").strpath, root.join("linked").strpath)
+    fs = IndexedFS(root.strpath)
+
+    for pattern in ["*", "*/*", "etc/*", "etc/.*", "etc/*release", "etc/hosts", "etc/missing",
+                    "*/inner", "linked/*", "etc/hosts/*", "*/uname_-?"]:
+        full = os.path.join(root.strpath, pattern)
+        assert fs.glob(full) == sorted(glob.glob(full)), pattern
+    assert fs.glob(root.strpath) == [root.strpath]
+    assert fs.listdir(root.join("etc").strpath) == sorted(os.listdir(root.join("etc").strpath))
+    assert fs.listdir(root.join("linked").strpath) == ["inner"]
+
+    # the tree is only walked once
+    root.join("etc", "new").write("")
+    assert root.join("etc", "new").strpath not in fs.glob(root.join("etc", "*").strpath)
+    assert fs.glob(str(tmpdir.join("*"))) == sorted(glob.glob(str(tmpdir.join("*"))))
+
+
+def test_create_context_index(tmpdir):
+    root = make_tree(tmpdir)
+    ctx = create_context(tmpdir.strpath)
+    assert isinstance(ctx.fs, IndexedFS)
+    assert ctx.fs.root == root.strpath
+    assert ctx.glob(root.join("etc", "*-release").strpath) == [
+        root.join("etc", "redhat-release").strpath, root.join("etc", "system-release").strpath]
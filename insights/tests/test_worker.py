@@ -0,0 +1,56 @@
+from six import StringIO
+
+from insights import make_pass
+from insights.plugins import always_fires, never_fires
+from insights.specs import Specs
+from insights.worker import Worker, read_paths, run, run_batch
+
+REDHAT_RELEASE = "Red Hat Enterprise Linux Server release 7.3 (Maipo)"
+UNAME = "Linux test.redhat.com 3.10.0-514.el7.x86_64 #1 SMP Wed Oct 19 11:24:13 EDT 2016 x86_64 x86_64 x86_64 GNU/Linux"
+
+
+def make_archive(tmpdir, name):
+    root = tmpdir / name
+    root.mkdir()
+    d = root / "etc"
+    d.mkdir()
+    (d / "redhat-release").write(REDHAT_RELEASE)
+    cmds = root / "insights_commands"
+    cmds.mkdir()
+    (cmds / "uname_-a").write(UNAME)
+    return root.strpath
+
+
+def test_worker_process(tmpdir):
+    worker = Worker(component=[Specs.redhat_release, always_fires.report, never_fires.report])
+    plan = worker.plan
+
+    for name in ("one", "two"):
+        broker = worker.process(make_archive(tmpdir, name))
+        assert broker[always_fires.report] == make_pass("ALWAYS_FIRES", kernel="this is junk")
+        assert broker[never_fires.report]["type"] == "skip"
+        assert broker[Specs.redhat_release].content == [REDHAT_RELEASE]
+
+    assert worker.plan is plan
+
+
+def test_worker_run(tmpdir):
+    worker = Worker(component=always_fires.report)
+    good = make_archive(tmpdir, "good")
+    missing = tmpdir.join("missing").strpath
+
+    out = StringIO()
+    run(worker, read_paths(StringIO("\n".join([good, "", missing]))), stream=out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert '"ALWAYS_FIRES"' in lines[0]
+    assert '"error"' in lines[1]
+
+
+def test_worker_run_batch(tmpdir):
+    paths = [make_archive(tmpdir, "one"), make_archive(tmpdir, "two")]
+    out = StringIO()
+    run_batch(paths, processes=2, stream=out, component=always_fires.report)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert all('"ALWAYS_FIRES"' in l for l in lines)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+The serde_bench module compares the codecs that Hydration can save metadata
+with. Each registered codec encodes and decodes the same documents, and the
+size and best time of each are reported.
+
+By default the document is shaped like a serialized log parser: a dict with a
+long list of lines. Pass directories of metadata saved by Hydration to
+benchmark real documents instead.
+
+>>> python -m insights.tools.serde_bench --lines 200000
+codec         bytes    dumps (s)    loads (s)
+json       18089101       0.1340       0.0468
+msgpack    17689074       0.0213       0.0235
+"""
+from __future__ import print_function
+import argparse
+import os
+import time
+
+from insights.core import serde
+
+
+def make_document(lines, width):
+    """
+    Returns a document shaped like a serialized parser with ``lines`` lines
+    of about ``width`` characters.
+    """
+    line = ("Jan  1 00:00:00 host kernel: %s" % ("x" * width))[:width]
+    return {
+        "name": "insights.parsers.messages.Messages",
+        "exec_time": 0.5,
+        "ser_time": 0.1,
+        "errors": [],
+        "results": {
+            "type": "insights.parsers.messages.Messages",
+            "object": {
+                "file_path": "/var/log/messages",
+                "lines": ["%s %d" % (line, i) for i in range(lines)],
+            },
+        },
+    }
+
+
+def load_documents(paths):
+    """
+    Returns the documents saved beneath each Hydration metadata directory in
+    paths.
+    """
+    docs = []
+    for path in paths:
+        for fn in sorted(os.listdir(path)):
+            ext = fn.rpartition(".")[2]
+            if ext in serde.CODECS:
+                with open(os.path.join(path, fn), "rb") as f:
+                    docs.append(serde.CODECS[ext].loads(f.read()))
+    return docs
+
+
+def _best(func, arg, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func(arg)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench(docs, codecs=None, repeat=3):
+    """
+    Encodes and decodes docs with each codec and returns a list of
+    ``(name, bytes, dumps seconds, loads seconds)``.
+    """
+    results = []
+    for name in codecs or sorted(serde.CODECS):
+        codec = serde.get_codec(name)
+        dumps, loads = codec.dumps, codec.loads
+
+        def encode(docs):
+            return [dumps(d) for d in docs]
+
+        def decode(data):
+            return [loads(d) for d in data]
+
+        dump_time, data = _best(encode, docs, repeat)
+        load_time, _ = _best(decode, data, repeat)
+        results.append((name, sum(len(d) for d in data), dump_time, load_time))
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser("Compare Hydration metadata codecs.")
+    p.add_argument("meta_data", nargs="*", help="Directories of saved metadata to use instead of a generated document.")
+    p.add_argument("-c", "--codec", action="append", help="Codec to include. Defaults to every registered codec.")
+    p.add_argument("-n", "--lines", type=int, default=100000, help="Lines in the generated document.")
+    p.add_argument("-w", "--width", type=int, default=80, help="Characters in each generated line.")
+    p.add_argument("-r", "--repeat", type=int, default=3, help="Runs of each codec. The best is reported.")
+    args = p.parse_args()
+
+    if args.meta_data:
+        docs = load_documents(args.meta_data)
+    else:
+        docs = [make_document(args.lines, args.width)]
+
+    print("%-8s %10s %12s %12s" % ("codec", "bytes", "dumps (s)", "loads (s)"))
+    for name, size, dump_time, load_time in bench(docs, args.codec, args.repeat):
+        print("%-8s %10d %12.4f %12.4f" % (name, size, dump_time, load_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Module for compressing data on several threads. Data is split into blocks
+that are compressed independently, and each block is written in order as a
+complete gzip member or xz stream. The result is a normal multi-member file
+that ``gzip``, ``xz``, ``tar``, and python's :mod:`gzip`, :mod:`lzma` and
+:mod:`tarfile` modules read like any other.
+
+>>> with ParallelCompressor("/tmp/data.gz", workers=4) as f:
+...     f.write(data)
+"""
+import struct
+import time
+import zlib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    from os import cpu_count
+except ImportError:
+    from multiprocessing import cpu_count
+
+
+def gzip_block(data, level=6):
+    """
+    Returns data compressed as a complete gzip member.
+    """
+    # a compressobj releases the GIL while compressing, zlib.compress
+    # doesn't on python 2
+    c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0)
+    body = c.compress(data) + c.flush()
+    header = b"\x1f\x8b\x08\x00" + struct.pack("<I", int(time.time())) + b"\x00\xff"
+    trailer = struct.pack("<II", zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+    return header + body + trailer
+
+
+def xz_block(data, level=6):
+    """
+    Returns data compressed as a complete xz stream.
+    """
+    c = lzma.LZMACompressor(preset=level)
+    return c.compress(data) + c.flush()
+
+
+BLOCK_COMPRESSORS = {"gz": gzip_block}
+""" Block compressors by archive extension. ``xz`` requires :mod:`lzma`. """
+if lzma is not None:
+    BLOCK_COMPRESSORS["xz"] = xz_block
+
+
+class ParallelCompressor(object):
+    """
+    A file-like object that compresses what's written to it on a pool of
+    threads. At most two blocks per worker are held in memory.
+
+    Args:
+        fileobj: a file name or a binary file opened for writing. A file
+            opened from a name is closed with the compressor.
+        compressor (str): a key of :data:`BLOCK_COMPRESSORS`.
+        workers (int): threads to compress with. Defaults to the number of
+            CPUs.
+        block_size (int): bytes of input in each block. Larger blocks
+            compress slightly better.
+        level (int): the compression level.
+
+    Raises:
+        ValueError: if the compressor isn't available.
+    """
+    def __init__(self, fileobj, compressor="gz", workers=None, block_size=1024 * 1024, level=6):
+        if compressor not in BLOCK_COMPRESSORS:
+            raise ValueError("Can't compress %s in parallel." % compressor)
+        self.compress = BLOCK_COMPRESSORS[compressor]
+        self.workers = workers or cpu_count() or 1
+        self.block_size = block_size
+        self.level = level
+        self.owns_file = not hasattr(fileobj, "write")
+        self.fileobj = open(fileobj, "wb") if self.owns_file else fileobj
+        self.pool = ThreadPool(self.workers)
+        self.pending = deque()
+        self.buf = []
+        self.buf_size = 0
+        self.offset = 0
+        self.written = False
+        self.closed = False
+
+    def _submit(self, data):
+        self.pending.append(self.pool.apply_async(self.compress, (data, self.level)))
+        while len(self.pending) >= 2 * self.workers:
+            self._write_next()
+
+    def _write_next(self):
+        self.fileobj.write(self.pending.popleft().get())
+        self.written = True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        self.buf.append(data)
+        self.buf_size += len(data)
+        self.offset += len(data)
+        if self.buf_size >= self.block_size:
+            data = b"".join(self.buf)
+            self.buf = []
+            self.buf_size = 0
+            for i in range(0, len(data) - self.block_size + 1, self.block_size):
+                self._submit(data[i:i + self.block_size])
+            rest = len(data) % self.block_size
+            if rest:
+                self.buf = [data[-rest:]]
+                self.buf_size = rest
+
+    def tell(self):
+        """
+        Returns the number of uncompressed bytes written.
+        """
+        return self.offset
+
+    def close(self):
+        """
+        Compresses what's left, writes every block, and stops the threads.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # an empty file still needs one member to be valid
+            if self.buf or not (self.pending or self.written):
+                self._submit(b"".join(self.buf))
+                self.buf = []
+            while self.pending:
+                self._write_next()
+        finally:
+            self.pool.terminate()
+            self.pool.join()
+            if self.owns_file:
+                self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
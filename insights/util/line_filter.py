@@ -0,0 +1,100 @@
+"""
+Module for filtering and redacting lines of text in a single pass without
+starting ``grep`` or ``sed`` processes.
+
+>>> f = LineFilter(include=["error", "warn"], exclude=["password"], replace=[("myhost", "keyword")])
+>>> list(f(["error on myhost", "all is well", "warn: password=x"]))
+['error on keyword']
+"""
+import re
+
+
+def trie_pattern(strings):
+    """
+    Builds a regular expression that matches if any of the literal strings
+    is found. Common prefixes are factored into a trie so the regular
+    expression engine checks every string at a position in a single walk
+    instead of trying each string in turn.
+
+    A string that has another string as a prefix is redundant when searching,
+    so it's dropped.
+    """
+    trie = {}
+    for s in strings:
+        node = trie
+        for ch in s:
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = True
+
+    def build(node):
+        if "" in node:
+            return ""
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        if len(alts) == 1:
+            return alts[0]
+        return "(?:%s)" % "|".join(alts)
+
+    return build(trie)
+
+
+def compile_strings(strings):
+    """
+    Returns a function that accepts a line and returns a true value if any of
+    the literal strings is in it, or ``None`` if there aren't any strings.
+    """
+    strings = set(strings or [])
+    if not strings:
+        return None
+    return re.compile(trie_pattern(strings)).search
+
+
+class LineFilter(object):
+    """
+    Applies include, exclude, and replace rules to lines of text. The rules
+    are compiled once, and any iterable of lines can then be filtered in a
+    single streaming pass.
+
+    Args:
+        include (iterable): literal strings. If any are given, only lines
+            containing at least one of them are kept. Like ``grep -F``.
+        exclude (iterable): literal strings. Lines containing any of them are
+            dropped. Like ``grep -v -F``.
+        replace (list): ``(old, new)`` pairs of literal strings. Every
+            occurrence of old in a kept line is replaced with new, in order.
+            Like ``sed -e s/old/new/g``.
+    """
+    def __init__(self, include=None, exclude=None, replace=None):
+        self.include = compile_strings(include)
+        self.exclude = compile_strings(exclude)
+        self.replace = [(old, new) for old, new in (replace or []) if old]
+
+    def __bool__(self):
+        return bool(self.include or self.exclude or self.replace)
+
+    __nonzero__ = __bool__
+
+    @property
+    def drops_lines(self):
+        """ True if the filter can remove lines as well as change them. """
+        return bool(self.include or self.exclude)
+
+    def __call__(self, lines):
+        """
+        Yields the lines that pass the filter with replacements applied.
+        """
+        include = self.include
+        exclude = self.exclude
+        replace = self.replace
+        for line in lines:
+            if include and not include(line):
+                continue
+            if exclude and exclude(line):
+                continue
+            for old, new in replace:
+                if old in line:
+                    line = line.replace(old, new)
+            yield line
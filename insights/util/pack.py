@@ -0,0 +1,160 @@
+"""
+Module for reading and writing pack files. A pack file holds many named
+entries in a single file with an index at the end, so one entry can be read
+without reading any of the others. Each entry can be compressed on its own.
+
+The layout is the magic bytes, the data of each entry, a json index mapping
+each entry name to its offset, length, and encoding, and a trailer with the
+offset of the index followed by the magic bytes again.
+
+>>> with PackWriter("components.pack", compress=True) as w:
+...     w.add("one", b"some data")
+>>> with PackReader("components.pack") as r:
+...     r.read("one")
+b'some data'
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+
+MAGIC = b"INSPACK\x01"
+TRAILER = struct.Struct(">Q8s")
+
+RAW = "raw"
+ZLIB = "zlib"
+
+
+class PackError(Exception):
+    """ Raised when a file isn't a complete pack file. """
+    pass
+
+
+class PackWriter(object):
+    """
+    Writes named entries to a new pack file. Entries can be added from
+    multiple threads. The file isn't readable until :meth:`close` writes the
+    index.
+
+    Args:
+        path (str): path of the pack file to create.
+        compress (bool): compress each entry with zlib. Entries that don't
+            get smaller are stored as they are.
+        level (int): zlib compression level.
+    """
+    def __init__(self, path, compress=False, level=6):
+        self.path = path
+        self.compress = compress
+        self.level = level
+        self.index = {}
+        self.lock = threading.Lock()
+        self.f = open(path, "wb")
+        self.f.write(MAGIC)
+        self.offset = len(MAGIC)
+
+    def add(self, name, data):
+        """
+        Adds an entry. Adding a name again replaces the earlier entry in the
+        index.
+        """
+        encoding = RAW
+        if self.compress:
+            packed = zlib.compress(data, self.level)
+            if len(packed) < len(data):
+                data, encoding = packed, ZLIB
+        with self.lock:
+            self.f.write(data)
+            self.index[name] = [self.offset, len(data), encoding]
+            self.offset += len(data)
+
+    def close(self):
+        """ Writes the index and trailer and closes the file. """
+        with self.lock:
+            if self.f is None:
+                return
+            index = json.dumps(self.index, sort_keys=True).encode("utf-8")
+            self.f.write(index)
+            self.f.write(TRAILER.pack(self.offset, MAGIC))
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackReader(object):
+    """
+    Reads entries from a pack file. Only the index is read when the reader
+    is created. Entries can be read from multiple threads.
+
+    Args:
+        path (str): path of the pack file.
+
+    Raises:
+        PackError: if the file isn't a complete pack file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.f = open(path, "rb")
+        try:
+            self.index = self._read_index()
+        except Exception:
+            self.f.close()
+            raise
+
+    def _read_index(self):
+        f = self.f
+        if f.read(len(MAGIC)) != MAGIC:
+            raise PackError("%s is not a pack file." % self.path)
+        f.seek(0, os.SEEK_END)
+        end = f.tell() - TRAILER.size
+        if end < len(MAGIC):
+            raise PackError("%s is incomplete." % self.path)
+        f.seek(end)
+        offset, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != MAGIC or not len(MAGIC) <= offset <= end:
+            raise PackError("%s is incomplete." % self.path)
+        f.seek(offset)
+        return json.loads(f.read(end - offset).decode("utf-8"))
+
+    def names(self):
+        """ Returns the names of the entries in the pack. """
+        return list(self.index)
+
+    def read(self, name):
+        """
+        Returns the bytes of an entry.
+
+        Raises:
+            KeyError: if there isn't an entry with the name.
+        """
+        offset, length, encoding = self.index[name]
+        with self.lock:
+            self.f.seek(offset)
+            data = self.f.read(length)
+        if encoding == ZLIB:
+            data = zlib.decompress(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
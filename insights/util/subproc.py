@@ -1,3 +1,4 @@
+import io
 import logging
 import os
 import shlex
@@ -121,7 +122,17 @@ class Pipeline(object):
             raise CalledProcessError(rc, self.cmds[0], output)
         return output
 
-    def write(self, output, mode="w", keep_rc=False):
+    def _write_filtered(self, output, line_filter):
+        p = self._build_pipes()
+        try:
+            lines = (l.decode("utf-8", "ignore") for l in iter(p.stdout.readline, b""))
+            for line in line_filter(lines):
+                output.write(line)
+        finally:
+            p.stdout.close()
+        return p.wait()
+
+    def write(self, output, mode="w", keep_rc=False, line_filter=None):
         """
         Executes the pipeline and writes the results to the supplied output.
         If output is a filename and the file didn't already exist before trying
@@ -133,6 +144,9 @@ class Pipeline(object):
                 like object, it is used.
             mode (str): mode to use when creating or opening the provided file
                 name if it is a string. Ignored if output is a file like object.
+            line_filter (LineFilter): applied to each line of output before
+                it's written. If given, output is decoded as utf-8 and a file
+                like object must accept text.
 
         Returns:
             The final output of the pipeline.
@@ -142,20 +156,25 @@ class Pipeline(object):
         if isinstance(output, six.string_types):
             already_exists = os.path.exists(output)
             try:
-                with open(output, mode) as f:
-                    p = self._build_pipes(f)
-                    rc = p.wait()
-                    if keep_rc:
-                        return rc
-                    if rc:
-                        raise CalledProcessError(rc, self.cmds[0], "")
+                if line_filter:
+                    with io.open(output, mode, encoding="utf-8") as f:
+                        rc = self._write_filtered(f, line_filter)
+                else:
+                    with open(output, mode) as f:
+                        rc = self._build_pipes(f).wait()
+                if keep_rc:
+                    return rc
+                if rc:
+                    raise CalledProcessError(rc, self.cmds[0], "")
             except BaseException as be:
                 if not already_exists and os.path.exists(output):
                     os.remove(output)
                 six.reraise(be.__class__, be, sys.exc_info()[2])
         else:
-            p = self._build_pipes(output)
-            rc = p.wait()
+            if line_filter:
+                rc = self._write_filtered(output, line_filter)
+            else:
+                rc = self._build_pipes(output).wait()
             if keep_rc:
                 return rc
             if rc:
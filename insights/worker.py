@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+"""
+The worker module evaluates a stream of archives or directories in a single
+long lived process. Components, configuration, and the compiled dependency
+graph are loaded once when the :class:`Worker` is created, so the cost of
+evaluating each archive is only its extraction and the evaluation itself.
+
+Paths to evaluate can be read from stdin, picked up as they're moved into a
+watched directory, or sent over a local unix socket. One json document is
+written for each path. Paths from stdin or a watched directory can be fanned
+out to a pool of processes with ``-j``.
+
+>>> insights-worker -p examples.rules < paths.txt
+>>> insights-worker -p examples.rules --watch /var/spool/archives
+>>> insights-worker -p examples.rules --socket /run/insights-worker.sock
+"""
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import traceback
+import yaml
+
+from insights import (_run, _load_context, apply_configs, apply_default_enabled,
+                      dr, get_selector, get_single_graph, load_default_plugins,
+                      load_packages, parse_plugins)
+from insights.core import batch
+from insights.core.parser_cache import set_cache as set_parser_cache
+from insights.core.evaluators import SingleEvaluator
+
+log = logging.getLogger(__name__)
+
+
+class Worker(object):
+    """
+    Evaluates archives and directories against a dependency graph that is
+    built once.
+
+    Args:
+        component (component or list): the component(s) to evaluate. If None,
+            all components in the loaded plugins are evaluated.
+        plugins (list): packages or modules containing plugins to load.
+        config (dict): a component configuration like the one accepted by
+            :func:`insights.apply_configs`.
+        context (ExecutionContext): the context to use instead of the one
+            identified from each archive.
+        selective (bool): extract only the files of each archive that the
+            components can read, if those can be determined.
+        in_place (bool): read the files of each archive without extracting
+            it when possible.
+        parser_cache (str): directory in which to cache parser results. See
+            :mod:`insights.core.parser_cache`.
+    """
+    def __init__(self, component=None, plugins=None, config=None, context=None, selective=False,
+                 in_place=False, parser_cache=None):
+        load_default_plugins()
+        if parser_cache:
+            set_parser_cache(parser_cache)
+        plugins = list(plugins or [])
+        for p in plugins:
+            dr.load_components(p, continue_on_error=False)
+
+        if config:
+            plugins.extend(load_packages(config.get("packages", [])))
+            apply_default_enabled(config)
+            apply_configs(config)
+
+        if component is None:
+            component = []
+            prefixes = tuple(plugins)
+            if prefixes:
+                for c in dr.DELEGATES:
+                    if c.__module__.startswith(prefixes):
+                        component.append(c)
+
+        if component:
+            if not isinstance(component, (list, set)):
+                component = [component]
+            graph = {}
+            for c in component:
+                graph.update(dr.get_dependency_graph(c))
+        else:
+            graph = dr.COMPONENTS[dr.GROUPS.single]
+
+        self.context = context
+        self.graph = graph
+        self.plan = dr.RunPlan(get_single_graph(graph))
+        self.select = get_selector(graph) if selective else None
+        self.in_place = in_place
+
+    def process(self, path, broker=None):
+        """
+        Evaluates the archive or directory at path with a new broker or the
+        one passed in.
+
+        Returns:
+            Broker: the broker after evaluation.
+        """
+        broker = broker or dr.Broker()
+        return _run(broker, self.graph, os.path.realpath(path),
+                    context=self.context, plan=self.plan, select=self.select,
+                    in_place=self.in_place)
+
+    def evaluate(self, path):
+        """
+        Evaluates the archive or directory at path and returns the rule
+        results in the same form as the json formatter.
+        """
+        evaluator = SingleEvaluator(dr.Broker())
+        evaluator.preprocess()
+        self.process(path, broker=evaluator.broker)
+        return evaluator.get_response()
+
+    def handle(self, path):
+        """
+        Evaluates path and returns a dictionary that always contains the path
+        and either the response or the error that prevented evaluation.
+        """
+        start = time.time()
+        result = {"path": path}
+        try:
+            result["response"] = self.evaluate(path)
+        except Exception as ex:
+            log.debug(traceback.format_exc())
+            result["error"] = str(ex)
+        result["time"] = time.time() - start
+        return result
+
+
+def read_paths(stream):
+    """
+    Yields the non-blank lines of stream as paths.
+    """
+    for line in iter(stream.readline, ""):
+        line = line.strip()
+        if line:
+            yield line
+
+
+def watch_directory(path, interval=1.0):
+    """
+    Yields the path of each file that appears in the directory. Files should
+    be moved into the directory once they're complete so partially written
+    files aren't picked up. Entries present when watching starts are yielded
+    first.
+    """
+    seen = set()
+    while True:
+        current = set(os.listdir(path))
+        for name in sorted(current - seen):
+            yield os.path.join(path, name)
+        seen = current
+        time.sleep(interval)
+
+
+def serve(worker, path):
+    """
+    Listens on a unix socket at path. Each connection sends one path followed
+    by a newline and receives a single json document in response.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(5)
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                f = conn.makefile("rw")
+                line = f.readline().strip()
+                if line:
+                    f.write(json.dumps(worker.handle(line)) + "\n")
+                    f.flush()
+                f.close()
+            finally:
+                conn.close()
+    finally:
+        server.close()
+        os.remove(path)
+
+
+def run(worker, paths, stream=sys.stdout):
+    """
+    Evaluates each path and writes one json document per line to stream.
+    """
+    for path in paths:
+        print(json.dumps(worker.handle(path)), file=stream)
+        stream.flush()
+
+
+_WORKER = {}
+
+
+def _init_worker(kwargs):
+    _WORKER["worker"] = Worker(**kwargs)
+
+
+def _handle(path):
+    return _WORKER["worker"].handle(path)
+
+
+def run_batch(paths, processes=None, max_bytes=None, stream=sys.stdout, **kwargs):
+    """
+    Evaluates each path in a pool of processes and writes one json document
+    per line to stream as each finishes. Every process builds its own
+    :class:`Worker` from kwargs when it starts. See
+    :func:`insights.core.batch.map_archives` for the meaning of processes and
+    max_bytes.
+    """
+    results = batch.map_archives(_handle, paths, processes=processes,
+                                 max_bytes=max_bytes, initializer=_init_worker,
+                                 initargs=(kwargs,))
+    for path, result, error in results:
+        if error:
+            result = {"path": path, "error": error}
+        print(json.dumps(result), file=stream)
+        stream.flush()
+
+
+def main():
+    p = argparse.ArgumentParser("Insights multi-archive worker.")
+    p.add_argument("-p", "--plugins", default="",
+                   help="Comma-separated list without spaces of package(s) or module(s) containing plugins.")
+    p.add_argument("-c", "--config", help="Configure components.")
+    p.add_argument("--context", help="Execution Context. Defaults to the one identified for each archive.")
+    p.add_argument("--watch", help="Evaluate archives as they're moved into this directory.")
+    p.add_argument("--interval", type=float, default=1.0, help="Seconds between directory scans.")
+    p.add_argument("--socket", help="Evaluate paths sent to a unix socket at this path.")
+    p.add_argument("-j", "--processes", type=int, help="Evaluate paths from stdin or --watch in this many processes.")
+    p.add_argument("--max-bytes", type=int, help="Limit on the combined size of archives evaluated at once with --processes.")
+    p.add_argument("--selective", help="Extract only the archive files the components can read.", action="store_true")
+    p.add_argument("--no-extract", dest="in_place", help="Read archive files without extracting the archives.", action="store_true")
+    p.add_argument("--parser-cache", help="Directory in which to cache parser results across runs.")
+    p.add_argument("-D", "--debug", help="Verbose debug output.", action="store_true")
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.ERROR)
+
+    config = None
+    if args.config:
+        with open(args.config) as f:
+            config = yaml.safe_load(f)
+
+    if "" not in sys.path:
+        sys.path.insert(0, "")
+
+    kwargs = dict(plugins=parse_plugins(args.plugins), config=config,
+                  context=_load_context(args.context), selective=args.selective,
+                  in_place=args.in_place, parser_cache=args.parser_cache)
+
+    if args.watch:
+        paths = watch_directory(args.watch, interval=args.interval)
+    else:
+        paths = read_paths(sys.stdin)
+
+    try:
+        if args.socket:
+            serve(Worker(**kwargs), args.socket)
+        elif args.processes:
+            run_batch(paths, processes=args.processes, max_bytes=args.max_bytes, **kwargs)
+        else:
+            run(Worker(**kwargs), paths)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ for name in package_info:
 entry_points = {
     'console_scripts': [
         'insights-collect = insights.collect:main',
+        'insights-worker = insights.worker:main',
         'insights-run = insights:main',
         'insights = insights.command_parser:main',
         'insights-cat = insights.tools.cat:main',
@@ -95,6 +96,7 @@ linting = set([
 ])
 
 optional = set([
+    'msgpack',
     'python-cjson',
     'python-logstash',
     'python-statsd',